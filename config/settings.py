@@ -21,7 +21,32 @@ OLLAMA_CONFIG = {
 PROCESSING_CONFIG = {
     "chunk_size": 1000,
     "chunk_overlap": 200,
-    "supported_extensions": [".pdf", ".docx", ".txt", ".md"]
+    "supported_extensions": [".pdf", ".docx", ".txt", ".md"],
+    "recursive": True,
+    "parallel_loading": False,
+    "max_workers": None,
+    "pdf_pages_per_task": 50
+}
+
+DEDUP_CONFIG = {
+    # Drop identical and near-identical chunks (e.g. from revisions of a document) before embedding
+    "enabled": True,
+    "index_file": "dedup.npz",
+    # Estimated Jaccard similarity of word shingles at which a chunk counts as a copy
+    "threshold": 0.85,
+    "shingle_size": 5,
+    # MinHash permutations split into LSH bands; 16 bands of 8 rows catch pairs above ~0.7
+    "num_perm": 128,
+    "bands": 16,
+    # Changing the seed invalidates saved signatures
+    "seed": 1
+}
+
+TEXT_CACHE_CONFIG = {
+    # Keep extracted text in data/processed so unchanged files are never parsed twice
+    "enabled": True,
+    "index_file": "index.sqlite",
+    "compress_level": 6
 }
 
 DATA_PATHS = {
@@ -30,5 +55,168 @@ DATA_PATHS = {
     "vector_store": MODELS_DIR / "vector_store"
 }
 
-for path in DATA_PATHS.values():
-    path.mkdir(parents=True, exist_ok=True)
+INDEX_CONFIG = {
+    # flat (exact), ivf_flat, ivf_pq or hnsw
+    "type": "flat",
+    "train_size": 50000,
+    "nlist": 1024,
+    "nprobe": 16,
+    "pq_m": 64,
+    "pq_nbits": 8,
+    "hnsw_m": 32,
+    "ef_construction": 200,
+    "ef_search": 64,
+    # Vector storage for flat, ivf_flat and hnsw: float32, float16 or int8 (scalar quantization)
+    "encoding": "float32",
+    # None, "pca" (fit at build time) or "truncate" (keep the leading, Matryoshka-style dimensions).
+    # Existing indexes keep their layout until the next --rebuild
+    "reduce": None,
+    "reduced_dim": 256,
+    # Vectors buffered to fit int8 ranges / PCA on flat and hnsw indexes
+    "codec_train_size": 10000,
+    # Re-rank a shortlist of rescore_factor * k compact hits against float32 copies of the vectors
+    "rescore": False,
+    "rescore_factor": 4,
+    # Memory-map the saved index read-only so several processes share its pages.
+    # faiss only maps the inverted lists of IVF indexes; flat and HNSW are read into memory
+    "mmap": False
+}
+
+SHARD_CONFIG = {
+    # None keeps a single index; "directory" builds one shard per top-level folder
+    # of data/raw; "size" starts a new shard every max_chunks chunks
+    "strategy": None,
+    "max_chunks": 50000,
+    "dir": "shards",
+    # Threads searching shards in parallel
+    "max_workers": 4,
+    # Read each shard's index on its first search instead of at load
+    "lazy": True,
+    # Shard names to search (--shards); None searches every shard
+    "search": None
+}
+
+LEXICAL_CONFIG = {
+    "index_file": "bm25.npz",
+    "k1": 1.5,
+    "b": 0.75
+}
+
+STORE_CONFIG = {
+    # Builds write versions/<name> and then atomically repoint CURRENT at it
+    "versions_dir": "versions",
+    "current_file": "CURRENT",
+    "staging_file": "BUILDING",
+    # Published versions kept on disk, including the current one
+    "keep_versions": 2,
+    # Seconds between checks for a newly published version in long-running processes (0 disables)
+    "poll_interval": 5.0
+}
+
+DOCSTORE_CONFIG = {
+    # Chunk text + metadata, read per hit instead of unpickled whole at load
+    "file": "docstore.sqlite"
+}
+
+RETRIEVAL_CONFIG = {
+    # vector (FAISS only), hybrid (FAISS + BM25 fused with RRF) or lexical (BM25 only, no embedding call)
+    "mode": "vector",
+    "candidates": 20,
+    "rrf_k": 60
+}
+
+CONTEXT_CONFIG = {
+    # Merge overlapping chunks, drop near-duplicates and pack into a per-agent prompt budget
+    "enabled": True,
+    "candidates": 6,
+    # Chunks retrieved without packing; tokens_saved is measured against their context
+    "baseline_k": 4,
+    "token_budget": {"coder": 2000, "assistant": 1200},
+    # Rough estimate used when no tokenizer is available
+    "chars_per_token": 4,
+    "min_overlap_chars": 20,
+    "near_duplicate_threshold": 0.8
+}
+
+ROUTER_CONFIG = {
+    # Route "auto" questions by embedding similarity to each agent's labelled examples
+    "enabled": True,
+    # Softmax temperature over cosine similarities; lower = more decisive confidence
+    "temperature": 0.05,
+    # Below this confidence a clear keyword match wins instead
+    "min_confidence": 0.6
+}
+
+CHAT_CONFIG = {
+    # Tokens of conversation (Ollama's returned context) to keep before history is trimmed
+    "history_token_budget": 4096,
+    # Keep the model and its KV cache loaded between turns
+    "keep_alive": "10m"
+}
+
+SCHEDULER_CONFIG = {
+    "enabled": True,
+    # Generations running at once per model on the Ollama host; the 7B model gets fewer slots
+    "concurrency": {"coder": 1, "assistant": 2},
+    # Requests allowed to wait per model; beyond that new ones are rejected as busy
+    "max_queue": {"coder": 16, "assistant": 32},
+    # Lower runs first
+    "priorities": {"interactive": 0, "batch": 10},
+    # Load both models at startup (--prewarm) and keep them resident. The pinned LangChain Ollama
+    # client has no keep_alive field, so the scheduler re-sends keep_alive every half period
+    # for as long as the process runs
+    "prewarm": False,
+    "keep_alive": "30m"
+}
+
+EMBEDDING_ENGINE_CONFIG = {
+    "batch_size": 32,
+    "max_in_flight": 4,
+    "max_retries": 3,
+    "backoff_seconds": 0.5,
+    "embed_instruction": "passage: ",
+    "query_instruction": "query: "
+}
+
+EMBEDDING_CACHE_CONFIG = {
+    "enabled": True,
+    "path": MODELS_DIR / "embedding_cache.sqlite",
+    "max_entries": 500000
+}
+
+ANSWER_CACHE_CONFIG = {
+    "enabled": True,
+    "path": MODELS_DIR / "answer_cache.sqlite",
+    "similarity_threshold": 0.95,
+    "max_entries": 5000,
+    "ttl_seconds": 7 * 24 * 3600
+}
+
+SERVER_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8765
+}
+
+PROFILING_CONFIG = {
+    # Record per-stage timings for every request (--profile also prints them)
+    "enabled": False,
+    # Append one JSON line per request here when set (--profile-log)
+    "jsonl_path": None
+}
+
+BUILD_CONFIG = {
+    "manifest_file": "manifest.json",
+    "hash_algorithm": "sha256",
+    "hash_block_size": 1024 * 1024,
+    "batch_size": 256,
+    "checkpoint_every": 2000
+}
+
+def ensure_data_directories():
+    """Create data/raw, data/processed and the vector store directory
+
+    Called by the commands that write there rather than on import, so
+    reading the settings never touches the filesystem.
+    """
+    for path in DATA_PATHS.values():
+        path.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,58 @@
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from config.settings import ROUTER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class AgentRouter:
+    """Pick the agent whose labelled examples are closest to the question embedding
+
+    Example centroids are embedded once, on first use, through the same
+    (cached) embedding model as retrieval; routing itself is one dot product.
+    """
+
+    def __init__(self, examples: Dict[str, List[str]],
+                 embed_queries: Callable[[List[str]], List[List[float]]],
+                 config: Dict = None):
+        self.examples = examples
+        self.embed_queries = embed_queries
+        self.config = config or ROUTER_CONFIG
+        self._agents: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def prepare(self):
+        """Embed the labelled examples now instead of on the first routed question"""
+        with self._lock:
+            if self._centroids is not None:
+                return
+            agents, centroids = [], []
+            for agent, texts in self.examples.items():
+                if not texts:
+                    continue
+                vectors = _normalize(np.array(self.embed_queries(texts), dtype=np.float32))
+                agents.append(agent)
+                centroids.append(vectors.mean(axis=0))
+            self._agents = agents
+            self._centroids = _normalize(np.array(centroids, dtype=np.float32))
+            logger.info(f"Router centroids ready for {', '.join(agents)}")
+
+    def route(self, vector: List[float]) -> Tuple[str, float]:
+        """(agent, confidence) where confidence is the softmax share of the best agent"""
+        self.prepare()
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        if query.shape[-1] != self._centroids.shape[1]:
+            raise ValueError(f"Query dimension {query.shape[-1]} != centroid dimension {self._centroids.shape[1]}")
+
+        logits = self._centroids @ query / self.config["temperature"]
+        probabilities = np.exp(logits - logits.max())
+        probabilities /= probabilities.sum()
+        best = int(np.argmax(probabilities))
+        return self._agents[best], float(probabilities[best])
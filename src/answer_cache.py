@@ -0,0 +1,187 @@
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional, Tuple, Callable
+from pathlib import Path
+
+import numpy as np
+from config.settings import ANSWER_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class AnswerCache:
+    """Persistent answer cache with exact and near-duplicate (embedding) lookup
+
+    Entries are tied to the knowledge base version they were produced
+    against; a different version wipes the cache on the next access. A
+    scope (e.g. retrieval mode and searched shards) keeps answers produced
+    under other retrieval settings apart, exact and near matches alike.
+    """
+
+    def __init__(
+        self,
+        path: Path = None,
+        similarity_threshold: float = None,
+        max_entries: int = None,
+        ttl_seconds: float = None
+    ):
+        self.path = Path(path or ANSWER_CACHE_CONFIG["path"])
+        self.similarity_threshold = similarity_threshold or ANSWER_CACHE_CONFIG["similarity_threshold"]
+        self.max_entries = max_entries or ANSWER_CACHE_CONFIG["max_entries"]
+        self.ttl_seconds = ttl_seconds or ANSWER_CACHE_CONFIG["ttl_seconds"]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # (agent, dim) -> (keys, normalized embedding matrix), rebuilt lazily after writes
+        self._matrices: Dict[Tuple[str, int], Tuple[List[str], np.ndarray]] = {}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, agent TEXT NOT NULL, question TEXT NOT NULL, "
+            "embedding BLOB, result TEXT NOT NULL, created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._conn.commit()
+
+    @staticmethod
+    def _partition(agent: str, scope: str) -> str:
+        return f"{agent}\0{scope}" if scope else agent
+
+    @staticmethod
+    def make_key(agent: str, question: str) -> str:
+        normalized = " ".join(question.lower().split())
+        return hashlib.sha256(f"{agent}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def sync_version(self, kb_version: Optional[str]):
+        """Drop every entry if the knowledge base changed since they were cached"""
+        kb_version = kb_version or ""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE name = 'kb_version'").fetchone()
+            if row is not None and row[0] == kb_version:
+                return
+
+            if row is not None:
+                logger.info("Knowledge base changed - clearing answer cache")
+            self._conn.execute("DELETE FROM answers")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('kb_version', ?)", (kb_version,)
+            )
+            self._conn.commit()
+            self._matrices = {}
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl_seconds
+        deleted = self._conn.execute("DELETE FROM answers WHERE created < ?", (cutoff,)).rowcount
+        if deleted:
+            self._conn.commit()
+            self._matrices = {}
+
+    def _has_embeddings(self, agent: str) -> bool:
+        row = self._conn.execute(
+            "SELECT 1 FROM answers WHERE agent = ? AND embedding IS NOT NULL LIMIT 1", (agent,)
+        ).fetchone()
+        return row is not None
+
+    def _matrix(self, agent: str, dim: int) -> Tuple[List[str], np.ndarray]:
+        # Only compare against vectors from an embedding model with the same dimension
+        if (agent, dim) not in self._matrices:
+            rows = self._conn.execute(
+                "SELECT key, embedding FROM answers WHERE agent = ? AND length(embedding) = ?",
+                (agent, dim * 4)
+            ).fetchall()
+            keys = [key for key, _ in rows]
+            if rows:
+                matrix = np.stack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+            else:
+                matrix = np.empty((0, dim), dtype=np.float32)
+            self._matrices[(agent, dim)] = (keys, matrix)
+        return self._matrices[(agent, dim)]
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._conn.execute("SELECT result FROM answers WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE answers SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return json.loads(row[0])
+
+    def lookup(
+        self,
+        agent: str,
+        question: str,
+        embed_fn: Optional[Callable[[], Optional[List[float]]]] = None,
+        scope: str = ""
+    ) -> Optional[Dict[str, Any]]:
+        """Exact match first; embed_fn is only called if a near-duplicate search is needed"""
+        agent = self._partition(agent, scope)
+        with self._lock:
+            self._expire()
+
+            result = self._load(self.make_key(agent, question))
+            if result is not None:
+                self.hits += 1
+                return {**result, "cached": True, "cache_match": "exact"}
+            has_candidates = self._has_embeddings(agent)
+
+        # Embed outside the lock so concurrent lookups don't queue behind Ollama
+        embedding = embed_fn() if has_candidates and embed_fn else None
+
+        with self._lock:
+            if embedding is not None:
+                query = self._normalize(embedding)
+                keys, matrix = self._matrix(agent, query.shape[0])
+                if keys:
+                    scores = matrix @ query
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.similarity_threshold:
+                        result = self._load(keys[best])
+                        if result is not None:
+                            self.hits += 1
+                            return {**result, "cached": True, "cache_match": "semantic",
+                                    "similarity": float(scores[best])}
+
+            self.misses += 1
+            return None
+
+    def store(self, agent: str, question: str, result: Dict[str, Any], embedding: Optional[List[float]] = None,
+              scope: str = ""):
+        agent = self._partition(agent, scope)
+        blob = self._normalize(embedding).tobytes() if embedding is not None else None
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers "
+                "(key, agent, question, embedding, result, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.make_key(agent, question), agent, question, blob, json.dumps(result), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+            self._matrices = {cached: value for cached, value in self._matrices.items() if cached[0] != agent}
+
+    def _evict(self):
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_used ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._matrices = {}
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses}
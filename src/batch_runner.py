@@ -0,0 +1,122 @@
+import json
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+from pathlib import Path
+
+from langchain.schema import Document
+from config.settings import OLLAMA_CONFIG, SCHEDULER_CONFIG
+from dual_agent import DualAgent
+
+logger = logging.getLogger(__name__)
+
+class BatchRunner:
+    """Answer a JSONL file of questions concurrently, preserving input order
+
+    Generations are limited by the model scheduler (SCHEDULER_CONFIG). The
+    runner only holds back questions beyond each model's slots, so a large
+    file waits here instead of filling the queue interactive requests share.
+    """
+
+    def __init__(self, agent_handler: DualAgent):
+        self.agent_handler = agent_handler
+
+    def _slots(self, agent: str) -> int:
+        scheduler = self.agent_handler.scheduler
+        if scheduler is None:
+            return SCHEDULER_CONFIG["concurrency"].get(agent, 1)
+        return scheduler.concurrency(OLLAMA_CONFIG["models"][agent])
+
+    @staticmethod
+    def read_items(input_path: Path) -> List[Dict[str, Any]]:
+        items = []
+        with open(input_path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    item = json.loads(line)
+                    if isinstance(item, str):
+                        item = {"question": item}
+                    if not isinstance(item, dict) or not item.get("question"):
+                        raise ValueError("missing 'question'")
+                except ValueError as e:
+                    item = {"error": f"Line {line_number}: {e}"}
+                items.append(item)
+        return items
+
+    def _retrieve_all(self, items: List[Dict[str, Any]]) -> List[Tuple[Optional[List[Document]], Optional[List[float]]]]:
+        """Embed every question in one call and run a single FAISS matrix search
+
+        Returns (documents, vector) per item; routing and the answer cache reuse the vectors.
+        """
+        questions = [item["question"] for item in items if "error" not in item]
+        if self.agent_handler.retriever is None or not questions:
+            return [(None, None)] * len(items)
+
+        knowledge_base = self.agent_handler.knowledge_base
+        try:
+            vectors = None
+            if knowledge_base.retrieval_mode != "lexical":
+                vectors = knowledge_base.embed_queries(questions)
+            found = knowledge_base.search_batch(questions, k=self.agent_handler.retrieval_k, vectors=vectors)
+        except Exception as e:
+            logger.warning(f"Batched retrieval failed, falling back to per-question search: {e}")
+            return [(None, None)] * len(items)
+        found = iter(zip(found, vectors or [None] * len(questions)))
+        return [(None, None) if "error" in item else next(found) for item in items]
+
+    async def _answer(self, item: Dict[str, Any], documents: Optional[List[Document]],
+                      vector: Optional[List[float]], semaphores: Dict[str, asyncio.Semaphore]) -> Dict[str, Any]:
+        if "error" in item:
+            return {"success": False, "answer": item["error"]}
+
+        agent = item.get("agent", "auto")
+        if agent == "auto":
+            embed = (lambda: vector) if vector is not None else None
+            routing = await asyncio.to_thread(self.agent_handler.route, item["question"], embed)
+            agent = routing["agent"]
+
+        if agent not in semaphores:
+            return {"success": False, "answer": f"Invalid agent: {agent}"}
+
+        async with semaphores[agent]:
+            return await self.agent_handler.aask_question(
+                item["question"], agent, documents, priority="batch", vector=vector
+            )
+
+    async def run(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        semaphores = {agent_id: asyncio.Semaphore(self._slots(agent_id)) for agent_id in self.agent_handler.agents}
+        retrieved = await asyncio.to_thread(self._retrieve_all, items)
+
+        results = await asyncio.gather(
+            *(self._answer(item, documents, vector, semaphores) for item, (documents, vector) in zip(items, retrieved)),
+            return_exceptions=True
+        )
+
+        output = []
+        for item, result in zip(items, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error answering {item.get('question')!r}: {result}")
+                result = {"success": False, "answer": f"Error: {result}"}
+            echoed = {key: item[key] for key in ("id", "question") if key in item}
+            output.append({**echoed, **result})
+        return output
+
+    def run_file(self, input_path: Path, output_path: Path) -> bool:
+        try:
+            items = self.read_items(input_path)
+        except OSError as e:
+            logger.error(f"Error reading {input_path}: {e}")
+            return False
+
+        logger.info(f"Answering {len(items)} questions from {input_path}")
+        results = asyncio.run(self.run(items))
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+        succeeded = sum(1 for result in results if result.get("success"))
+        logger.info(f"Wrote {len(results)} results to {output_path} ({succeeded} succeeded)")
+        return True
@@ -0,0 +1,73 @@
+import sys
+import json
+import argparse
+import logging
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dual_agent import DualAgent
+from chat_session import ChatSession
+
+logger = logging.getLogger(__name__)
+
+# Follow-ups that only make sense with the earlier turns in view
+CONVERSATION = [
+    "What does the knowledge base say about Python code?",
+    "Can you give a short example of that?",
+    "How would the same thing look in JavaScript?",
+    "Which of the two versions is faster, and why?",
+    "Summarize everything we discussed in three bullet points."
+]
+
+def _run(agent_handler: DualAgent, agent: str, questions: List[str], session: ChatSession = None) -> List[Dict[str, Any]]:
+    turns = []
+    for turn, question in enumerate(questions, 1):
+        done = None
+        for event in agent_handler.stream_question(question, agent, session):
+            if event["type"] == "error":
+                raise RuntimeError(event["answer"])
+            if event["type"] == "done":
+                done = event
+        stats = done["stats"]
+        turns.append({
+            "turn": turn,
+            "time_to_first_token": stats["time_to_first_token"],
+            "total_time": stats["total_time"],
+            "prompt_tokens": stats.get("prompt_tokens")
+        })
+    return turns
+
+def run_benchmark(agent: str, questions: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Time-to-first-token per turn: stateless prompts vs a session reusing Ollama's context"""
+    agent_handler = DualAgent()
+    agent_handler.initialize()
+    # Cached answers would hide the prefill cost being measured
+    agent_handler.answer_cache = None
+    return {
+        "stateless": _run(agent_handler, agent, questions),
+        "session": _run(agent_handler, agent, questions, ChatSession())
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-turn chat benchmark: stateless vs context reuse")
+    parser.add_argument("--agent", "-g", default="assistant", help="Agent to benchmark: coder or assistant")
+    parser.add_argument("--out", type=str, help="Write the per-turn results as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmark(args.agent, CONVERSATION)
+
+    print(f"Time to first token per turn ({args.agent}, {len(CONVERSATION)} turns)")
+    print(f"{'turn':<6}{'stateless s':>14}{'session s':>12}{'session prompt tokens':>24}")
+    for stateless, session in zip(results["stateless"], results["session"]):
+        print(f"{stateless['turn']:<6}{stateless['time_to_first_token']:>14.3f}"
+              f"{session['time_to_first_token']:>12.3f}{str(session['prompt_tokens']):>24}")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import sys
+import json
+import time
+import argparse
+import logging
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from dual_agent import DualAgent
+
+logger = logging.getLogger(__name__)
+
+# Held-out questions, deliberately including ones with no English keywords
+LABELLED_QUESTIONS = [
+    {"question": "How can I speed up a pandas groupby on ten million rows?", "agent": "coder"},
+    {"question": "Write a regex that validates an IPv4 address", "agent": "coder"},
+    {"question": "What does a segmentation fault mean in C?", "agent": "coder"},
+    {"question": "Convert this callback-based code to async/await", "agent": "coder"},
+    {"question": "Why does my unit test pass locally but fail in CI?", "agent": "coder"},
+    {"question": "How do I paginate results from a REST endpoint?", "agent": "coder"},
+    {"question": "Explain Big-O of quicksort in the worst case", "agent": "coder"},
+    {"question": "My Kubernetes pod keeps restarting with OOMKilled", "agent": "coder"},
+    {"question": "¿Cómo leo un archivo JSON en Node?", "agent": "coder"},
+    {"question": "¿Qué es una fuga de memoria y cómo la encuentro?", "agent": "coder"},
+    {"question": "Comment inverser une liste chaînée ?", "agent": "coder"},
+    {"question": "Wie schreibe ich eine Schleife in Bash?", "agent": "coder"},
+    {"question": "Write a thank-you note to my team after the launch", "agent": "assistant"},
+    {"question": "Summarize the main risks in this quarterly report", "agent": "assistant"},
+    {"question": "Plan a three-day offsite for twelve people", "agent": "assistant"},
+    {"question": "Turn these meeting notes into action items with owners", "agent": "assistant"},
+    {"question": "What should I include in a project kickoff email?", "agent": "assistant"},
+    {"question": "Create a weekly schedule that balances study and work", "agent": "assistant"},
+    {"question": "Rewrite this paragraph to sound more professional", "agent": "assistant"},
+    {"question": "Compare the two vendor proposals in a table", "agent": "assistant"},
+    {"question": "¿Me ayudas a preparar la agenda de la reunión del lunes?", "agent": "assistant"},
+    {"question": "Redacta una carta de renuncia cordial", "agent": "assistant"},
+    {"question": "Fais un résumé de ce contrat en trois points", "agent": "assistant"},
+    {"question": "Organisiere meine Aufgaben für diese Woche", "agent": "assistant"},
+]
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _summary(correct: int, total: int, latencies: List[float]) -> Dict[str, float]:
+    return {
+        "accuracy": correct / total if total else 0.0,
+        "mean_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 0.95) * 1000 if latencies else 0.0
+    }
+
+def run_benchmark(items: List[Dict[str, str]]) -> Dict[str, Dict[str, float]]:
+    """Accuracy and latency of the keyword router vs the embedding router"""
+    agent_handler = DualAgent()
+    knowledge_base = agent_handler.knowledge_base
+    agent_handler.router.prepare()
+
+    keyword_correct, keyword_times = 0, []
+    embedding_correct, route_times, embed_times, confidences = 0, [], [], []
+    for item in items:
+        start = time.perf_counter()
+        agent = agent_handler._detect_agent(item["question"])
+        keyword_times.append(time.perf_counter() - start)
+        keyword_correct += agent == item["agent"]
+
+        # Retrieval pays for the query embedding anyway; time it separately from routing
+        start = time.perf_counter()
+        vector = knowledge_base.embeddings.embed_query(item["question"])
+        embed_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        agent, confidence = agent_handler.router.route(vector)
+        route_times.append(time.perf_counter() - start)
+        embedding_correct += agent == item["agent"]
+        confidences.append(confidence)
+
+        logger.debug(f"{item['agent']:>9} | {agent:>9} ({confidence:.2f}) | {item['question']}")
+
+    results = {
+        "keywords": _summary(keyword_correct, len(items), keyword_times),
+        "embedding": _summary(embedding_correct, len(items), route_times),
+        "query_embedding": _summary(0, 0, embed_times)
+    }
+    results["embedding"]["mean_confidence"] = sum(confidences) / len(confidences) if confidences else 0.0
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline routing benchmark: keyword vs embedding router")
+    parser.add_argument("--questions", type=str, help="JSONL file of {\"question\", \"agent\"} lines")
+    parser.add_argument("--out", type=str, help="Write the results as JSON")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Print every routing decision")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING)
+
+    items = LABELLED_QUESTIONS
+    if args.questions:
+        with open(args.questions, "r", encoding="utf-8") as f:
+            items = [json.loads(line) for line in f if line.strip()]
+
+    results = run_benchmark(items)
+
+    print(f"Routing benchmark on {len(items)} labelled questions")
+    print(f"{'router':<16}{'accuracy':>10}{'mean ms':>10}{'p95 ms':>10}")
+    for name in ("keywords", "embedding"):
+        row = results[name]
+        print(f"{name:<16}{row['accuracy']:>10.1%}{row['mean_ms']:>10.3f}{row['p95_ms']:>10.3f}")
+    embed = results["query_embedding"]
+    print(f"(query embedding, shared with retrieval: mean {embed['mean_ms']:.1f} ms, p95 {embed['p95_ms']:.1f} ms)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import sys
+import json
+import time
+import argparse
+import logging
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SRC_DIR = Path(__file__).resolve().parent
+PROJECT_ROOT = SRC_DIR.parent
+
+# label -> extra interpreter arguments; each runs in a fresh process with -X importtime
+ENTRY_POINTS = {
+    "main.py (usage)": [str(SRC_DIR / "main.py")],
+    "main.py --help": [str(SRC_DIR / "main.py"), "--help"],
+    "import client": ["-c", "import client"],
+    "import server": ["-c", "import server"],
+    "import batch_runner": ["-c", "import batch_runner"],
+    "import document_processor": ["-c", "import document_processor"],
+    "import knowledge_base": ["-c", "import knowledge_base"],
+    "import dual_agent": ["-c", "import dual_agent"],
+    "DualAgent()": ["-c", "from dual_agent import DualAgent; DualAgent()"],
+    "DualAgent() + coder llm": ["-c", "from dual_agent import DualAgent; DualAgent().llm('coder')"]
+}
+
+# Packages worth knowing about when they show up in a command that shouldn't need them
+HEAVY_PACKAGES = ("langchain", "langchain_core", "langchain_community", "faiss", "numpy", "pypdf", "aiohttp")
+
+def parse_importtime(stderr: str) -> Tuple[float, List[Tuple[str, int, float]]]:
+    """Total import seconds and (module, depth, cumulative seconds) for every import, in import order"""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Nested imports are indented two spaces per level under the module that triggered them
+        depth = (len(name) - len(name.lstrip()) + 1) // 2
+        imports.append((name.strip(), depth, int(cumulative) / 1e6))
+    return sum(seconds for _, depth, seconds in imports if depth == 1), imports
+
+def _imported_packages(stderr: str) -> List[str]:
+    names = {line.split("|")[2].strip().split(".")[0] for line in stderr.splitlines()
+             if line.startswith("import time:") and "cumulative" not in line}
+    return [package for package in HEAVY_PACKAGES if package in names]
+
+def measure(arguments: List[str], repeat: int) -> Dict[str, Any]:
+    """Median wall and import time of a fresh interpreter running arguments"""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([str(SRC_DIR), str(PROJECT_ROOT)])}
+    walls, imports, stderr = [], [], ""
+    for _ in range(repeat):
+        start = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", *arguments],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, env=env
+        )
+        walls.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            raise RuntimeError(f"{' '.join(arguments)} failed:\n{completed.stderr[-2000:]}")
+        stderr = completed.stderr
+        imports.append(parse_importtime(stderr)[0])
+
+    # Two levels deep, so "import server" also shows which of its own imports cost the most
+    _, imported = parse_importtime(stderr)
+    heaviest = sorted((entry for entry in imported if entry[1] <= 2), key=lambda entry: entry[2], reverse=True)[:5]
+    return {
+        "wall_ms": statistics.median(walls) * 1000,
+        "import_ms": statistics.median(imports) * 1000,
+        "heavy_packages": _imported_packages(stderr),
+        "heaviest_imports_ms": {name: seconds * 1000 for name, _, seconds in heaviest}
+    }
+
+def run_benchmark(labels: List[str], repeat: int) -> Dict[str, Any]:
+    results = {
+        "run": {"started_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0], "repeat": repeat},
+        "entry_points": {}
+    }
+    # The interpreter alone, so the numbers above it are what the project adds
+    print("⏱ Timing a bare interpreter...")
+    results["entry_points"]["python -c pass"] = measure(["-c", "pass"], repeat)
+    for label in labels:
+        print(f"⏱ Timing {label}...")
+        results["entry_points"][label] = measure(ENTRY_POINTS[label], repeat)
+    return results
+
+def print_results(results: Dict[str, Any], baseline: Dict[str, Any] = None):
+    previous = (baseline or {}).get("entry_points", {})
+    print(f"\n{'entry point':<28}{'wall ms':>10}{'import ms':>11}" + (f"{'baseline':>10}{'change':>9}" if baseline else "")
+          + "  heavy packages loaded")
+    for label, entry in results["entry_points"].items():
+        line = f"{label:<28}{entry['wall_ms']:>10.0f}{entry['import_ms']:>11.0f}"
+        if baseline:
+            if label in previous and previous[label]["wall_ms"]:
+                before = previous[label]["wall_ms"]
+                line += f"{before:>10.0f}{(entry['wall_ms'] - before) / before:>+9.0%}"
+            else:
+                line += f"{'-':>10}{'-':>9}"
+        print(f"{line}  {', '.join(entry['heavy_packages']) or '-'}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Import and startup time of each entry point, in fresh interpreters")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per entry point (the median is reported)")
+    parser.add_argument("--only", help=f"Comma-separated subset of: {', '.join(ENTRY_POINTS)}")
+    parser.add_argument("--out", default="startup_benchmark.json", help="Write the results as JSON")
+    parser.add_argument("--compare", help="Earlier results JSON to print side by side")
+    parser.add_argument("--details", action="store_true", help="Also list the heaviest imports of each entry point")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    labels = [label.strip() for label in args.only.split(",")] if args.only else list(ENTRY_POINTS)
+    unknown = [label for label in labels if label not in ENTRY_POINTS]
+    if unknown:
+        parser.error(f"Unknown entry points: {', '.join(unknown)}")
+
+    results = run_benchmark(labels, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    if args.details:
+        for label, entry in results["entry_points"].items():
+            heaviest = ", ".join(f"{name} {ms:.0f}ms" for name, ms in entry["heaviest_imports_ms"].items())
+            print(f"\n{label}: {heaviest}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import sys
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import logging
+import tempfile
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from config.settings import (
+    OLLAMA_CONFIG, DATA_PATHS, PROCESSING_CONFIG, INDEX_CONFIG, RETRIEVAL_CONFIG,
+    EMBEDDING_CACHE_CONFIG, ANSWER_CACHE_CONFIG, PROFILING_CONFIG, SHARD_CONFIG
+)
+from stub_ollama import StubOllamaServer
+from document_processor import DocumentProcessor
+from knowledge_base import KnowledgeBase
+from dual_agent import DualAgent
+import profiling
+
+logger = logging.getLogger(__name__)
+
+COMMON_WORDS = [
+    "the", "a", "of", "and", "to", "in", "is", "for", "with", "on", "this", "that",
+    "when", "each", "every", "should", "can", "will", "after", "before", "between"
+]
+
+TOPICS = {
+    "python": ["python", "function", "class", "list", "dict", "generator", "import", "module",
+               "exception", "decorator", "async", "await", "pytest", "numpy", "pandas", "typing"],
+    "databases": ["sql", "index", "query", "table", "join", "transaction", "postgres", "sqlite",
+                  "schema", "migration", "replica", "shard", "btree", "vacuum", "lock", "cursor"],
+    "web": ["javascript", "react", "component", "css", "html", "request", "response", "api",
+            "endpoint", "cookie", "session", "cache", "browser", "fetch", "router", "render"],
+    "operations": ["docker", "kubernetes", "pod", "deploy", "container", "cluster", "node",
+                   "memory", "cpu", "latency", "alert", "log", "metric", "rollback", "helm", "scale"],
+    "meetings": ["meeting", "agenda", "minutes", "action", "owner", "deadline", "team", "review",
+                 "decision", "follow", "calendar", "invite", "notes", "priority", "status", "update"],
+    "reports": ["report", "quarter", "revenue", "budget", "forecast", "risk", "summary", "chart",
+                "growth", "customer", "contract", "vendor", "proposal", "cost", "target", "table"]
+}
+
+def _sentence(rng: random.Random, vocabulary: List[str]) -> str:
+    words = [rng.choice(vocabulary if rng.random() < 0.6 else COMMON_WORDS)
+             for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+def make_corpus(directory: Path, documents: int, words_per_document: int, seed: int = 0) -> Dict[str, Any]:
+    """Write reproducible synthetic .txt documents, each about one topic"""
+    rng = random.Random(seed)
+    directory.mkdir(parents=True, exist_ok=True)
+    total_bytes = 0
+    for i in range(documents):
+        topic = rng.choice(list(TOPICS))
+        paragraphs, words = [], 0
+        while words < words_per_document:
+            sentences = [_sentence(rng, TOPICS[topic]) for _ in range(rng.randint(3, 6))]
+            words += sum(len(sentence.split()) for sentence in sentences)
+            paragraphs.append(" ".join(sentences))
+        text = f"{topic.title()} notes {i}\n\n" + "\n\n".join(paragraphs) + "\n"
+        file_path = directory / topic / f"doc_{i:05d}.txt"
+        file_path.parent.mkdir(exist_ok=True)
+        file_path.write_text(text, encoding="utf-8")
+        total_bytes += len(text.encode("utf-8"))
+    return {"documents": documents, "words_per_document": words_per_document, "bytes": total_bytes, "seed": seed}
+
+def make_questions(count: int, seed: int = 1) -> List[str]:
+    rng = random.Random(seed)
+    questions = []
+    for _ in range(count):
+        topic = rng.choice(list(TOPICS))
+        questions.append(f"How does {' '.join(rng.sample(TOPICS[topic], rng.randint(3, 6)))} work?")
+    return questions
+
+def _percentiles(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    if not ordered:
+        return {"count": 0}
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "count": len(ordered),
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1] * 1000
+    }
+
+def _rss_mb() -> float:
+    """Current resident set size; peak RSS where /proc is unavailable"""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _use_workdir(workdir: Path, base_url: str):
+    """Point every path and the Ollama URL at the benchmark's own sandbox"""
+    DATA_PATHS["raw_documents"] = workdir / "raw"
+    DATA_PATHS["processed_documents"] = workdir / "processed"
+    DATA_PATHS["vector_store"] = workdir / "vector_store"
+    for path in DATA_PATHS.values():
+        path.mkdir(parents=True, exist_ok=True)
+    EMBEDDING_CACHE_CONFIG["path"] = workdir / "embedding_cache.sqlite"
+    # Cached answers would skip the retrieval and generation being measured
+    ANSWER_CACHE_CONFIG["enabled"] = False
+    OLLAMA_CONFIG["base_url"] = base_url
+
+def bench_processing(corpus: Dict[str, Any]) -> Tuple[Dict[str, Any], List]:
+    start = time.perf_counter()
+    chunks = DocumentProcessor().process_documents()
+    seconds = time.perf_counter() - start
+    return {
+        "seconds": seconds,
+        "chunks": len(chunks),
+        "documents_per_sec": corpus["documents"] / seconds,
+        "chunks_per_sec": len(chunks) / seconds,
+        "mb_per_sec": corpus["bytes"] / (1024 * 1024) / seconds
+    }, chunks
+
+def bench_build(chunks: List) -> Dict[str, Any]:
+    knowledge_base = KnowledgeBase()
+    PROFILING_CONFIG["enabled"] = True
+    try:
+        with profiling.trace("build") as trace:
+            start = time.perf_counter()
+            if not knowledge_base.create_knowledge_base(chunks) or not knowledge_base.save_knowledge_base():
+                raise RuntimeError("Index build failed - see the log above")
+            seconds = time.perf_counter() - start
+    finally:
+        PROFILING_CONFIG["enabled"] = False
+    return {
+        "seconds": seconds,
+        "chunks_per_sec": len(chunks) / seconds,
+        "stages": trace.to_dict()["stages"]
+    }
+
+def _measure_load(workdir: str, base_url: str, mmap: Optional[bool]) -> Dict[str, Any]:
+    _use_workdir(Path(workdir), base_url)
+    knowledge_base = KnowledgeBase()
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if not knowledge_base.load_knowledge_base(mmap=mmap, lazy=False):
+        raise RuntimeError("Knowledge base failed to load")
+    seconds = time.perf_counter() - start
+    rss_after = _rss_mb()
+    return {
+        "seconds": seconds,
+        "vectors": knowledge_base.vector_count,
+        "rss_before_mb": rss_before,
+        "rss_after_mb": rss_after,
+        "rss_delta_mb": rss_after - rss_before
+    }
+
+def bench_load(workdir: Path, base_url: str, mmap: Optional[bool]) -> Dict[str, Any]:
+    """Load in a fresh interpreter so RSS isn't inflated by the build that just ran"""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure_load, (str(workdir), base_url, mmap))
+
+def bench_search(questions: List[str], k: int, filters: Dict[str, Any] = None) -> Dict[str, Any]:
+    knowledge_base = KnowledgeBase()
+    knowledge_base.load_knowledge_base()
+    knowledge_base.search_similar_documents("warm up", k=k)
+
+    latencies, hits = [], 0
+    for question in questions:
+        start = time.perf_counter()
+        results = knowledge_base.search_similar_documents(question, k=k, filters=filters)
+        latencies.append(time.perf_counter() - start)
+        hits += len(results)
+    return {"k": k, "mode": knowledge_base.retrieval_mode, "mean_hits": hits / len(questions), **_percentiles(latencies)}
+
+def bench_ask(questions: List[str]) -> Dict[str, Any]:
+    agent_handler = DualAgent()
+    if not agent_handler.initialize():
+        raise RuntimeError("DualAgent failed to initialize")
+
+    latencies, agents = [], {}
+    for question in questions:
+        start = time.perf_counter()
+        result = agent_handler.ask_question(question)
+        latencies.append(time.perf_counter() - start)
+        if not result.get("success"):
+            raise RuntimeError(result["answer"])
+        agents[result["agent"]] = agents.get(result["agent"], 0) + 1
+    return {"agents": agents, **_percentiles(latencies)}
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Ingest throughput, build/load cost and query latency against a stub Ollama"""
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    stub = StubOllamaServer(
+        dimension=args.dimension,
+        embed_latency=args.embed_latency,
+        token_latency=args.token_latency,
+        answer_tokens=args.answer_tokens
+    )
+    questions = make_questions(args.queries + args.asks)
+
+    with stub:
+        _use_workdir(workdir, stub.base_url)
+        try:
+            corpus = make_corpus(DATA_PATHS["raw_documents"], args.docs, args.doc_words)
+            results = {
+                "run": {
+                    "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "index_type": INDEX_CONFIG["type"],
+                    "index_encoding": INDEX_CONFIG["encoding"],
+                    "index_reduce": INDEX_CONFIG["reduce"],
+                    "shard_strategy": SHARD_CONFIG["strategy"],
+                    "retrieval_mode": RETRIEVAL_CONFIG["mode"],
+                    "chunk_size": PROCESSING_CONFIG["chunk_size"],
+                    "chunk_overlap": PROCESSING_CONFIG["chunk_overlap"],
+                    "stub": {
+                        "dimension": stub.dimension,
+                        "embed_latency": stub.embed_latency,
+                        "embed_latency_per_input": stub.embed_latency_per_input,
+                        "prefill_latency_per_token": stub.prefill_latency_per_token,
+                        "token_latency": stub.token_latency,
+                        "answer_tokens": stub.answer_tokens
+                    }
+                },
+                "corpus": corpus
+            }
+
+            print(f"📄 Processing {args.docs} documents...")
+            results["processing"], chunks = bench_processing(corpus)
+            print(f"🧮 Building index over {len(chunks)} chunks...")
+            results["build"] = bench_build(chunks)
+            print("📦 Loading index in a fresh process...")
+            results["load"] = bench_load(workdir, stub.base_url, args.mmap)
+            print(f"🔎 Running {args.queries} searches...")
+            results["search"] = bench_search(questions[:args.queries], args.k)
+            # Every tenth document; fresh questions so the query embeddings aren't cached
+            filters = {"source": [f"doc_{i:05d}.txt" for i in range(0, args.docs, 10)]}
+            print(f"🔎 Running {args.queries} searches filtered to {len(filters['source'])} documents...")
+            results["search_filtered"] = bench_search(make_questions(args.queries, seed=2), args.k, filters)
+            if args.asks:
+                print(f"💬 Asking {args.asks} questions end to end...")
+                results["ask"] = bench_ask(questions[args.queries:])
+            results["run"]["stub_requests"] = dict(stub.requests)
+        finally:
+            if not args.workdir and not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def _flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if key in ("run", "stages", "agents"):
+            continue
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def print_results(results: Dict[str, Any], baseline: Dict[str, Any] = None):
+    current = _flatten(results)
+    previous = _flatten(baseline) if baseline else {}
+    print(f"\n{'metric':<34}{'value':>14}" + (f"{'baseline':>14}{'change':>10}" if baseline else ""))
+    for name, value in current.items():
+        line = f"{name:<34}{value:>14.3f}"
+        if name in previous:
+            change = f"{(value - previous[name]) / previous[name]:+.1%}" if previous[name] else "-"
+            line += f"{previous[name]:>14.3f}{change:>10}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest and query benchmark against a local stub Ollama server")
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic documents to generate")
+    parser.add_argument("--doc-words", type=int, default=800, help="Approximate words per document")
+    parser.add_argument("--queries", type=int, default=100, help="search_similar_documents calls to time")
+    parser.add_argument("--asks", type=int, default=10, help="End-to-end ask_question calls to time (0 to skip)")
+    parser.add_argument("--k", type=int, default=4, help="Documents per search")
+    parser.add_argument("--dimension", type=int, default=384, help="Stub embedding dimension")
+    parser.add_argument("--embed-latency", type=float, default=0.002, help="Stub seconds per embedding request")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="Stub seconds per generated token")
+    parser.add_argument("--answer-tokens", type=int, default=32, help="Tokens the stub generates per answer")
+    parser.add_argument("--shard-by", choices=["directory", "size"],
+                        help="Shard the index (the corpus has one folder per topic)")
+    parser.add_argument("--mmap", action="store_true", default=None, help="Memory-map the index when timing the load")
+    parser.add_argument("--workdir", help="Build the corpus and index here instead of a temporary directory")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directory afterwards")
+    parser.add_argument("--out", default="benchmark_results.json", help="Write the results as JSON")
+    parser.add_argument("--compare", help="Earlier results JSON to print side by side")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show the pipeline's own logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    if args.shard_by:
+        SHARD_CONFIG["strategy"] = args.shard_by
+    results = run_benchmark(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
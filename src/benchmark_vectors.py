@@ -0,0 +1,176 @@
+import sys
+import json
+import time
+import shutil
+import argparse
+import logging
+import tempfile
+import multiprocessing
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+import numpy as np
+from config.settings import DATA_PATHS, INDEX_CONFIG
+from stub_ollama import StubOllamaServer
+from document_processor import DocumentProcessor
+from knowledge_base import KnowledgeBase
+from benchmark_suite import make_corpus, make_questions, _use_workdir, _rss_mb
+
+logger = logging.getLogger(__name__)
+
+# INDEX_CONFIG overrides per layout; float32 is the baseline recall is measured against
+LAYOUTS = {
+    "float32": {},
+    "float16": {"encoding": "float16"},
+    "int8": {"encoding": "int8"},
+    "int8+rescore": {"encoding": "int8", "rescore": True},
+    "pca": {"reduce": "pca"},
+    "pca+int8": {"reduce": "pca", "encoding": "int8"},
+    "pca+int8+rescore": {"reduce": "pca", "encoding": "int8", "rescore": True},
+    "truncate": {"reduce": "truncate"}
+}
+
+def _index_bytes(store_dir: Path) -> int:
+    return sum(path.stat().st_size for path in store_dir.rglob("index.faiss"))
+
+def build_layout(chunks: List, store_dir: Path) -> Dict[str, Any]:
+    """Index the same chunks with the current INDEX_CONFIG; embeddings come from the cache after the first"""
+    DATA_PATHS["vector_store"] = store_dir
+    knowledge_base = KnowledgeBase(store_path=store_dir)
+    start = time.perf_counter()
+    # The same ids in every layout, so hits can be compared with the baseline's
+    ids = [f"chunk-{i}" for i in range(len(chunks))]
+    if knowledge_base.add_documents(chunks, ids=ids) is None or not knowledge_base.save_knowledge_base():
+        raise RuntimeError("Index build failed - see the log above")
+    return {"build_seconds": time.perf_counter() - start, "index_bytes": _index_bytes(store_dir)}
+
+def _measure_load(workdir: str, base_url: str, store_dir: str, mmap: bool) -> Dict[str, Any]:
+    _use_workdir(Path(workdir), base_url)
+    knowledge_base = KnowledgeBase(store_path=Path(store_dir))
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    if not knowledge_base.load_knowledge_base(mmap=mmap, lazy=False, path=Path(store_dir)):
+        raise RuntimeError("Knowledge base failed to load")
+    seconds = time.perf_counter() - start
+    return {"load_seconds": seconds, "rss_delta_mb": _rss_mb() - rss_before}
+
+def bench_load(workdir: Path, base_url: str, store_dir: Path, mmap: bool) -> Dict[str, Any]:
+    """Load in a fresh interpreter so earlier layouts don't skew time or RSS"""
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(_measure_load, (str(workdir), base_url, str(store_dir), mmap))
+
+def bench_search(store_dir: Path, vectors: List[List[float]], k: int) -> Dict[str, Any]:
+    """Nearest chunk ids per query vector, searched on the compact form as stored"""
+    knowledge_base = KnowledgeBase(store_path=store_dir)
+    knowledge_base.load_knowledge_base(lazy=False, path=store_dir)
+    shards, _ = knowledge_base._snapshot()
+
+    start = time.perf_counter()
+    ids = knowledge_base._vector_ids(vectors, k, shards)
+    seconds = time.perf_counter() - start
+    return {"ids": ids, "search_ms_per_query": seconds / len(vectors) * 1000}
+
+def recall_at_k(ids: List[List[str]], baseline: List[List[str]]) -> float:
+    found = [len(set(row) & set(expected)) / len(expected) for row, expected in zip(ids, baseline) if expected]
+    return float(np.mean(found)) if found else 0.0
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Index size, load time and recall@k of each compact layout against float32"""
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="rag-vectors-"))
+    stub = StubOllamaServer(dimension=args.dimension, embed_latency=0.0)
+    names = args.layouts.split(",") if args.layouts else list(LAYOUTS)
+    unknown = [name for name in names if name not in LAYOUTS]
+    if unknown:
+        raise ValueError(f"Unknown layouts: {', '.join(unknown)} (expected some of {', '.join(LAYOUTS)})")
+    if "float32" in names:
+        names.remove("float32")
+    names.insert(0, "float32")
+
+    defaults = dict(INDEX_CONFIG)
+    results = {
+        "run": {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "index_type": args.index_type,
+            "dimension": args.dimension,
+            "reduced_dim": args.reduced_dim,
+            "k": args.k,
+            "mmap": args.mmap
+        },
+        "layouts": {}
+    }
+
+    with stub:
+        _use_workdir(workdir, stub.base_url)
+        try:
+            corpus = make_corpus(DATA_PATHS["raw_documents"], args.docs, args.doc_words)
+            results["corpus"] = corpus
+            print(f"📄 Processing {args.docs} documents...")
+            chunks = DocumentProcessor().process_documents()
+            vectors = KnowledgeBase(store_path=workdir / "layouts").embed_queries(make_questions(args.queries))
+
+            baseline = None
+            for name in names:
+                INDEX_CONFIG.clear()
+                INDEX_CONFIG.update(defaults, type=args.index_type, reduced_dim=args.reduced_dim,
+                                    encoding="float32", reduce=None, rescore=False)
+                INDEX_CONFIG.update(LAYOUTS[name])
+                store_dir = workdir / "layouts" / name
+                print(f"🧮 {name}: indexing {len(chunks)} chunks...")
+                layout = build_layout(chunks, store_dir)
+                layout.update(bench_load(workdir, stub.base_url, store_dir, args.mmap))
+                searched = bench_search(store_dir, vectors, args.k)
+                layout["search_ms_per_query"] = searched["search_ms_per_query"]
+                if baseline is None:
+                    baseline = searched["ids"]
+                layout[f"recall@{args.k}"] = recall_at_k(searched["ids"], baseline)
+                results["layouts"][name] = layout
+        finally:
+            INDEX_CONFIG.clear()
+            INDEX_CONFIG.update(defaults)
+            if not args.workdir and not args.keep:
+                shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+def print_results(results: Dict[str, Any], k: int):
+    layouts = results["layouts"]
+    baseline = layouts["float32"]
+    print(f"\n{'layout':<20}{'index MB':>10}{'size':>8}{'load ms':>10}{'search ms':>11}{f'recall@{k}':>11}")
+    for name, layout in layouts.items():
+        print(f"{name:<20}{layout['index_bytes'] / (1024 * 1024):>10.2f}"
+              f"{layout['index_bytes'] / baseline['index_bytes']:>8.0%}"
+              f"{layout['load_seconds'] * 1000:>10.1f}{layout['search_ms_per_query']:>11.3f}"
+              f"{layout[f'recall@{k}']:>11.3f}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Index size, load time and recall@k of compact vector layouts against float32"
+    )
+    parser.add_argument("--docs", type=int, default=300, help="Synthetic documents to generate")
+    parser.add_argument("--doc-words", type=int, default=800, help="Approximate words per document")
+    parser.add_argument("--queries", type=int, default=200, help="Query vectors to measure recall with")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    parser.add_argument("--dimension", type=int, default=768, help="Stub embedding dimension (nomic-embed-text: 768)")
+    parser.add_argument("--reduced-dim", type=int, default=INDEX_CONFIG["reduced_dim"],
+                        help="Dimensions kept by the pca and truncate layouts")
+    parser.add_argument("--index-type", default=INDEX_CONFIG["type"], choices=["flat", "ivf_flat", "ivf_pq", "hnsw"],
+                        help="Index every layout is built on")
+    parser.add_argument("--layouts", help=f"Comma-separated subset of: {', '.join(LAYOUTS)}")
+    parser.add_argument("--mmap", action="store_true", help="Memory-map the index when timing the load")
+    parser.add_argument("--workdir", help="Build the corpus and indexes here instead of a temporary directory")
+    parser.add_argument("--keep", action="store_true", help="Keep the temporary directory afterwards")
+    parser.add_argument("--out", default="vector_benchmark.json", help="Write the results as JSON")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Show the pipeline's own logging")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    results = run_benchmark(args)
+    print_results(results, args.k)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import json
+import logging
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List
+
+import requests
+from config.settings import CHAT_CONFIG, CONTEXT_CONFIG
+
+if TYPE_CHECKING:
+    from langchain_community.llms import Ollama
+
+logger = logging.getLogger(__name__)
+
+# Public sampling fields of the LangChain Ollama client that /api/generate takes as "options"
+OLLAMA_OPTIONS = (
+    "mirostat", "mirostat_eta", "mirostat_tau", "num_ctx", "num_gpu", "num_thread", "num_predict",
+    "repeat_last_n", "repeat_penalty", "temperature", "stop", "tfs_z", "top_k", "top_p"
+)
+
+class ChatSession:
+    """Multi-turn conversation that hands Ollama's `context` back on every turn
+
+    Ollama returns the token state of the whole exchange with the final
+    /api/generate chunk; sending it with the next prompt lets the server skip
+    re-processing the system prompt and earlier turns. Each agent (model)
+    keeps its own state.
+    """
+
+    def __init__(self, history_token_budget: int = None):
+        self.history_token_budget = history_token_budget or CHAT_CONFIG["history_token_budget"]
+        self.session = requests.Session()
+        # agent -> {"context": token ids from Ollama, "turns": [(question, answer)]}
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self.last_stats: Dict[str, Any] = {}
+
+    def has_history(self, agent: str) -> bool:
+        return bool(self._states.get(agent, {}).get("turns"))
+
+    def reset(self):
+        self._states = {}
+
+    def _history_prefix(self, turns: List[tuple], budget: int) -> str:
+        """Most recent turns that fit in budget tokens, as plain text"""
+        chars = budget * CONTEXT_CONFIG["chars_per_token"]
+        kept = []
+        for question, answer in reversed(turns):
+            turn = f"User: {question}\nAssistant: {answer}\n"
+            if len(turn) > chars:
+                break
+            kept.append(turn)
+            chars -= len(turn)
+        if not kept:
+            return ""
+        return "PREVIOUS CONVERSATION:\n" + "\n".join(reversed(kept)) + "\n"
+
+    def stream(self, llm: "Ollama", agent: str, prompt: str, question: str) -> Iterator[str]:
+        """Stream one turn, continuing this agent's conversation"""
+        state = self._states.setdefault(agent, {"context": None, "turns": []})
+        context = state["context"]
+
+        if context and len(context) > self.history_token_budget:
+            # Start a fresh context from the newest history; trimming to half the budget
+            # means the re-prefill happens once per several turns, not on every turn
+            logger.info(f"Conversation reached {len(context)} tokens - trimming history")
+            prompt = self._history_prefix(state["turns"], self.history_token_budget // 2) + prompt
+            context = None
+
+        payload = {
+            "model": llm.model,
+            "prompt": prompt,
+            "system": llm.system,
+            "options": {
+                name: getattr(llm, name) for name in OLLAMA_OPTIONS if getattr(llm, name, None) is not None
+            },
+            "keep_alive": CHAT_CONFIG["keep_alive"],
+            "stream": True
+        }
+        if context:
+            payload["context"] = context
+
+        response = self.session.post(
+            f"{llm.base_url}/api/generate", json=payload, stream=True, timeout=llm.timeout
+        )
+        response.raise_for_status()
+
+        tokens = []
+        for line in response.iter_lines(decode_unicode=True):
+            if not line:
+                continue
+            data = json.loads(line)
+            if data.get("error"):
+                raise ValueError(data["error"])
+            if data.get("response"):
+                tokens.append(data["response"])
+                yield data["response"]
+            if data.get("done"):
+                state["context"] = data.get("context")
+                self.last_stats = {
+                    "prompt_tokens": data.get("prompt_eval_count"),
+                    "context_tokens": len(data.get("context") or []),
+                    "reused_context": bool(context)
+                }
+
+        state["turns"].append((question, "".join(tokens)))
@@ -0,0 +1,147 @@
+import re
+import zlib
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from pathlib import Path
+
+import numpy as np
+from config.settings import DEDUP_CONFIG
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+class ChunkDeduplicator:
+    """Spot chunks that are already indexed: exact text hashes plus MinHash/LSH
+
+    Every chunk gets a MinHash signature over its word shingles. Signatures
+    are split into bands and any chunk sharing a band bucket is a candidate;
+    a candidate counts as a near-duplicate when the signatures agree on at
+    least threshold of their positions (an estimate of Jaccard similarity).
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or DEDUP_CONFIG
+        self.num_perm = self.config["num_perm"]
+        self.bands = self.config["bands"]
+        self.rows = self.num_perm // self.bands
+        # Multiply-shift hash family; odd multipliers, fixed seed so saved signatures stay comparable
+        rng = np.random.default_rng(self.config["seed"])
+        self._a = rng.integers(1, 2 ** 63, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, self.num_perm, dtype=np.uint64)
+
+        self.exact: Dict[str, str] = {}
+        self.hashes: Dict[str, str] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(self.bands)]
+
+    def __len__(self) -> int:
+        return len(self.hashes)
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        # Whitespace differences alone don't make a different chunk
+        return hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).hexdigest()
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """MinHash of the word shingles; None for chunks too short to compare fuzzily"""
+        words = WORD_PATTERN.findall(text.lower())
+        size = self.config["shingle_size"]
+        if len(words) < size:
+            return None
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        values = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # uint64 arithmetic wraps, which is exactly the multiply-shift hash
+        hashed = (self._a[:, None] * values[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _register(self, doc_id: str, text_hash: str, signature: Optional[np.ndarray]):
+        self.exact.setdefault(text_hash, doc_id)
+        self.hashes[doc_id] = text_hash
+        if signature is not None:
+            self.signatures[doc_id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                self.buckets[band].setdefault(key, []).append(doc_id)
+
+    def _nearest(self, signature: np.ndarray) -> Optional[str]:
+        candidates = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self.buckets[band].get(key, ()))
+        best, best_similarity = None, self.config["threshold"]
+        for candidate in candidates:
+            similarity = float(np.mean(self.signatures[candidate] == signature))
+            if similarity >= best_similarity:
+                best, best_similarity = candidate, similarity
+        return best
+
+    def add(self, doc_id: str, text: str) -> Optional[Tuple[str, str]]:
+        """Register a chunk, or return (id, "exact" | "near") of the indexed chunk it duplicates"""
+        text_hash = self.text_hash(text)
+        if text_hash in self.exact:
+            return self.exact[text_hash], "exact"
+
+        signature = self.signature(text)
+        if signature is not None:
+            match = self._nearest(signature)
+            if match is not None:
+                return match, "near"
+
+        self._register(doc_id, text_hash, signature)
+        return None
+
+    def remove(self, ids: List[str]):
+        for doc_id in ids:
+            text_hash = self.hashes.pop(doc_id, None)
+            if text_hash is None:
+                continue
+            if self.exact.get(text_hash) == doc_id:
+                del self.exact[text_hash]
+            signature = self.signatures.pop(doc_id, None)
+            if signature is not None:
+                for band, key in enumerate(self._band_keys(signature)):
+                    bucket = self.buckets[band].get(key, [])
+                    if doc_id in bucket:
+                        bucket.remove(doc_id)
+                    if not bucket:
+                        self.buckets[band].pop(key, None)
+
+    def save(self, path: Path):
+        """Ids, hashes and signatures as plain arrays (no pickle); buckets are rebuilt on load"""
+        ids = list(self.hashes)
+        signatures = np.zeros((len(ids), self.num_perm), dtype=np.uint32)
+        has_signature = np.zeros(len(ids), dtype=bool)
+        for row, doc_id in enumerate(ids):
+            if doc_id in self.signatures:
+                signatures[row] = self.signatures[doc_id]
+                has_signature[row] = True
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                ids=np.frombuffer("\n".join(ids).encode("utf-8"), dtype=np.uint8),
+                hashes=np.frombuffer("\n".join(self.hashes[doc_id] for doc_id in ids).encode("ascii"), dtype=np.uint8),
+                signatures=signatures,
+                has_signature=has_signature
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, config: Dict[str, Any] = None) -> Optional["ChunkDeduplicator"]:
+        """None if the file was written with different MinHash settings"""
+        index = cls(config)
+        with np.load(path, allow_pickle=False) as data:
+            signatures = data["signatures"]
+            if signatures.shape[1] != index.num_perm:
+                return None
+            ids = data["ids"].tobytes().decode("utf-8").split("\n") if data["ids"].size else []
+            hashes = data["hashes"].tobytes().decode("ascii").split("\n") if data["hashes"].size else []
+            has_signature = data["has_signature"]
+
+        for row, (doc_id, text_hash) in enumerate(zip(ids, hashes)):
+            index._register(doc_id, text_hash, signatures[row] if has_signature[row] else None)
+        return index
@@ -0,0 +1,30 @@
+import json
+import logging
+from typing import Dict, Any, Iterator, Optional
+
+import requests
+from config.settings import OLLAMA_CONFIG
+
+logger = logging.getLogger(__name__)
+
+def stream_remote(server_url: str, question: str, agent: str = "auto",
+                  filters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """Yield the same events as DualAgent.stream_question from a running --serve process"""
+    try:
+        with requests.post(
+            f"{server_url.rstrip('/')}/ask",
+            json={"question": question, "agent": agent, "stream": True, "filters": filters},
+            stream=True,
+            timeout=OLLAMA_CONFIG["timeout"]
+        ) as response:
+            if response.status_code == 503:
+                # Every queue for the model is full; the body is the error event
+                yield response.json()
+                return
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+    except requests.RequestException as e:
+        logger.error(f"Error contacting server {server_url}: {e}")
+        yield {"type": "error", "answer": f"Server unavailable: {e}", "success": False}
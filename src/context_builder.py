@@ -0,0 +1,152 @@
+import re
+import math
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from config.settings import CONTEXT_CONFIG
+import profiling
+
+logger = logging.getLogger(__name__)
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def _overlap(left: str, right: str, min_chars: int) -> int:
+    """Length of the longest suffix of left that is also a prefix of right"""
+    if len(left) < min_chars or len(right) < min_chars:
+        return 0
+    probe = right[:min_chars]
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+def _shingles(text: str, size: int = 3) -> Set[tuple]:
+    words = WORD_PATTERN.findall(text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+def _containment(a: Set[tuple], b: Set[tuple]) -> float:
+    """Share of a's shingles that also appear in b (catches copies of part of a passage)"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a)
+
+class ContextBuilder:
+    """Turn ranked chunks into as few prompt tokens as possible
+
+    Chunks from the same source that overlap (chunk_overlap) are stitched back
+    together, contained and near-duplicate chunks are dropped, and the
+    remaining passages are packed in rank order until the token budget is full.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or CONTEXT_CONFIG
+
+    def count_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.config["chars_per_token"])
+
+    def _merge(self, documents: List[Document]) -> List[Dict[str, Any]]:
+        min_chars = self.config["min_overlap_chars"]
+        threshold = self.config["near_duplicate_threshold"]
+        passages: List[Dict[str, Any]] = []
+
+        for doc in documents:
+            text = doc.page_content.strip()
+            if not text:
+                continue
+            key = (doc.metadata.get("source"), doc.metadata.get("page"))
+
+            merged = False
+            for passage in passages:
+                if passage["key"] != key:
+                    continue
+                if text in passage["text"]:
+                    merged = True
+                elif passage["text"] in text:
+                    passage["text"] = text
+                    merged = True
+                else:
+                    after = _overlap(passage["text"], text, min_chars)
+                    before = _overlap(text, passage["text"], min_chars) if not after else 0
+                    if after:
+                        passage["text"] += text[after:]
+                        merged = True
+                    elif before:
+                        passage["text"] = text + passage["text"][before:]
+                        merged = True
+                if merged:
+                    passage["shingles"] = _shingles(passage["text"])
+                    break
+            if merged:
+                continue
+
+            shingles = _shingles(text)
+            if any(_containment(shingles, passage["shingles"]) >= threshold for passage in passages):
+                continue
+            passages.append({
+                "key": key, "text": text, "metadata": doc.metadata, "shingles": shingles
+            })
+        return passages
+
+    def _truncate(self, text: str, budget: int) -> str:
+        limit = budget * self.config["chars_per_token"]
+        cut = text[:limit]
+        # Prefer ending on a paragraph or sentence instead of mid-word
+        for boundary in ("\n\n", "\n", ". "):
+            position = cut.rfind(boundary)
+            if position > limit // 2:
+                return cut[:position + 1].rstrip()
+        return cut
+
+    def baseline_tokens(self, documents: List[Document]) -> int:
+        """Tokens of the unpacked top baseline_k chunks, the context sent without packing"""
+        return self.count_tokens("\n\n".join(doc.page_content for doc in documents[:self.config["baseline_k"]]))
+
+    def build(self, documents: List[Document], budget: int) -> List[Document]:
+        """Merged, de-duplicated passages (best first) that fit in budget tokens
+
+        tokens_saved compares against the baseline top-k context, not the
+        over-fetched candidates, and goes negative when packing sends more.
+        """
+        if not documents:
+            return []
+
+        with profiling.span("pack_context") as stage:
+            packed, used = self._pack(documents, budget)
+            baseline = self.baseline_tokens(documents)
+            stage["tokens_saved"] = baseline - used
+
+        logger.info(f"Context packed: {len(documents)} chunks -> {len(packed)} passages, "
+                    f"{used} tokens vs {baseline} for the top {self.config['baseline_k']} "
+                    f"(saved {baseline - used})")
+        return packed
+
+    def _pack(self, documents: List[Document], budget: int) -> Tuple[List[Document], int]:
+        packed, used = [], 0
+        for passage in self._merge(documents):
+            tokens = self.count_tokens(passage["text"])
+            text = passage["text"]
+            if used + tokens > budget:
+                if packed:
+                    continue
+                # The best passage alone is over budget: keep its head rather than nothing
+                text = self._truncate(text, budget)
+                tokens = self.count_tokens(text)
+            packed.append(Document(page_content=text, metadata=passage["metadata"]))
+            used += tokens
+        return packed, used
+
+
+class PackedRetriever(BaseRetriever):
+    """Wrap a retriever so the QA chain only ever sees packed context"""
+    retriever: Any
+    builder: Any
+    budget: int
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                vector: Optional[List[float]] = None) -> List[Document]:
+        return self.builder.build(self.retriever.invoke(query, vector=vector), self.budget)
@@ -0,0 +1,274 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from pathlib import Path
+from collections.abc import MutableMapping
+
+import numpy as np
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+from search_filters import filter_clause
+
+logger = logging.getLogger(__name__)
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """Chunk text and metadata in SQLite, fetched by id only when a search needs them
+
+    Writes stay in an open transaction until commit(), so the file on disk
+    only ever moves from one saved index to the next. Published store
+    versions are opened read_only and never written to; bringing an older
+    file up to date is left to migrate(), which builds run on their copy.
+    """
+
+    def __init__(self, path: Path, read_only: bool = False):
+        self.path = Path(path)
+        self.read_only = read_only
+        self._lock = threading.Lock()
+        if read_only:
+            self._conn = sqlite3.connect(f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._create_tables()
+        self.positions = PositionMap(self)
+
+    def _create_tables(self):
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS positions (position INTEGER PRIMARY KEY, id TEXT NOT NULL)"
+        )
+        # Filterable metadata, one indexed column per field, so filters resolve to ids without a scan
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS attributes ("
+            "id TEXT PRIMARY KEY, source TEXT, name TEXT, page INTEGER, extension TEXT, mtime REAL)"
+        )
+        for column in ("source", "name", "extension", "mtime"):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS attributes_{column} ON attributes({column})")
+        # Every file a chunk stands for: a de-duplicated chunk has more than its primary source
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunk_sources ("
+            "id TEXT NOT NULL, source TEXT NOT NULL, name TEXT NOT NULL, PRIMARY KEY (id, source))"
+        )
+        for column in ("source", "name"):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS chunk_sources_{column} ON chunk_sources({column})")
+        self._conn.commit()
+
+    @staticmethod
+    def _attribute_row(doc_id: str, metadata: Dict[str, Any]) -> Tuple:
+        source = str(metadata.get("source") or "")
+        mtime = metadata.get("mtime")
+        if mtime is None and source and os.path.exists(source):
+            mtime = os.path.getmtime(source)
+        page = metadata.get("page")
+        return (
+            doc_id, source, Path(source).name, page if isinstance(page, int) else None,
+            Path(source).suffix.lower(), mtime
+        )
+
+    @staticmethod
+    def _source_rows(doc_id: str, metadata: Dict[str, Any]) -> List[Tuple[str, str, str]]:
+        sources = metadata.get("sources") or [metadata.get("source")]
+        return [(doc_id, str(source), Path(str(source)).name) for source in dict.fromkeys(sources) if source]
+
+    def _replace_sources(self, items: Dict[str, Dict[str, Any]]):
+        self._conn.executemany("DELETE FROM chunk_sources WHERE id = ?", [(doc_id,) for doc_id in items])
+        self._conn.executemany(
+            "INSERT INTO chunk_sources VALUES (?, ?, ?)",
+            [row for doc_id, metadata in items.items() for row in self._source_rows(doc_id, metadata)]
+        )
+
+    def migrate(self) -> bool:
+        """Bring a file written by an older version up to date; True if anything changed
+
+        Earlier stores used WAL journaling, which read-only readers can't open
+        without writing next to the file, and predate the filter attributes
+        and the chunk_sources table.
+        """
+        with self._lock:
+            changed = self._conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            if changed:
+                self._conn.execute("PRAGMA journal_mode=DELETE")
+            rows = self._conn.execute(
+                "SELECT id, metadata FROM documents WHERE id NOT IN (SELECT id FROM attributes)"
+            ).fetchall()
+            if rows:
+                logger.info(f"Indexing filterable metadata for {len(rows)} chunks in {self.path.name}")
+                self._conn.executemany(
+                    "INSERT INTO attributes VALUES (?, ?, ?, ?, ?, ?)",
+                    [self._attribute_row(doc_id, json.loads(metadata)) for doc_id, metadata in rows]
+                )
+            unsourced = self._conn.execute(
+                "SELECT id, metadata FROM documents WHERE id NOT IN (SELECT id FROM chunk_sources)"
+            ).fetchall()
+            if unsourced:
+                logger.info(f"Indexing the sources of {len(unsourced)} chunks in {self.path.name}")
+                self._replace_sources({doc_id: json.loads(metadata) for doc_id, metadata in unsourced})
+            if rows or unsourced:
+                self._conn.commit()
+            return changed or bool(rows) or bool(unsourced)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        rows = [
+            (doc_id, doc.page_content, json.dumps(doc.metadata, ensure_ascii=False, default=str))
+            for doc_id, doc in texts.items()
+        ]
+        attributes = [self._attribute_row(doc_id, doc.metadata) for doc_id, doc in texts.items()]
+        with self._lock:
+            try:
+                self._conn.executemany("INSERT INTO documents VALUES (?, ?, ?)", rows)
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Tried to add ids that already exist: {e}")
+            self._conn.executemany("INSERT OR REPLACE INTO attributes VALUES (?, ?, ?, ?, ?, ?)", attributes)
+            self._replace_sources({doc_id: doc.metadata for doc_id, doc in texts.items()})
+
+    def update_metadata(self, metadatas: Dict[str, Dict[str, Any]]):
+        """Replace the metadata of existing chunks, keeping their filterable attributes and sources in step"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE documents SET metadata = ? WHERE id = ?",
+                [(json.dumps(metadata, ensure_ascii=False, default=str), doc_id) for doc_id, metadata in metadatas.items()]
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO attributes VALUES (?, ?, ?, ?, ?, ?)",
+                [self._attribute_row(doc_id, metadata) for doc_id, metadata in metadatas.items()]
+            )
+            self._replace_sources(metadatas)
+
+    def delete(self, ids: List) -> None:
+        with self._lock:
+            self._conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.executemany("DELETE FROM attributes WHERE id = ?", [(doc_id,) for doc_id in ids])
+            self._conn.executemany("DELETE FROM chunk_sources WHERE id = ?", [(doc_id,) for doc_id in ids])
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content, metadata FROM documents WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def fetch(self, ids: List[str]) -> Dict[str, Document]:
+        """id -> chunk for every id present, in batched IN queries"""
+        found = {}
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for doc_id, content, metadata in self._conn.execute(
+                    f"SELECT id, content, metadata FROM documents WHERE id IN ({placeholders})", batch
+                ):
+                    found[doc_id] = Document(page_content=content, metadata=json.loads(metadata))
+        return found
+
+    def search_many(self, ids: List[str]) -> List[Document]:
+        """Fetch several chunks in one query, keeping the order of ids and skipping missing ones"""
+        if not ids:
+            return []
+        found = self.fetch(ids)
+        return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def existing_ids(self, ids: List[str]) -> List[str]:
+        """The subset of ids stored here, without reading their text"""
+        existing = []
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                existing += [row[0] for row in self._conn.execute(
+                    f"SELECT id FROM documents WHERE id IN ({placeholders})", batch
+                )]
+        return existing
+
+    def matching_ids(self, filters: Dict[str, Any]) -> List[str]:
+        """Chunk ids whose metadata passes the (normalized) filters"""
+        where, params = filter_clause(filters)
+        with self._lock:
+            return [row[0] for row in self._conn.execute(f"SELECT a.id FROM attributes a WHERE {where}", params)]
+
+    def matching_positions(self, filters: Dict[str, Any]) -> np.ndarray:
+        """FAISS rows whose chunk passes the filters, for restricting a vector search"""
+        where, params = filter_clause(filters)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT p.position FROM positions p JOIN attributes a ON a.id = p.id WHERE {where}", params
+            ).fetchall()
+        return np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+
+    def replace_positions(self, mapping: Dict[int, str]):
+        """Swap in a whole new position -> id table (after FAISS renumbers on delete)"""
+        with self._lock:
+            self._conn.execute("DELETE FROM positions")
+            self._conn.executemany("INSERT INTO positions VALUES (?, ?)", sorted(mapping.items()))
+
+    def reset(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents")
+            self._conn.execute("DELETE FROM positions")
+            self._conn.execute("DELETE FROM attributes")
+            self._conn.execute("DELETE FROM chunk_sources")
+            self._conn.commit()
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def rollback(self):
+        with self._lock:
+            self._conn.rollback()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class PositionMap(MutableMapping):
+    """FAISS row -> chunk id, read from the docstore's positions table on demand
+
+    Rows are always numbered 0..n-1, so the length is the highest row plus one.
+    """
+
+    def __init__(self, docstore: SQLiteDocstore):
+        self._docstore = docstore
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._docstore._lock:
+            return self._docstore._conn.execute(sql, params).fetchall()
+
+    def __getitem__(self, position: int) -> str:
+        rows = self._query("SELECT id FROM positions WHERE position = ?", (int(position),))
+        if not rows:
+            raise KeyError(position)
+        return rows[0][0]
+
+    def __setitem__(self, position: int, doc_id: str):
+        self.update({position: doc_id})
+
+    def __delitem__(self, position: int):
+        with self._docstore._lock:
+            self._docstore._conn.execute("DELETE FROM positions WHERE position = ?", (int(position),))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter([row[0] for row in self._query("SELECT position FROM positions ORDER BY position")])
+
+    def __len__(self) -> int:
+        highest: Optional[int] = self._query("SELECT MAX(position) FROM positions")[0][0]
+        return 0 if highest is None else highest + 1
+
+    def update(self, mapping: Dict[int, str] = (), **kwargs):
+        rows = [(int(position), doc_id) for position, doc_id in dict(mapping).items()]
+        with self._docstore._lock:
+            self._docstore._conn.executemany("INSERT OR REPLACE INTO positions VALUES (?, ?)", rows)
+
+    def items(self) -> List[Tuple[int, str]]:
+        return self._query("SELECT position, id FROM positions ORDER BY position")
+
+    def values(self) -> List[str]:
+        return [doc_id for _, doc_id in self.items()]
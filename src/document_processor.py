@@ -1,20 +1,79 @@
+import os
 import logging
-from typing import List, Optional
+from typing import List, Optional, Tuple, Iterable, Iterator
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.document_loaders import TextLoader, PyPDFLoader
-from config.settings import DATA_PATHS, PROCESSING_CONFIG
+from pypdf import PdfReader, __version__ as pypdf_version
+from config.settings import DATA_PATHS, PROCESSING_CONFIG, TEXT_CACHE_CONFIG
+from text_cache import ExtractedTextCache
+import profiling
 
 logger = logging.getLogger(__name__)
 
+# One processor per pool worker, created by the pool initializer
+_worker_processor = None
+
+def _init_worker():
+    global _worker_processor
+    _worker_processor = DocumentProcessor(parallel=False)
+
+def _load_task(task: Tuple[Path, Optional[Tuple[int, int]]]) -> Optional[List[Document]]:
+    file_path, page_range = task
+    if page_range is None:
+        return _worker_processor.load_single_document(file_path)
+    return _worker_processor.load_pdf_pages(file_path, *page_range)
+
+class MarkdownLoader(TextLoader):
+    """Markdown is kept as plain text; the splitter already breaks on blank lines"""
+
+    def __init__(self, file_path: str):
+        super().__init__(file_path, encoding="utf-8", autodetect_encoding=True)
+
+class DocxLoader:
+    """Paragraphs and table rows of a Word document as a single Document"""
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+
+    def load(self) -> List[Document]:
+        # Optional dependency: only needed when there are .docx files to read
+        import docx
+
+        document = docx.Document(self.file_path)
+        blocks = [paragraph.text for paragraph in document.paragraphs if paragraph.text.strip()]
+        for table in document.tables:
+            for row in table.rows:
+                cells = [cell.text.strip() for cell in row.cells if cell.text.strip()]
+                if cells:
+                    blocks.append(" | ".join(cells))
+        return [Document(page_content="\n\n".join(blocks), metadata={"source": self.file_path})]
+
+# Bump an entry when its loader's output changes so cached text is re-extracted
+LOADER_VERSIONS = {
+    '.pdf': f"pdf1-pypdf{pypdf_version}",
+    '.txt': "txt1",
+    '.md': "md1",
+    '.docx': "docx1"
+}
+
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, parallel: bool = None):
+        self.parallel = PROCESSING_CONFIG["parallel_loading"] if parallel is None else parallel
+        self.max_workers = PROCESSING_CONFIG["max_workers"] or os.cpu_count() or 1
+        self.pdf_pages_per_task = PROCESSING_CONFIG["pdf_pages_per_task"]
+
         self.loaders = {
             '.pdf': PyPDFLoader,
-            '.txt': TextLoader
+            '.txt': TextLoader,
+            '.md': MarkdownLoader,
+            '.docx': DocxLoader
         }
+        self.text_cache = ExtractedTextCache(loader_versions=LOADER_VERSIONS) if TEXT_CACHE_CONFIG["enabled"] else None
 
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=PROCESSING_CONFIG["chunk_size"],
@@ -26,8 +85,15 @@ class DocumentProcessor:
         try: 
             extension = file_path.suffix.lower()
             if extension in self.loaders:
-                loader = self.loaders[extension](str(file_path))
-                return loader.load()
+                with profiling.span("load") as stage:
+                    loader = self.loaders[extension](str(file_path))
+                    documents = loader.load()
+                    stage["documents"] = len(documents)
+                # Lets retrieval filter on modification time
+                mtime = file_path.stat().st_mtime
+                for document in documents:
+                    document.metadata["mtime"] = mtime
+                return documents
             else: 
                 logger.warning(f"Format not supported: {extension}")
                 return None
@@ -35,26 +101,159 @@ class DocumentProcessor:
             logger.error(f"Error loading {file_path}: {e}")
             return None
 
-    def load_all_documents(self) -> List[Document]:
-        documents = []
+    def load_document(self, file_path: Path) -> Optional[List[Document]]:
+        """load_single_document, served from the extracted-text cache when the file is unchanged"""
+        if self.text_cache is None:
+            return self.load_single_document(file_path)
+
+        documents = self.text_cache.get(file_path)
+        if documents is None:
+            documents = self.load_single_document(file_path)
+            if documents is not None:
+                self.text_cache.put(file_path, documents)
+        return documents
+
+    def cleanup_text_cache(self, file_paths: List[Path] = None) -> int:
+        """Drop cached text for files that were deleted or changed since it was extracted"""
+        if self.text_cache is None:
+            return 0
+        return self.text_cache.cleanup(self.discover_files() if file_paths is None else file_paths)
+
+    def load_pdf_pages(self, file_path: Path, start: int, end: int) -> Optional[List[Document]]:
+        """Load pages [start, end) of a PDF with the same metadata PyPDFLoader produces"""
+        try:
+            reader = PdfReader(str(file_path))
+            mtime = file_path.stat().st_mtime
+            return [
+                Document(
+                    page_content=reader.pages[page].extract_text(),
+                    metadata={"source": str(file_path), "page": page, "mtime": mtime}
+                )
+                for page in range(start, min(end, len(reader.pages)))
+            ]
+        except Exception as e:
+            logger.error(f"Error loading {file_path} pages {start}-{end}: {e}")
+            return None
+
+    def discover_files(self) -> List[Path]:
+        """List loadable files in data/raw in a stable order"""
         raw_dir = DATA_PATHS["raw_documents"]
 
         if not raw_dir.exists():
             logger.warning(f"Document directory not found: {raw_dir}")
-            return documents
-        
-        for file_path in raw_dir.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in self.loaders:
-                loaded_docs = self.load_single_document(file_path)
-                if loaded_docs:
-                    documents.extend(loaded_docs)
-                    logger.info(f"Loaded: {file_path.name} ({len(loaded_docs)} documents)")
+            return []
+
+        candidates = raw_dir.rglob("*") if PROCESSING_CONFIG["recursive"] else raw_dir.iterdir()
+        return sorted(
+            file_path for file_path in candidates
+            if file_path.is_file() and file_path.suffix.lower() in self.loaders
+        )
+
+    def _plan_tasks(self, file_path: Path) -> List[Optional[Tuple[int, int]]]:
+        """Split large PDFs into page ranges; everything else is one task"""
+        if file_path.suffix.lower() != ".pdf":
+            return [None]
+        try:
+            num_pages = len(PdfReader(str(file_path)).pages)
+        except Exception:
+            # Let load_single_document report the error from the worker
+            return [None]
+
+        if num_pages <= self.pdf_pages_per_task:
+            return [None]
+        return [
+            (start, start + self.pdf_pages_per_task)
+            for start in range(0, num_pages, self.pdf_pages_per_task)
+        ]
+
+    def iter_loaded_files(self, file_paths: List[Path]) -> Iterator[Tuple[Path, Optional[List[Document]]]]:
+        """Yield (file, documents) in input order; documents is None if loading failed"""
+        if not self.parallel:
+            for file_path in file_paths:
+                yield file_path, self.load_document(file_path)
+            return
+
+        def iter_tasks():
+            for file_path in file_paths:
+                cached = self.text_cache.get(file_path) if self.text_cache is not None else None
+                if cached is not None:
+                    yield file_path, cached, True
+                    continue
+                ranges = self._plan_tasks(file_path)
+                for position, page_range in enumerate(ranges):
+                    yield file_path, page_range, position == len(ranges) - 1
+
+        # Keep a bounded number of tasks in flight so parsed pages don't pile up
+        # in memory while the consumer is busy embedding
+        window = self.max_workers * 2
+        tasks = iter_tasks()
+        pending = deque()
+        parts = []
+
+        with ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker) as executor:
+            while True:
+                while len(pending) < window:
+                    task = next(tasks, None)
+                    if task is None:
+                        break
+                    file_path, work, last = task
+                    if isinstance(work, list):
+                        # Cache hit: queued in place so files still come out in input order
+                        pending.append((file_path, last, False, work))
+                    else:
+                        pending.append((file_path, last, True, executor.submit(_load_task, (file_path, work))))
+
+                if not pending:
+                    break
+
+                file_path, last, parsed, result = pending.popleft()
+                parts.append(result.result() if parsed else result)
+                if last:
+                    if any(part is None for part in parts):
+                        yield file_path, None
+                    else:
+                        documents = [doc for part in parts for doc in part]
+                        if parsed and self.text_cache is not None:
+                            self.text_cache.put(file_path, documents)
+                        yield file_path, documents
+                    parts = []
+
+    def load_all_documents(self) -> List[Document]:
+        documents = []
+
+        for file_path, loaded_docs in self.iter_loaded_files(self.discover_files()):
+            if loaded_docs:
+                documents.extend(loaded_docs)
+                logger.info(f"Loaded: {file_path.name} ({len(loaded_docs)} documents)")
 
         return documents
     
     def split_documents(self, documents: List[Document]) -> List[Document]:
         return self.text_splitter.split_documents(documents)
 
+    def process_file(self, file_path: Path) -> Optional[List[Document]]:
+        """Load and split a single file, returning None if it failed to load"""
+        loaded_docs = self.load_document(file_path)
+        if loaded_docs is None:
+            return None
+        return self.split_documents(loaded_docs)
+
+    def iter_split(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """Split documents one at a time instead of materializing every chunk"""
+        for document in documents:
+            with profiling.span("split") as stage:
+                chunks = self.text_splitter.split_documents([document])
+                stage["chunks"] = len(chunks)
+            yield from chunks
+
+    def iter_processed_files(self, file_paths: List[Path]) -> Iterator[Tuple[Path, Optional[Iterator[Document]]]]:
+        """Yield (file, chunk iterator) in order, loading in parallel when enabled"""
+        for file_path, loaded_docs in self.iter_loaded_files(file_paths):
+            if loaded_docs is None:
+                yield file_path, None
+            else:
+                yield file_path, self.iter_split(loaded_docs)
+
     def process_documents(self) -> List[Document]:
         logger.info("Loading documents... ")
         documents = self.load_all_documents()
@@ -1,45 +1,62 @@
+import time
+import asyncio
 import logging 
-from typing import Dict, Any, List
-from langchain_community.llms import Ollama
-from langchain.prompts import PromptTemplate
-from langchain.chains import RetrievalQA
+import threading
+from contextlib import nullcontext
+from typing import Dict, Any, List, Iterator, Optional, Callable
+from langchain.schema import Document
 
-from config.settings import OLLAMA_CONFIG
+from config.settings import (
+    OLLAMA_CONFIG, ANSWER_CACHE_CONFIG, CONTEXT_CONFIG, ROUTER_CONFIG, SCHEDULER_CONFIG, SHARD_CONFIG
+)
 from knowledge_base import KnowledgeBase
+from answer_cache import AnswerCache
+from context_builder import ContextBuilder, PackedRetriever
+from agent_router import AgentRouter
+from chat_session import ChatSession
+from model_scheduler import ModelScheduler, SchedulerFullError, DeadlineExceededError
+import profiling
 
 logger = logging.getLogger(__name__)
 
 class DualAgent:
-    def __init__(self):
-        self.coder_llm = Ollama(
-            model=OLLAMA_CONFIG["models"]["coder"],
-            base_url=OLLAMA_CONFIG["base_url"],
-            timeout=OLLAMA_CONFIG["timeout"],
-            temperature=0.1,
-            num_predict=512,  
-            num_gpu=1
-            system="You are a senior software engineer specialized in development."
-        )
-
-        self.assistant_llm = Ollama(
-            model=OLLAMA_CONFIG["models"]["assistant"],
-            base_url=OLLAMA_CONFIG["base_url"],
-            timeout=OLLAMA_CONFIG["timeout"],
-            temperature=0.3,
-            num_predict=256, 
-            system="You are an intelligent and organized personal assistant."
-        )
+    """Coder and assistant agents over one knowledge base
+
+    Each agent's Ollama client and QA chain are created the first time a
+    question is routed to it, so a process that only ever uses one agent
+    never builds (or imports) the other's.
+    """
 
+    def __init__(self):
         self.knowledge_base = KnowledgeBase()
+        self.answer_cache = AnswerCache() if ANSWER_CACHE_CONFIG["enabled"] else None
+        self.context_builder = ContextBuilder() if CONTEXT_CONFIG["enabled"] else None
+        # Fetch a few extra chunks when packing; overlaps and duplicates get squeezed out
+        self.retrieval_k = CONTEXT_CONFIG["candidates"] if self.context_builder else CONTEXT_CONFIG["baseline_k"]
         self.agents = self._setup_agents()
+        self.router = AgentRouter(
+            {agent_id: config["examples"] for agent_id, config in self.agents.items()},
+            self.knowledge_base.embed_queries
+        ) if ROUTER_CONFIG["enabled"] else None
+        self.llms = {}
         self.qa_chains = {}
+        # Set by initialize() once the knowledge base is loaded; None means direct model answers
+        self.retriever = None
+        self._lazy_lock = threading.Lock()
+        # Per-model queues in front of Ollama; None lets every request through
+        self.scheduler = ModelScheduler() if SCHEDULER_CONFIG["enabled"] else None
 
     def _setup_agents(self) -> Dict[str, Any]:
         """Configure both agents with their specific models"""
         return {
             "coder": {
                 "name": "💻 Code Assistant (Mistral 7B)",
-                "model": self.coder_llm,
+                "llm": {
+                    "temperature": 0.1,
+                    "num_predict": 512,
+                    "num_gpu": 1,
+                    "system": "You are a senior software engineer specialized in development."
+                },
                 "prompt_template": """You are a senior software engineer specialized in development. Use the context to help you.
 
 TECHNICAL CONTEXT:
@@ -71,12 +88,31 @@ TECHNICAL RESPONSE:""",
                     "python", "javascript", "java", "html", "css", "sql", "api",
                     "debug", "error", "variable", "import", "export", "compile",
                     "syntax", "framework", "library", "git", "docker", "database"
+                ],
+                # Labelled questions the embedding router averages into this agent's centroid
+                "examples": [
+                    "How do I fix this Python exception in my script?",
+                    "Write a function that parses a CSV file and returns a list of dicts",
+                    "Why is my SQL query so slow and how can I add an index?",
+                    "Refactor this class to use dependency injection",
+                    "What's the difference between a list and a tuple?",
+                    "Explain how this recursive algorithm works and its complexity",
+                    "Set up a Dockerfile for a Flask application",
+                    "My React component re-renders infinitely, what is wrong?",
+                    "¿Cómo implemento una API REST con autenticación por token?",
+                    "¿Por qué falla mi bucle al recorrer el diccionario?",
+                    "Escribe pruebas unitarias para este módulo",
+                    "Resolve a merge conflict in git"
                 ]
             },
             
             "assistant": {
                 "name": "📊 General Assistant (Gemma 2B)", 
-                "model": self.assistant_llm,
+                "llm": {
+                    "temperature": 0.3,
+                    "num_predict": 256,
+                    "system": "You are an intelligent and organized personal assistant."
+                },
                 "prompt_template": """You are an intelligent and organized personal assistant. Use the context to provide accurate responses.
 
 DOCUMENT CONTEXT:
@@ -109,74 +145,238 @@ ORGANIZED RESPONSE:""",
                     "meeting", "agenda", "format", "template", "table", "chart",
                     "plan", "strategy", "communication", "presentation", "budget",
                     "task", "project", "calendar", "reminder", "analysis"
+                ],
+                "examples": [
+                    "Draft a polite email declining the meeting invitation",
+                    "Summarize this report in five bullet points",
+                    "Create an agenda for Monday's team meeting",
+                    "Help me plan the project milestones for next quarter",
+                    "Organize these notes into a structured document",
+                    "Write a cover letter for a marketing position",
+                    "Make a monthly budget table for household expenses",
+                    "What are the key takeaways from this contract?",
+                    "¿Puedes redactar un correo para el cliente sobre el retraso?",
+                    "Resume este documento en un párrafo",
+                    "Organiza mis tareas de la semana por prioridad",
+                    "Prepare talking points for my presentation to the board"
                 ]
             }
         }
     
-    def initialize(self) -> bool:
-        """Initialize both agents with the knowledge base"""
-        if self.knowledge_base.load_knowledge_base():
-            retriever = self.knowledge_base.get_retriever()
+    def initialize(self, prewarm: bool = None) -> bool:
+        """Load the knowledge base; each agent's chain is built on its first question"""
+        prewarm = SCHEDULER_CONFIG["prewarm"] if prewarm is None else prewarm
+        if prewarm and self.scheduler:
+            # Loads both models while the knowledge base is read
+            self.scheduler.prewarm()
+
+        with profiling.span("load_knowledge_base"):
+            loaded = self.knowledge_base.load_knowledge_base()
+        if self.answer_cache:
+            self.answer_cache.sync_version(self.knowledge_base.version if loaded else None)
+
+        if loaded:
+            retriever = self.knowledge_base.get_retriever(k=self.retrieval_k)
             if retriever:
-                # Create QA chains for EACH agent
-                for agent_id, config in self.agents.items():
+                self.retriever = retriever
+                self.qa_chains = {}
+                # Rebuilt indexes are swapped in under the same retriever, no restart needed
+                self.knowledge_base.watch_for_updates(on_swap=self._knowledge_base_swapped)
+                logger.info("Dual Agent initialized - Mistral 7B + Gemma 2B")
+                return True
+        
+        logger.warning("Knowledge base not found - using direct model responses")
+        return True  
+    
+    def llm(self, agent: str):
+        """The agent's Ollama client, created on first use"""
+        if agent not in self.llms:
+            with self._lazy_lock:
+                if agent not in self.llms:
+                    # Imported here: the Ollama client pulls in aiohttp and most of langchain_community
+                    from langchain_community.llms import Ollama
+                    self.llms[agent] = Ollama(
+                        model=OLLAMA_CONFIG["models"][agent],
+                        base_url=OLLAMA_CONFIG["base_url"],
+                        timeout=OLLAMA_CONFIG["timeout"],
+                        **self.agents[agent]["llm"]
+                    )
+        return self.llms[agent]
+
+    def qa_chain(self, agent: str):
+        """The agent's RetrievalQA chain over the knowledge base, created on first use"""
+        if agent not in self.qa_chains:
+            llm = self.llm(agent)
+            with self._lazy_lock:
+                if agent not in self.qa_chains:
+                    from langchain.prompts import PromptTemplate
+                    from langchain.chains import RetrievalQA
                     prompt = PromptTemplate(
-                        template=config["prompt_template"],
+                        template=self.agents[agent]["prompt_template"],
                         input_variables=["context", "question"]
                     )
-                    
-                    self.qa_chains[agent_id] = RetrievalQA.from_chain_type(
-                        llm=config["model"],  
+
+                    agent_retriever = self.retriever
+                    if self.context_builder:
+                        agent_retriever = PackedRetriever(
+                            retriever=self.retriever,
+                            builder=self.context_builder,
+                            budget=CONTEXT_CONFIG["token_budget"][agent]
+                        )
+
+                    self.qa_chains[agent] = RetrievalQA.from_chain_type(
+                        llm=llm,
                         chain_type="stuff",
-                        retriever=retriever,
+                        retriever=agent_retriever,
                         chain_type_kwargs={"prompt": prompt},
                         return_source_documents=True
                     )
-                
-                logger.info("Dual Agent initialized - Mistral 7B + Gemma 2B")
-                return True
-        
-        logger.warning("Knowledge base not found - using direct model responses")
-        return True  
-    
-    def ask_question(self, question: str, agent: str = "auto") -> Dict[str, Any]:
-        """Answer using the appropriate agent"""
-        #If there's no QA chains, use model direct answer
-        if not self.qa_chains:
-            return self._direct_model_response(question, agent)
-        
+        return self.qa_chains[agent]
+
+    def _model_slot(self, agent: str, priority: str):
+        """Wait for the agent's model to have a free slot; yields {"queue_wait": seconds}"""
+        if self.scheduler is None:
+            return nullcontext({"queue_wait": 0.0})
+        return self.scheduler.slot(OLLAMA_CONFIG["models"][agent], priority)
+
+    @staticmethod
+    def _rejected(e: Exception) -> Dict[str, Any]:
+        """Result for work the scheduler turned away, so callers can tell it from a failure"""
+        logger.warning(str(e))
+        return {
+            "answer": f"Error: {e}",
+            "success": False,
+            "busy": True,
+            "sources": []
+        }
+
+    def _knowledge_base_swapped(self, version: Optional[str]):
+        if self.answer_cache:
+            self.answer_cache.sync_version(version)
+
+    def ask_question(self, question: str, agent: str = "auto",
+                     documents: Optional[List[Document]] = None,
+                     filters: Optional[Dict[str, Any]] = None,
+                     priority: str = "interactive",
+                     vector: Optional[List[float]] = None) -> Dict[str, Any]:
+        """Answer using the appropriate agent, optionally with already retrieved documents
+
+        filters restrict retrieval to matching chunks (see search_filters).
+        priority orders the request in its model's queue ("interactive" or "batch").
+        vector is the question's embedding when the caller already made it.
+        """
+        with profiling.trace("ask_question"):
+            return self._ask_question(question, agent, documents, filters, priority, vector)
+
+    def _ask_question(self, question: str, agent: str, documents: Optional[List[Document]],
+                      filters: Optional[Dict[str, Any]] = None,
+                      priority: str = "interactive",
+                      vector: Optional[List[float]] = None) -> Dict[str, Any]:
+        embed = self._memoized_query_embedding(question, vector)
+
         # Automatic agent detection
+        routing = None
         if agent == "auto":
-            agent = self._detect_agent(question)
+            routing = self.route(question, embed)
+            agent = routing["agent"]
         
-        if agent not in self.qa_chains:
+        if agent not in self.agents:
             return {
                 "answer": f"Invalid agent: {agent}",
                 "success": False
             }
-        
+
+        # Cached answers aren't keyed by filter, so filtered questions bypass the cache
+        use_cache = self.answer_cache is not None and not filters
+        if use_cache:
+            start = time.perf_counter()
+            cached = self._cached_answer(agent, question, embed)
+            if cached:
+                logger.info(f"Answer cache hit ({cached['cache_match']}) in "
+                            f"{(time.perf_counter() - start) * 1000:.1f} ms")
+                if routing:
+                    cached["routing"] = routing
+                return cached
+
+        #If there's no knowledge base, use model direct answer
+        if self.retriever is None:
+            result = self._direct_model_response(question, agent, priority)
+        else:
+            if filters and documents is None:
+                documents = self.knowledge_base.search_similar_documents(
+                    question, k=self.retrieval_k, filters=filters, vector=embed()
+                )
+            result = self._run_qa_chain(question, agent, documents, priority, embed)
+
+        if use_cache and result.get("success"):
+            # Timings describe this run only, not a later cache hit
+            cached_result = {key: value for key, value in result.items() if key != "stats"}
+            self.answer_cache.store(agent, question, cached_result, embed(), scope=self._cache_scope())
+        if routing:
+            result["routing"] = routing
+        return result
+
+    async def aask_question(self, question: str, agent: str = "auto",
+                            documents: Optional[List[Document]] = None,
+                            filters: Optional[Dict[str, Any]] = None,
+                            priority: str = "interactive",
+                            vector: Optional[List[float]] = None) -> Dict[str, Any]:
+        """ask_question on a worker thread so many questions can be awaited together"""
+        return await asyncio.to_thread(self.ask_question, question, agent, documents, filters, priority, vector)
+
+    def _cache_scope(self) -> str:
+        """Retrieval settings an answer depends on, so --retrieval or --shards runs don't share answers"""
+        shards = ",".join(SHARD_CONFIG["search"] or ["*"])
+        return f"{self.knowledge_base.retrieval_mode}/{shards}"
+
+    def _cached_answer(self, agent: str, question: str,
+                       embed: Callable[[], Optional[List[float]]]) -> Optional[Dict[str, Any]]:
+        with profiling.span("answer_cache") as stage:
+            cached = self.answer_cache.lookup(agent, question, embed, scope=self._cache_scope())
+            stage["hit"] = cached is not None
+        if cached:
+            profiling.count("answer_cache_hits")
+        return cached
+
+    def search_similar_documents(self, question: str, k: int = 4) -> List[Document]:
+        return self.knowledge_base.search_similar_documents(question, k=k)
+
+    async def asearch_similar_documents(self, question: str, k: int = 4) -> List[Document]:
+        return await self.knowledge_base.asearch_similar_documents(question, k=k)
+
+    def _run_qa_chain(self, question: str, agent: str,
+                      documents: Optional[List[Document]] = None,
+                      priority: str = "interactive",
+                      embed: Callable[[], Optional[List[float]]] = None) -> Dict[str, Any]:
         try:
-            result = self.qa_chains[agent]({"query": question})
+            with profiling.span("qa_chain"):
+                chain = self.qa_chain(agent)
+                if documents is None:
+                    # Retrieve before queueing so a slot is only held while the model generates,
+                    # with the question's embedding if routing or the answer cache already made it
+                    documents = chain.retriever.invoke(question, vector=embed() if embed else None)
+                else:
+                    # Skip the chain's retriever when the caller already searched
+                    documents = self._pack_context(documents, agent)
+                with self._model_slot(agent, priority) as slot:
+                    start = time.perf_counter()
+                    with profiling.span("generate"):
+                        answer = chain.combine_documents_chain.run(input_documents=documents, question=question)
+                    generation_time = time.perf_counter() - start
             agent_config = self.agents[agent]
             
-            # Format sources
-            sources = []
-            for doc in result.get("source_documents", []):
-                source_name = doc.metadata.get("source", "Unknown")
-                sources.append({
-                    "source": source_name,
-                    "preview": doc.page_content[:200] + "..."
-                })
-            
             return {
-                "answer": result["result"],
-                "sources": sources,
+                "answer": answer,
+                "sources": self._format_sources(documents),
                 "agent": agent_config["name"],
                 "model": "Mistral 7B" if agent == "coder" else "Gemma 2B",
                 "capabilities": agent_config["capabilities"],
+                "stats": {"queue_wait": slot["queue_wait"], "generation_time": generation_time},
                 "success": True
             }
             
+        except (SchedulerFullError, DeadlineExceededError) as e:
+            return self._rejected(e)
         except Exception as e:
             logger.error(f"Error in {agent}: {e}")
             return {
@@ -184,29 +384,51 @@ ORGANIZED RESPONSE:""",
                 "success": False
             }
 
-    def _direct_model_response(self, question: str, agent: str) -> Dict[str, Any]:
+    def _pack_context(self, documents: List[Document], agent: str) -> List[Document]:
+        if not self.context_builder:
+            return documents
+        return self.context_builder.build(documents, CONTEXT_CONFIG["token_budget"][agent])
+
+    def _memoized_query_embedding(self, question: str,
+                                  vector: Optional[List[float]] = None) -> Callable[[], Optional[List[float]]]:
+        """Embed the question at most once, or not at all if vector is given; routing, cache and retrieval share it"""
+        memo = {} if vector is None else {"vector": vector}
+
+        def embed() -> Optional[List[float]]:
+            if self.knowledge_base.retrieval_mode == "lexical":
+                # Lexical retrieval never calls the embedding model; the cache stays exact-match
+                return None
+            if "vector" not in memo:
+                try:
+                    with profiling.span("embed_query"):
+                        memo["vector"] = self.knowledge_base.embeddings.embed_query(question)
+                except Exception as e:
+                    logger.warning(f"Could not embed question for answer cache: {e}")
+                    memo["vector"] = None
+            return memo["vector"]
+
+        return embed
+
+    def _direct_model_response(self, question: str, agent: str, priority: str = "interactive") -> Dict[str, Any]:
         if agent == "auto":
             agent = self._detect_agent(question)
         
-        if agent == "coder":
-            llm = self.coder_llm
-            agent_name = self.agents["coder"]["name"]
-            model_name = "Mistral 7B"
-        else:
-            llm = self.assistant_llm
-            agent_name = self.agents["assistant"]["name"]
-            model_name = "Gemma 2B"
+        if agent != "coder":
+            agent = "assistant"
+        agent_name = self.agents[agent]["name"]
+        model_name = "Mistral 7B" if agent == "coder" else "Gemma 2B"
         
         try:
+            llm = self.llm(agent)
             logger.info(f"Starting model response with {model_name}...")
-            enhanced_prompt = f"""You are {agent_name}. Answer the following question clearly and helpfully:
-
-QUESTION: {question}
-
-Please provide a comprehensive and useful response:"""
+            enhanced_prompt = self._direct_prompt(agent_name, question)
             
-            logger.info(f"📤 Sending request to Ollama...")
-            response = llm.invoke(enhanced_prompt)
+            with self._model_slot(agent, priority) as slot:
+                logger.info(f"📤 Sending request to Ollama...")
+                start = time.perf_counter()
+                with profiling.span("generate"):
+                    response = llm.invoke(enhanced_prompt)
+                generation_time = time.perf_counter() - start
             logger.info(f"✅ Received response from Ollama, length: {len(response)}")
             return {
                 "success": True,
@@ -214,8 +436,11 @@ Please provide a comprehensive and useful response:"""
                 "model": model_name,
                 "answer": response,
                 "sources": [],
+                "stats": {"queue_wait": slot["queue_wait"], "generation_time": generation_time},
                 "note": "Response from model (no documents in knowledge base)"
             }
+        except (SchedulerFullError, DeadlineExceededError) as e:
+            return self._rejected(e)
         except Exception as e:
             logger.error(f"Error in direct model response: {e}")
             return {
@@ -226,8 +451,175 @@ Please provide a comprehensive and useful response:"""
                 "sources": []
             }
     
-    def _detect_agent(self, question: str) -> str:
-        """Automatically detect which agent to use based on keywords"""
+    def stream_question(self, question: str, agent: str = "auto",
+                        session: Optional[ChatSession] = None,
+                        filters: Optional[Dict[str, Any]] = None,
+                        priority: str = "interactive") -> Iterator[Dict[str, Any]]:
+        """Yield a "sources" event, then "token" events as Ollama generates, then "done"
+
+        With a session the turn continues that conversation (reusing Ollama's
+        context) and skips the answer cache, since follow-ups depend on history.
+        Filtered questions skip the cache too.
+        """
+        with profiling.trace("stream_question"):
+            yield from self._stream_question(question, agent, session, filters, priority)
+
+    def _stream_question(self, question: str, agent: str, session: Optional[ChatSession],
+                         filters: Optional[Dict[str, Any]] = None,
+                         priority: str = "interactive") -> Iterator[Dict[str, Any]]:
+        start = time.perf_counter()
+        embed = self._memoized_query_embedding(question)
+
+        routing = None
+        if agent == "auto":
+            routing = self.route(question, embed)
+            agent = routing["agent"]
+
+        if agent not in self.agents:
+            yield {"type": "error", "answer": f"Invalid agent: {agent}", "success": False}
+            return
+
+        agent_config = self.agents[agent]
+        model_name = "Mistral 7B" if agent == "coder" else "Gemma 2B"
+
+        use_cache = self.answer_cache is not None and session is None and not filters
+        cached = self._cached_answer(agent, question, embed) if use_cache else None
+        if cached:
+            yield {
+                "type": "sources",
+                "agent": cached["agent"],
+                "model": cached["model"],
+                "sources": cached["sources"],
+                "routing": routing
+            }
+            yield {"type": "token", "text": cached["answer"]}
+            elapsed = time.perf_counter() - start
+            stats = {"time_to_first_token": elapsed, "total_time": elapsed, "tokens": 0, "tokens_per_sec": 0.0}
+            yield {"type": "done", "answer": cached["answer"], "stats": stats, "cached": True, "success": True}
+            return
+
+        try:
+            if self.retriever is not None:
+                documents = self._pack_context(
+                    self.knowledge_base.search_similar_documents(
+                        question, k=self.retrieval_k, filters=filters, vector=embed()
+                    ), agent
+                )
+                with profiling.span("build_prompt"):
+                    prompt = agent_config["prompt_template"].format(
+                        context="\n\n".join(doc.page_content for doc in documents),
+                        question=question
+                    )
+            else:
+                documents = []
+                prompt = self._direct_prompt(agent_config["name"], question)
+
+            first_token_at = None
+            tokens = []
+            # Taken before any event so a busy model is the first thing the caller sees,
+            # and held until the last token since the model is busy for the whole stream
+            with self._model_slot(agent, priority) as slot:
+                yield {
+                    "type": "sources",
+                    "agent": agent_config["name"],
+                    "model": model_name,
+                    "sources": self._format_sources(documents),
+                    "routing": routing
+                }
+
+                requested_at = time.perf_counter()
+                if session is not None:
+                    token_stream = session.stream(self.llm(agent), agent, prompt, question)
+                else:
+                    token_stream = self.llm(agent).stream(prompt)
+
+                for token in token_stream:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens.append(token)
+                    yield {"type": "token", "text": token}
+
+            end = time.perf_counter()
+            generation_time = end - first_token_at if first_token_at else 0.0
+            stats = {
+                "time_to_first_token": (first_token_at or end) - start,
+                "total_time": end - start,
+                "queue_wait": slot["queue_wait"],
+                "tokens": len(tokens),
+                "tokens_per_sec": len(tokens) / generation_time if generation_time > 0 else 0.0
+            }
+            if session is not None:
+                stats.update(session.last_stats)
+
+            # Prefill is everything up to the first token; generation the rest
+            profiling.record("prefill", (first_token_at or end) - requested_at)
+            profiling.record("generate", generation_time, tokens=len(tokens))
+            profiling.count("completion_tokens", len(tokens))
+            if stats.get("prompt_tokens") is not None:
+                profiling.count("prompt_tokens", stats["prompt_tokens"])
+            elif self.context_builder:
+                profiling.count("prompt_tokens_estimated", self.context_builder.count_tokens(prompt))
+            logger.debug(f"{model_name}: first token after {stats['time_to_first_token']:.2f}s, "
+                        f"{stats['tokens_per_sec']:.1f} tokens/sec")
+
+            answer = "".join(tokens)
+            if use_cache:
+                self.answer_cache.store(agent, question, {
+                    "answer": answer,
+                    "sources": self._format_sources(documents),
+                    "agent": agent_config["name"],
+                    "model": model_name,
+                    "capabilities": agent_config["capabilities"],
+                    "success": True
+                }, embed(), scope=self._cache_scope())
+
+            yield {"type": "done", "answer": answer, "stats": stats, "success": True}
+
+        except (SchedulerFullError, DeadlineExceededError) as e:
+            logger.warning(str(e))
+            yield {"type": "error", "answer": f"Error: {e}", "busy": True, "success": False}
+        except Exception as e:
+            logger.error(f"Error streaming from {agent}: {e}")
+            yield {"type": "error", "answer": f"Error: {str(e)}", "success": False}
+
+    def _direct_prompt(self, agent_name: str, question: str) -> str:
+        return f"""You are {agent_name}. Answer the following question clearly and helpfully:
+
+QUESTION: {question}
+
+Please provide a comprehensive and useful response:"""
+
+    def _format_sources(self, documents: List[Document]) -> List[Dict[str, str]]:
+        sources = []
+        for doc in documents:
+            source_name = doc.metadata.get("source", "Unknown")
+            sources.append({
+                "source": source_name,
+                "preview": doc.page_content[:200] + "..."
+            })
+        return sources
+
+    def route(self, question: str, embed: Callable[[], Optional[List[float]]] = None) -> Dict[str, Any]:
+        """Pick an agent for an "auto" question: embedding router first, keywords as fallback
+
+        embed is the same memoized query embedding retrieval uses, so routing
+        costs no extra model call.
+        """
+        with profiling.span("route"):
+            if self.router:
+                vector = (embed or self._memoized_query_embedding(question))()
+                if vector is not None:
+                    try:
+                        agent, confidence = self.router.route(vector)
+                        coder_score, assistant_score = self._keyword_scores(question)
+                        if confidence >= ROUTER_CONFIG["min_confidence"] or coder_score == assistant_score:
+                            logger.debug(f"Routed to {agent} (confidence {confidence:.2f})")
+                            return {"agent": agent, "confidence": confidence, "method": "embedding"}
+                    except Exception as e:
+                        logger.warning(f"Embedding router failed, using keywords: {e}")
+            return {"agent": self._detect_agent(question), "confidence": None, "method": "keywords"}
+
+    def _keyword_scores(self, question: str):
         question_lower = question.lower()
         
         # Count keywords for each agent
@@ -235,6 +627,11 @@ Please provide a comprehensive and useful response:"""
                          if keyword in question_lower)
         assistant_score = sum(1 for keyword in self.agents["assistant"]["keywords"] 
                              if keyword in question_lower)
+        return coder_score, assistant_score
+
+    def _detect_agent(self, question: str) -> str:
+        """Automatically detect which agent to use based on keywords"""
+        coder_score, assistant_score = self._keyword_scores(question)
         
         # Decide based on scores
         if coder_score > assistant_score:
@@ -0,0 +1,171 @@
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from array import array
+from typing import Dict, List, Optional
+from pathlib import Path
+
+from langchain_core.embeddings import Embeddings
+from config.settings import EMBEDDING_CACHE_CONFIG
+import profiling
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """SQLite store of float32 vectors keyed by model name and chunk hash"""
+
+    def __init__(self, path: Path = None, max_entries: int = None):
+        self.path = Path(path or EMBEDDING_CACHE_CONFIG["path"])
+        self.max_entries = max_entries or EMBEDDING_CACHE_CONFIG["max_entries"]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, "
+            "last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    @classmethod
+    def make_key(cls, model: str, text: str, kind: str = "document", unit_vectors: bool = False) -> str:
+        payload = f"{model}\0{kind}\0{cls.normalize(text)}"
+        if unit_vectors:
+            # Kept apart from raw vectors cached by clients that don't normalize
+            payload += "\0l2"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        if not keys:
+            return found
+
+        with self._lock:
+            unique_keys = list(dict.fromkeys(keys))
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(unique_keys), 500):
+                batch = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                    batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = array("f", blob).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found]
+                )
+                self._conn.commit()
+
+            hits = sum(1 for key in keys if key in found)
+            self.hits += hits
+            self.misses += len(keys) - hits
+        return found
+
+    def put_many(self, model: str, items: Dict[str, List[float]]):
+        if not items:
+            return
+
+        with self._lock:
+            now = time.time()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                [(key, model, array("f", vector).tobytes(), now)
+                 for key, vector in items.items()]
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries once the cache exceeds max_entries"""
+        count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow <= 0:
+            return
+
+        # Evict a little extra so we don't run this on every insert
+        overflow += self.max_entries // 10
+        self._conn.execute(
+            "DELETE FROM embeddings WHERE key IN ("
+            "SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (overflow,)
+        )
+        self._conn.commit()
+        logger.info(f"Embedding cache evicted {overflow} entries")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that only calls the underlying client on cache misses"""
+
+    def __init__(self, embeddings: Embeddings, model: str, cache: Optional[EmbeddingCache] = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.cache = cache or EmbeddingCache()
+        self.unit_vectors = getattr(embeddings, "normalized", False)
+
+    def _embed_cached(self, texts: List[str], kind: str, embed_fn) -> List[List[float]]:
+        keys = [EmbeddingCache.make_key(self.model, text, kind=kind, unit_vectors=self.unit_vectors)
+                for text in texts]
+        found = self.cache.get_many(keys)
+        profiling.count("embedding_cache_hits", len(found))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            profiling.count("embedding_cache_misses", len(missing))
+            vectors = embed_fn(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(self.model, computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed_cached(texts, "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries, batching the misses when the client supports it"""
+        if hasattr(self.embeddings, "embed_queries"):
+            embed_fn = self.embeddings.embed_queries
+        else:
+            embed_fn = lambda misses: [self.embeddings.embed_query(text) for text in misses]
+        return self._embed_cached(texts, "query", embed_fn)
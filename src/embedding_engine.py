@@ -0,0 +1,129 @@
+import time
+import logging
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from langchain_core.embeddings import Embeddings
+from config.settings import OLLAMA_CONFIG, EMBEDDING_ENGINE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class OllamaEmbeddingEngine(Embeddings):
+    """Batched, concurrent client for the Ollama embeddings API over a pooled session
+
+    Vectors are L2-normalized whichever endpoint answers: /api/embed already
+    returns unit vectors, the older /api/embeddings does not, and one index
+    must never hold both scales.
+    """
+
+    normalized = True
+
+    def __init__(
+        self,
+        model: str = None,
+        base_url: str = None,
+        batch_size: int = None,
+        max_in_flight: int = None,
+        timeout: float = None,
+        max_retries: int = None,
+        backoff_seconds: float = None
+    ):
+        self.model = model or OLLAMA_CONFIG["models"]["embeddings"]
+        self.base_url = (base_url or OLLAMA_CONFIG["base_url"]).rstrip("/")
+        self.batch_size = batch_size or EMBEDDING_ENGINE_CONFIG["batch_size"]
+        self.max_in_flight = max_in_flight or EMBEDDING_ENGINE_CONFIG["max_in_flight"]
+        self.timeout = timeout or OLLAMA_CONFIG["timeout"]
+        self.max_retries = EMBEDDING_ENGINE_CONFIG["max_retries"] if max_retries is None else max_retries
+        self.backoff_seconds = backoff_seconds or EMBEDDING_ENGINE_CONFIG["backoff_seconds"]
+
+        self.embed_instruction = EMBEDDING_ENGINE_CONFIG["embed_instruction"]
+        self.query_instruction = EMBEDDING_ENGINE_CONFIG["query_instruction"]
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_in_flight)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._batch_endpoint = True
+        self.last_throughput: Optional[float] = None
+
+    def _post(self, path: str, payload: dict) -> dict:
+        """POST with exponential backoff on timeouts and dropped connections"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.session.post(
+                    f"{self.base_url}{path}", json=payload, timeout=self.timeout
+                )
+                response.raise_for_status()
+                return response.json()
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.backoff_seconds * (2 ** attempt)
+                logger.warning(f"Embedding request failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if self._batch_endpoint:
+            try:
+                result = self._post("/api/embed", {"model": self.model, "input": texts})
+                return self._normalize(result["embeddings"])
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                # Older Ollama servers only expose the single-prompt endpoint
+                logger.warning("Ollama /api/embed not available - falling back to /api/embeddings")
+                self._batch_endpoint = False
+
+        return self._normalize([
+            self._post("/api/embeddings", {"model": self.model, "prompt": text})["embedding"]
+            for text in texts
+        ])
+
+    @staticmethod
+    def _normalize(vectors: List[List[float]]) -> List[List[float]]:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).tolist()
+
+    def vector_format(self) -> Dict[str, Any]:
+        """What an index built from these vectors depends on; recorded in the build manifest"""
+        return {"model": self.model, "normalized": self.normalized}
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        start = time.perf_counter()
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+
+        if len(batches) == 1:
+            results = [self._embed_batch(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+
+        vectors = [vector for batch in results for vector in batch]
+        elapsed = time.perf_counter() - start
+        self.last_throughput = len(texts) / elapsed if elapsed > 0 else None
+
+        if len(texts) > 1 and self.last_throughput:
+            logger.info(f"Embedded {len(texts)} chunks in {elapsed:.2f}s "
+                        f"({self.last_throughput:.1f} chunks/sec)")
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"{self.embed_instruction}{text}" for text in texts])
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        return self._embed([f"{self.query_instruction}{text}" for text in texts])
+
+    def close(self):
+        self.session.close()
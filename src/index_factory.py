@@ -0,0 +1,218 @@
+import logging
+from typing import Dict, Any, Tuple
+
+import faiss
+import numpy as np
+from config.settings import INDEX_CONFIG
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+# Scalar quantizer per encoding; float32 keeps the plain index
+ENCODINGS = {"float32": None, "float16": "QT_fp16", "int8": "QT_8bit"}
+REDUCTIONS = (None, "pca", "truncate")
+
+def _needs_codec_training(config: Dict[str, Any]) -> bool:
+    return config.get("encoding", "float32") == "int8" or config.get("reduce") == "pca"
+
+def min_training_points(config: Dict[str, Any] = None) -> int:
+    """Vectors that must be buffered before the configured index can be trained"""
+    config = config or INDEX_CONFIG
+    if config["type"] in ("ivf_flat", "ivf_pq"):
+        return config["train_size"]
+    if _needs_codec_training(config):
+        return min(config["train_size"], config["codec_train_size"])
+    return 0
+
+def _pq_subquantizers(dim: int, requested: int) -> int:
+    # PQ needs the dimension to split evenly into sub-vectors
+    for m in range(min(requested, dim), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def _reduced_dim(dim: int, num_training: int, config: Dict[str, Any]) -> int:
+    if not config.get("reduce"):
+        return dim
+    reduced = min(dim, config["reduced_dim"])
+    if config["reduce"] == "pca" and num_training < reduced:
+        # PCA can't find more components than it has samples
+        logger.warning(f"Only {num_training} vectors - too few for a {reduced}-d PCA, keeping {dim} dimensions")
+        return dim
+    return reduced
+
+def _create_base_index(dim: int, num_training: int, config: Dict[str, Any]) -> faiss.Index:
+    index_type = config["type"]
+    encoding = ENCODINGS[config.get("encoding", "float32")]
+    qtype = getattr(faiss.ScalarQuantizer, encoding) if encoding else None
+
+    if index_type == "hnsw":
+        if qtype is None:
+            index = faiss.IndexHNSWFlat(dim, config["hnsw_m"])
+        else:
+            index = faiss.IndexHNSWSQ(dim, qtype, config["hnsw_m"])
+        index.hnsw.efConstruction = config["ef_construction"]
+        return index
+
+    if index_type in ("ivf_flat", "ivf_pq"):
+        # k-means wants ~39 points per centroid; shrink nlist for small corpora
+        nlist = max(1, min(config["nlist"], num_training // 39))
+        quantizer = faiss.IndexFlatL2(dim)
+
+        if index_type == "ivf_pq" and num_training >= 2 ** config["pq_nbits"]:
+            m = _pq_subquantizers(dim, config["pq_m"])
+            return faiss.IndexIVFPQ(quantizer, dim, nlist, m, config["pq_nbits"])
+        if index_type == "ivf_pq":
+            logger.warning(f"Only {num_training} vectors - too few to train PQ, using IVF-Flat")
+        if qtype is not None:
+            return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, qtype)
+        return faiss.IndexIVFFlat(quantizer, dim, nlist)
+
+    if qtype is not None:
+        return faiss.IndexScalarQuantizer(dim, qtype)
+    return faiss.IndexFlatL2(dim)
+
+def create_index(dim: int, num_training: int, config: Dict[str, Any] = None) -> faiss.Index:
+    """Create an empty index of the configured type, sized for the available training data
+
+    Compact layouts wrap the base index: a PCA or truncation transform in
+    front of it, and an exact float32 re-scoring stage on top when enabled.
+    """
+    config = config or INDEX_CONFIG
+    index_type = config["type"]
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type} (expected one of {INDEX_TYPES})")
+    if config.get("encoding", "float32") not in ENCODINGS:
+        raise ValueError(f"Unknown encoding: {config['encoding']} (expected one of {tuple(ENCODINGS)})")
+    if config.get("reduce") not in REDUCTIONS:
+        raise ValueError(f"Unknown reduction: {config['reduce']} (expected one of {REDUCTIONS})")
+
+    reduced = _reduced_dim(dim, num_training, config)
+    index = _create_base_index(reduced, num_training, config)
+    if reduced != dim:
+        if config["reduce"] == "pca":
+            transform = faiss.PCAMatrix(dim, reduced)
+        else:
+            transform = faiss.RemapDimensionsTransform(dim, reduced, False)
+        index = faiss.IndexPreTransform(transform, index)
+
+    lossy = reduced != dim or config.get("encoding", "float32") != "float32" or index_type == "ivf_pq"
+    if config.get("rescore") and lossy:
+        index = faiss.IndexRefineFlat(index)
+        index.k_factor = config["rescore_factor"]
+    return index
+
+def _search_index(index: faiss.Index) -> faiss.Index:
+    """The index doing the (compact) search under any re-scoring or transform wrapper"""
+    while True:
+        if isinstance(index, faiss.IndexRefine):
+            index = faiss.downcast_index(index.base_index)
+        elif isinstance(index, faiss.IndexPreTransform):
+            index = faiss.downcast_index(index.index)
+        else:
+            return index
+
+def train_index(index: faiss.Index, vectors: np.ndarray, config: Dict[str, Any] = None):
+    """Train on a random sample of at most train_size vectors"""
+    config = config or INDEX_CONFIG
+    if index.is_trained:
+        return
+
+    sample = vectors
+    if len(vectors) > config["train_size"]:
+        rows = np.random.default_rng(0).choice(len(vectors), config["train_size"], replace=False)
+        sample = vectors[rows]
+
+    logger.info(f"Training {config['type']} index on {len(sample)} vectors")
+    index.train(sample)
+    _drop_pca_eigenvectors(index)
+
+def _drop_pca_eigenvectors(index: faiss.Index):
+    """Searching only uses the projection prepared from them, and they'd add dim * dim floats to the file"""
+    while isinstance(index, (faiss.IndexRefine, faiss.IndexPreTransform)):
+        if isinstance(index, faiss.IndexRefine):
+            index = faiss.downcast_index(index.base_index)
+            continue
+        for i in range(index.chain.size()):
+            transform = faiss.downcast_VectorTransform(index.chain.at(i))
+            if isinstance(transform, faiss.PCAMatrix):
+                transform.PCAMat.clear()
+        index = faiss.downcast_index(index.index)
+
+def apply_search_params(index: faiss.Index, config: Dict[str, Any] = None):
+    """Set nprobe / efSearch (and the re-scoring shortlist size) on whatever index type was loaded"""
+    config = config or INDEX_CONFIG
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = config["rescore_factor"]
+    index = _search_index(index)
+    try:
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = config["nprobe"]
+        return
+    except RuntimeError:
+        pass
+
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = config["ef_search"]
+
+def supports_removal(index: faiss.Index) -> bool:
+    """Only flat indexes (float32 or scalar-quantized) renumber their rows after remove_ids
+
+    IVF lists keep the original labels, which would no longer match the
+    0..n-1 row numbering the docstore positions rely on. The re-scoring
+    stage can't remove vectors at all.
+    """
+    return not isinstance(index, faiss.IndexRefine) and isinstance(_search_index(index), faiss.IndexFlatCodes)
+
+def id_selector(positions: np.ndarray, ntotal: int) -> Tuple[faiss.IDSelector, np.ndarray]:
+    """Selector over the allowed rows; keep the returned array alive while searching"""
+    if len(positions) * 16 >= ntotal:
+        # Dense sets: one bit per row beats hashing every id
+        mask = np.zeros(ntotal, dtype=bool)
+        mask[positions] = True
+        bitmap = np.packbits(mask, bitorder="little")
+        return faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)), bitmap
+    positions = np.ascontiguousarray(positions, dtype=np.int64)
+    return faiss.IDSelectorBatch(len(positions), faiss.swig_ptr(positions)), positions
+
+def search_parameters(index: faiss.Index, selector: faiss.IDSelector,
+                      exhaustive: bool = False) -> faiss.SearchParameters:
+    """Per-query parameters restricting the search to selector, keeping nprobe / efSearch
+
+    exhaustive probes every IVF list for very selective filters whose matches
+    the normal search can miss.
+    """
+    base = _search_index(index)
+    try:
+        ivf = faiss.extract_index_ivf(base)
+        params = faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nlist if exhaustive else ivf.nprobe)
+    except RuntimeError:
+        if isinstance(base, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=base.hnsw.efSearch)
+        else:
+            params = faiss.SearchParameters(sel=selector)
+
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.IndexRefineSearchParameters(k_factor=index.k_factor, base_index_params=params)
+    return params
+
+def exhaustive_search(index: faiss.Index, matrix: np.ndarray, k: int, selector: faiss.IDSelector,
+                      positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Filtered search that can't miss an allowed row
+
+    IVF indexes probe every list. An HNSW beam can miss allowed nodes however
+    wide it is (the filter cuts the graph apart), so graphs are bypassed for
+    an exact scan of the allowed rows' stored vectors instead.
+    """
+    try:
+        faiss.extract_index_ivf(_search_index(index))
+        return index.search(matrix, k, params=search_parameters(index, selector, exhaustive=True))
+    except RuntimeError:
+        pass
+    positions = np.asarray(positions, dtype=np.int64)
+    distances, rows = faiss.knn(matrix, index.reconstruct_batch(positions), min(k, len(positions)))
+    return distances, np.where(rows >= 0, positions[rows], -1)
+
+def is_exact(index: faiss.Index) -> bool:
+    """True if every vector is compared, so a filtered search can't miss matches"""
+    return isinstance(_search_index(index), faiss.IndexFlatCodes)
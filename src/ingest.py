@@ -0,0 +1,165 @@
+import uuid
+import logging
+from typing import Dict, List, Tuple
+from pathlib import Path
+
+from langchain.schema import Document
+from config.settings import BUILD_CONFIG
+from document_processor import DocumentProcessor
+from knowledge_base import KnowledgeBase
+from manifest import BuildManifest
+
+logger = logging.getLogger(__name__)
+
+class IngestPipeline:
+    """Stream chunks from files into the index in fixed-size batches with checkpoints
+
+    The manifest doubles as the checkpoint: a file is only recorded once all
+    of its chunks are in the saved index, so an interrupted build resumes by
+    re-diffing data/raw and skipping every file that was already checkpointed.
+
+    Files that fail to load or split are recorded with their error, so they
+    are skipped until they change instead of being retried on every build.
+
+    Chunks that duplicate an indexed one (exactly or nearly) are not embedded
+    again: the file references the surviving chunk, which gains the file in
+    its "sources" metadata.
+    """
+
+    def __init__(
+        self,
+        processor: DocumentProcessor,
+        knowledge_base: KnowledgeBase,
+        manifest: BuildManifest,
+        batch_size: int = None,
+        checkpoint_every: int = None
+    ):
+        self.processor = processor
+        self.knowledge_base = knowledge_base
+        self.manifest = manifest
+        self.batch_size = batch_size or BUILD_CONFIG["batch_size"]
+        self.checkpoint_every = checkpoint_every or BUILD_CONFIG["checkpoint_every"]
+
+        self._buffer: List[Tuple[Path, str, Document]] = []
+        self._chunk_ids: Dict[Path, List[str]] = {}
+        # Surviving chunks each file references instead of its own duplicates
+        self._shared_ids: Dict[Path, List[str]] = {}
+        # (file, survivor id, source) merged into the survivor's metadata once it is indexed
+        self._new_sources: List[Tuple[Path, str, str]] = []
+        self._finished: List[Path] = []
+        # file -> error, recorded at the next checkpoint
+        self._failed: Dict[Path, str] = {}
+        self.total_chunks = 0
+        self.duplicates = {"exact": 0, "near": 0}
+
+    @property
+    def skipped_chunks(self) -> int:
+        return sum(self.duplicates.values())
+
+    def _flush(self) -> bool:
+        if self._buffer:
+            ids = self.knowledge_base.add_documents(
+                [chunk for _, _, chunk in self._buffer], ids=[chunk_id for _, chunk_id, _ in self._buffer]
+            )
+            if ids is None:
+                return False
+
+            for file_path, chunk_id, _ in self._buffer:
+                self._chunk_ids[file_path].append(chunk_id)
+            self._buffer = []
+
+        if self._new_sources:
+            sources: Dict[str, List[str]] = {}
+            for _, survivor_id, source in self._new_sources:
+                sources.setdefault(survivor_id, []).append(source)
+            if not self.knowledge_base.add_sources(sources):
+                return False
+            self._new_sources = []
+        return True
+
+    def _deduplicate(self, file_path: Path, chunk_id: str, chunk: Document) -> bool:
+        """True if the chunk duplicates an indexed (or buffered) one and should not be embedded"""
+        dedup_index = self.knowledge_base.dedup_index
+        if dedup_index is None:
+            return False
+        match = dedup_index.add(chunk_id, chunk.page_content)
+        if match is None:
+            return False
+
+        survivor_id, kind = match
+        self.duplicates[kind] += 1
+        owned = self._chunk_ids[file_path] + [buffered_id for path, buffered_id, _ in self._buffer if path == file_path]
+        # A chunk repeated within one file needs no extra reference
+        if survivor_id not in owned and survivor_id not in self._shared_ids[file_path]:
+            self._shared_ids[file_path].append(survivor_id)
+            self._new_sources.append((file_path, survivor_id, chunk.metadata.get("source", str(file_path))))
+        return True
+
+    def checkpoint(self) -> bool:
+        """Flush pending chunks, then persist the index and every finished file"""
+        if not self._flush():
+            return False
+
+        for file_path in self._finished:
+            self.manifest.record(file_path, self._chunk_ids.pop(file_path) + self._shared_ids.pop(file_path))
+        self._finished = []
+        for file_path, error in self._failed.items():
+            self.manifest.record(file_path, [], error=error)
+        self._failed = {}
+
+        # The final checkpoint trains whatever is still buffered, however small
+        if not self.knowledge_base.has_index and not self.knowledge_base.needs_training:
+            return self.manifest.save()
+        return self.knowledge_base.save_knowledge_base() and self.manifest.save()
+
+    def _discard(self, file_path: Path) -> bool:
+        """Forget a file that failed midway, including chunks already embedded"""
+        buffered = [chunk_id for path, chunk_id, _ in self._buffer if path == file_path]
+        if self.knowledge_base.dedup_index is not None:
+            self.knowledge_base.dedup_index.remove(buffered)
+        self._buffer = [entry for entry in self._buffer if entry[0] != file_path]
+        self._new_sources = [entry for entry in self._new_sources if entry[0] != file_path]
+        self._shared_ids.pop(file_path, None)
+        return self.knowledge_base.delete_documents(self._chunk_ids.pop(file_path, []))
+
+    def run(self, file_paths: List[Path]) -> bool:
+        since_checkpoint = 0
+
+        for file_path, chunks in self.processor.iter_processed_files(file_paths):
+            if chunks is None:
+                self._failed[file_path] = "could not be loaded"
+                continue
+
+            self._chunk_ids[file_path] = []
+            self._shared_ids[file_path] = []
+            file_chunks = 0
+            try:
+                for chunk in chunks:
+                    file_chunks += 1
+                    chunk_id = str(uuid.uuid4())
+                    if self._deduplicate(file_path, chunk_id, chunk):
+                        continue
+                    self._buffer.append((file_path, chunk_id, chunk))
+                    if len(self._buffer) >= self.batch_size and not self._flush():
+                        return False
+            except Exception as e:
+                logger.error(f"Error splitting {file_path}: {e}")
+                if not self._discard(file_path):
+                    return False
+                self._failed[file_path] = f"could not be split: {e}"
+                continue
+
+            self._finished.append(file_path)
+            self.total_chunks += file_chunks
+            since_checkpoint += file_chunks
+            logger.info(f"Indexed: {file_path.name} ({file_chunks} chunks)")
+
+            # Only checkpoint on file boundaries so the saved index never holds a partial file,
+            # and not before a trainable index has collected its training sample
+            if since_checkpoint >= self.checkpoint_every and not self.knowledge_base.needs_training:
+                if not self.checkpoint():
+                    return False
+                logger.info(f"Checkpoint saved ({self.total_chunks} chunks so far)")
+                since_checkpoint = 0
+
+        return self.checkpoint()
@@ -1,30 +1,78 @@
+import re
+import uuid
+import asyncio
+import shutil
+import heapq
 import logging
-from typing import List, Optional
+import threading
+import contextvars
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
 from langchain.schema import Document
-from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OllamaEmbeddings  # ← CAMBIO AQUÍ
-from config.settings import DATA_PATHS, OLLAMA_CONFIG
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from config.settings import (
+    DATA_PATHS, OLLAMA_CONFIG, EMBEDDING_CACHE_CONFIG, INDEX_CONFIG,
+    LEXICAL_CONFIG, RETRIEVAL_CONFIG, SHARD_CONFIG, STORE_CONFIG, DEDUP_CONFIG
+)
+from vector_shard import VectorShard
+from store_versions import VersionedStore
+import profiling
+from embedding_cache import CachedEmbeddings
+from embedding_engine import OllamaEmbeddingEngine
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from chunk_dedup import ChunkDeduplicator
+from search_filters import normalize_filters
 
 logger = logging.getLogger(__name__)
 
+# The unsharded index lives directly in the vector store directory
+MAIN_SHARD = "main"
+
 class KnowledgeBase:
-    def __init__(self):
-        self.embeddings = OllamaEmbeddings(
+    def __init__(self, store_path: Path = None):
+        self.embeddings = OllamaEmbeddingEngine(
             model=OLLAMA_CONFIG["models"]["embeddings"],
             base_url=OLLAMA_CONFIG["base_url"]
         )      
-        self.vector_store = None
+        # Indexes built with another model or normalization can't be searched with these vectors
+        self.vector_format = self.embeddings.vector_format()
+        if EMBEDDING_CACHE_CONFIG["enabled"]:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model=OLLAMA_CONFIG["models"]["embeddings"]
+            )
+        self.shards: Dict[str, VectorShard] = {}
+        self.shard_strategy = SHARD_CONFIG["strategy"]
+        # Read on the first lexical or hybrid query (or build change) after a load
+        self._lexical_index: Optional[BM25Index] = BM25Index()
+        self._lexical_lock = threading.Lock()
+        # Read on first use by a build; searches never need it
+        self._dedup_index: Optional[ChunkDeduplicator] = None
+        self.retrieval_mode = RETRIEVAL_CONFIG["mode"]
+        self.mmap = INDEX_CONFIG["mmap"]
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Identifies the index on disk that was loaded; changes on every rebuild
+        self.version: Optional[str] = None
+
+        self.store = VersionedStore()
+        # Version directory read from and written to; builds pass their staging directory
+        self.store_path = Path(store_path) if store_path else self.store.current_path()
+        # Guards swapping in a new version against queries taking their snapshot
+        self._swap_lock = threading.Lock()
+        self._swap_listeners: List[Callable[[Optional[str]], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
 
     def create_knowledge_base(self, documents: List[Document]) -> bool:
         try:
             logger.info("Creating embeddings and vector store... ")
 
-            self.vector_store = FAISS.from_documents(
-                documents=documents,
-                embedding=self.embeddings
-            )
+            if self.add_documents(documents) is None or not self.finish_training():
+                return False
 
             logger.info(f"Knowledge base created with {len(documents)} documents")
             return True
@@ -32,48 +80,501 @@ class KnowledgeBase:
         except Exception as e:
             logger.error(f"Error creating knowledge base: {e}")
             return False
-    
+
+    @property
+    def needs_training(self) -> bool:
+        """True while chunks are buffered waiting for enough vectors to train an index"""
+        return any(shard.needs_training for shard in self.shards.values())
+
+    @property
+    def has_index(self) -> bool:
+        return any(shard.has_index for shard in self.shards.values())
+
+    @property
+    def vector_count(self) -> int:
+        return sum(shard.count for shard in self.shards.values())
+
+    def _new_shard(self, root: Path, name: str, read_only: bool = False) -> VectorShard:
+        path = root if name == MAIN_SHARD else root / SHARD_CONFIG["dir"] / name
+        return VectorShard(name, path, self.embeddings, mmap=self.mmap, read_only=read_only)
+
+    def _shard(self, name: str) -> VectorShard:
+        if name not in self.shards:
+            self.shards[name] = self._new_shard(self.store_path, name)
+        return self.shards[name]
+
+    def _directory_shard(self, document: Document) -> str:
+        """Top-level folder of data/raw the chunk came from"""
+        try:
+            relative = Path(document.metadata.get("source", "")).resolve().relative_to(
+                DATA_PATHS["raw_documents"].resolve()
+            )
+        except ValueError:
+            return "_external"
+        if len(relative.parts) < 2:
+            return "_root"
+        return re.sub(r"[^\w.-]", "_", relative.parts[0])
+
+    def _assign_shards(self, documents: List[Document]) -> List[str]:
+        if self.shard_strategy == "directory":
+            return [self._directory_shard(doc) for doc in documents]
+        if self.shard_strategy != "size":
+            return [MAIN_SHARD] * len(documents)
+
+        # Fill the newest shard, then open the next one
+        name = max((n for n in self.shards if n != MAIN_SHARD), default="0000")
+        filled = self._shard(name).count
+        names = []
+        for _ in documents:
+            if filled >= SHARD_CONFIG["max_chunks"]:
+                name, filled = f"{int(name) + 1:04d}", 0
+            names.append(name)
+            filled += 1
+        return names
+
+    def add_documents(self, documents: List[Document], ids: List[str] = None) -> Optional[List[str]]:
+        """Embed and add documents to their shards, creating (and training) indexes if needed"""
+        try:
+            ids = ids or [str(uuid.uuid4()) for _ in documents]
+            if not documents:
+                return ids
+
+            texts = [doc.page_content for doc in documents]
+            metadatas = [doc.metadata for doc in documents]
+            with profiling.span("embed", chunks=len(texts)):
+                vectors = self.embeddings.embed_documents(texts)
+
+            with profiling.span("index_add", chunks=len(texts)):
+                self.lexical_index.add(ids, texts)
+                groups: Dict[str, List[int]] = {}
+                for i, name in enumerate(self._assign_shards(documents)):
+                    groups.setdefault(name, []).append(i)
+                for name, rows in groups.items():
+                    self._shard(name).add(
+                        [texts[i] for i in rows], [vectors[i] for i in rows],
+                        [metadatas[i] for i in rows], [ids[i] for i in rows]
+                    )
+            return ids
+        except Exception as e:
+            logger.error(f"Error adding documents: {e}")
+            return None
+
+    def finish_training(self) -> bool:
+        """Train every shard on whatever is buffered, even if it is less than train_size"""
+        try:
+            for shard in self.shards.values():
+                shard.finish_training()
+            return True
+        except Exception as e:
+            logger.error(f"Error training index: {e}")
+            return False
+
+    def delete_documents(self, ids: List[str]) -> bool:
+        """Remove vectors and docstore entries for the given chunk ids, in whichever shards hold them"""
+        try:
+            if not ids:
+                return True
+
+            self.lexical_index.remove(ids)
+            if self.dedup_index is not None:
+                self.dedup_index.remove(ids)
+            for shard in self.shards.values():
+                shard.delete(ids)
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting documents: {e}")
+            return False
+
+    @property
+    def lexical_index(self) -> BM25Index:
+        """BM25 index of the loaded version; vector searches never read it"""
+        with self._lexical_lock:
+            if self._lexical_index is None:
+                self._lexical_index = self._read_lexical_index(self.store_path, self.shards)
+            return self._lexical_index
+
+    @property
+    def dedup_index(self) -> Optional[ChunkDeduplicator]:
+        """Signatures of every indexed chunk, for dropping duplicates at ingest"""
+        if self._dedup_index is None and DEDUP_CONFIG["enabled"]:
+            self._dedup_index = self._read_dedup_index()
+        return self._dedup_index
+
+    def _read_dedup_index(self) -> ChunkDeduplicator:
+        dedup_file = self.store_path / DEDUP_CONFIG["index_file"]
+        with profiling.span("read_dedup_index"):
+            if dedup_file.exists():
+                dedup_index = ChunkDeduplicator.load(dedup_file)
+                if dedup_index is not None:
+                    return dedup_index
+            # Stores built before de-duplication (or with other MinHash settings): index what is there
+            dedup_index = ChunkDeduplicator()
+            for shard in self.shards.values():
+                if shard.has_index:
+                    for doc_id, doc in shard.docstore.fetch(shard.docstore.positions.values()).items():
+                        dedup_index.add(doc_id, doc.page_content)
+            if len(dedup_index):
+                logger.info(f"Built the de-duplication index for {len(dedup_index)} existing chunks")
+            return dedup_index
+
+    def _update_metadata(self, ids: List[str], update: Callable[[str, dict], dict]) -> bool:
+        try:
+            for shard in self.shards.values():
+                shard.update_metadata(ids, update)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating chunk metadata: {e}")
+            return False
+
+    def add_sources(self, sources: Dict[str, List[str]]) -> bool:
+        """Record more files a surviving chunk stands for, in its "sources" metadata"""
+        def update(doc_id: str, metadata: dict) -> dict:
+            merged = list(metadata.get("sources") or [metadata.get("source")])
+            merged += [source for source in dict.fromkeys(sources[doc_id]) if source not in merged]
+            metadata["sources"] = merged
+            return metadata
+
+        return self._update_metadata(list(sources), update)
+
+    def remove_source(self, ids: List[str], source: str) -> bool:
+        """Forget one file behind chunks other files still share, promoting the next source if needed"""
+        def update(doc_id: str, metadata: dict) -> dict:
+            remaining = [s for s in (metadata.get("sources") or [metadata.get("source")]) if s != source]
+            if remaining:
+                if metadata.get("source") != remaining[0]:
+                    # The mtime belonged to the file that is gone; re-read from the new primary
+                    metadata.pop("mtime", None)
+                metadata["sources"] = remaining
+                metadata["source"] = remaining[0]
+            return metadata
+
+        return self._update_metadata(ids, update)
+
+    def _close_shards(self):
+        for shard in self.shards.values():
+            shard.close()
+        self.shards = {}
+
+    def _discover_shards(self, root: Path, read_only: bool = False) -> Dict[str, VectorShard]:
+        """Every shard saved under root, without reading its index"""
+        shards = {}
+        if (root / "index.faiss").exists():
+            shards[MAIN_SHARD] = self._new_shard(root, MAIN_SHARD, read_only)
+        shard_root = root / SHARD_CONFIG["dir"]
+        if shard_root.is_dir():
+            for path in sorted(shard_root.iterdir()):
+                if (path / "index.faiss").exists():
+                    shards[path.name] = self._new_shard(root, path.name, read_only)
+        return shards
+
+    def _read_lexical_index(self, root: Path, shards: Dict[str, VectorShard]) -> BM25Index:
+        lexical_file = root / LEXICAL_CONFIG["index_file"]
+        with profiling.span("read_lexical_index"):
+            if lexical_file.exists():
+                return BM25Index.load(lexical_file)
+            # Indexes built before BM25 existed: rebuild it from the docstores
+            logger.info("No BM25 index found - building it from the docstore")
+            lexical_index = BM25Index()
+            for shard in shards.values():
+                ids = shard.docstore.positions.values()
+                lexical_index.add(ids, [doc.page_content for doc in shard.docstore.search_many(ids)])
+            return lexical_index
+
+    def clear_knowledge_base(self) -> bool:
+        """Drop the in-memory shards and every file in the vector store directory"""
+        try:
+            self._close_shards()
+            self._lexical_index = BM25Index()
+            self._dedup_index = None
+            store_path = self.store_path
+            if store_path.exists():
+                for path in store_path.iterdir():
+                    if path.is_dir():
+                        shutil.rmtree(path)
+                    else:
+                        path.unlink()
+            return True
+        except Exception as e:
+            logger.error(f"Error clearing knowledge base: {e}")
+            return False
+
     def save_knowledge_base(self) -> bool:
+        """Write the shards that changed, then the BM25 and de-duplication indexes"""
         try:
-            if self.vector_store:
-                save_path = DATA_PATHS["vector_store"]
+            if not self.finish_training():
+                return False
+            if self.has_index:
+                save_path = self.store_path
                 save_path.mkdir(parents=True, exist_ok=True)
-
-                self.vector_store.save_local(str(save_path))
-                logger.info(f"Base saved in: {save_path}")
+                with profiling.span("save") as stage:
+                    saved = [name for name, shard in self.shards.items() if shard.save()]
+                    # Never read since the load, so the file on disk is still current
+                    if self._lexical_index is not None:
+                        self._lexical_index.save(save_path / LEXICAL_CONFIG["index_file"])
+                    if self._dedup_index is not None:
+                        self._dedup_index.save(save_path / DEDUP_CONFIG["index_file"])
+                    stage["shards"] = len(saved)
+                logger.info(f"Base saved in: {save_path} ({len(saved)} shard(s) written)")
                 return True
             return False
         except Exception as e:
             logger.error(f"Error saving knowledge base: {e}")
             return False
         
-    def load_knowledge_base(self) -> bool:
+    def load_knowledge_base(self, mmap: bool = None, lazy: bool = None, path: Path = None) -> bool:
+        """Find the saved shards; each index is read on first search unless lazy is off
+
+        Reads the published version, opened read-only, unless path names
+        another one (a build's staging directory). mmap maps the inverted
+        lists of IVF indexes read-only so processes share their pages; faiss
+        reads flat and HNSW indexes into memory either way.
+        """
         try:
-            load_path = DATA_PATHS["vector_store"]
-
-            if load_path.exists() and any(load_path.iterdir()):
-                self.vector_store = FAISS.load_local(
-                    folder_path=str(load_path),
-                    embeddings=self.embeddings,
-                    allow_dangerous_deserialization=True
-                )
-                logger.info("Knowledge base loaded")
-                return True
-            return False
+            self.mmap = INDEX_CONFIG["mmap"] if mmap is None else mmap
+            lazy = SHARD_CONFIG["lazy"] if lazy is None else lazy
+            self.store_path = Path(path) if path else self.store.current_path()
+            self._close_shards()
+            self._lexical_index = None
+            self._dedup_index = None
+            self.shards = self._discover_shards(self.store_path, read_only=path is None)
+            if not self.shards:
+                return False
+            self.version = "+".join(shard.version for shard in self.shards.values())
+
+            if not lazy:
+                self._map(lambda shard: shard.ensure_loaded(), list(self.shards.values()))
+
+            logger.info(f"Knowledge base found: {len(self.shards)} shard(s) "
+                        f"({', '.join(self.shards)}){'' if lazy else ' loaded'}"
+                        f"{', mmap on' if self.mmap else ''}")
+            return True
         except Exception as e:
             logger.error(f"Error loading knowledge base: {e}")
             return False
 
-    def search_similar_documents(self, query: str, k: int=4) -> List[Document]:
-        if self.vector_store:
-            return self.vector_store.similarity_search(query, k=k)
-        return []
-    
-    def get_retriever(self, k: int =4):
-        if self.vector_store:
-            return self.vector_store.as_retriever(search_kwargs ={"k": k})
+    def refresh(self) -> bool:
+        """Swap in the published version if a build moved CURRENT; True if it did
+
+        The new shards are read before the swap, so queries keep running on the
+        old version meanwhile and the ones already in flight finish on it.
+        """
+        path = self.store.current_path()
+        if path == self.store_path:
+            return False
+        try:
+            with profiling.span("swap_knowledge_base"):
+                shards = self._discover_shards(path, read_only=True)
+                if not shards:
+                    return False
+                self._map(lambda shard: shard.ensure_loaded(), list(shards.values()))
+                version = "+".join(shard.version for shard in shards.values())
+
+            with self._swap_lock:
+                # Old shards are not closed: in-flight queries may still hold them
+                self.shards, self._lexical_index = shards, None
+                self.store_path, self.version = path, version
+            logger.info(f"Swapped in store version {path.name} ({len(shards)} shard(s))")
+        except Exception as e:
+            logger.error(f"Error swapping in store version {path.name}: {e}")
+            return False
+
+        for listener in self._swap_listeners:
+            listener(version)
+        return True
+
+    def watch_for_updates(self, on_swap: Callable[[Optional[str]], None] = None,
+                          interval: float = None) -> bool:
+        """Poll CURRENT on a daemon thread and refresh when a new version is published"""
+        if on_swap is not None:
+            self._swap_listeners.append(on_swap)
+        interval = STORE_CONFIG["poll_interval"] if interval is None else interval
+        if interval <= 0 or self._watcher is not None:
+            return False
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                self.refresh()
+
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(target=watch, name="store-watcher", daemon=True)
+        self._watcher.start()
+        return True
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _snapshot(self, lexical: bool = False) -> Tuple[List[VectorShard], Optional[BM25Index]]:
+        """Shards and (for lexical queries) BM25 index of one version, so a query never mixes two
+
+        The first lexical or hybrid query after a load or swap reads the BM25
+        index, holding off swaps until it is in.
+        """
+        with self._swap_lock:
+            return self._searched_shards(), self.lexical_index if lexical else None
+
+    def embedding_cache_stats(self) -> Optional[dict]:
+        if isinstance(self.embeddings, CachedEmbeddings):
+            return self.embeddings.cache.stats()
         return None
+
+    def _searched_shards(self) -> List[VectorShard]:
+        """Shards selected with SHARD_CONFIG["search"] (all by default) that have vectors"""
+        names = SHARD_CONFIG["search"] or list(self.shards)
+        unknown = [name for name in names if name not in self.shards]
+        if unknown:
+            logger.warning(f"Unknown shards ignored: {', '.join(unknown)}")
+        return [self.shards[name] for name in names if name in self.shards and self.shards[name].has_index]
+
+    def _map(self, fn: Callable[[VectorShard], Any], shards: List[VectorShard]) -> List[Any]:
+        """Run fn on every shard on a thread pool; FAISS releases the GIL while searching"""
+        if len(shards) <= 1:
+            return [fn(shard) for shard in shards]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=SHARD_CONFIG["max_workers"], thread_name_prefix="shard"
+            )
+        # Each task gets a copy of the context so its spans land in the current trace
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, fn, shard) for shard in shards
+        ]
+        return [future.result() for future in futures]
+
+    def _documents_for(self, ids: List[str], shards: List[VectorShard]) -> List[Document]:
+        with profiling.span("docstore_fetch", chunks=len(ids)):
+            if len(shards) == 1:
+                return shards[0].docstore.search_many(ids)
+            found: Dict[str, Document] = {}
+            for shard in shards:
+                missing = [doc_id for doc_id in ids if doc_id not in found]
+                if not missing:
+                    break
+                found.update(shard.documents(missing))
+            return [found[doc_id] for doc_id in ids if doc_id in found]
+
+    def _embed_query(self, query: str) -> List[float]:
+        with profiling.span("embed_query"):
+            return self.embeddings.embed_query(query)
+
+    def _vector_ids(self, vectors: List[List[float]], k: int, shards: List[VectorShard],
+                    filters: Optional[Dict[str, Any]] = None) -> List[List[str]]:
+        """Search every shard in parallel and keep the k nearest hits overall"""
+        if not shards:
+            return [[] for _ in vectors]
+
+        with profiling.span("faiss_search", queries=len(vectors), shards=len(shards)):
+            matrix = np.array(vectors, dtype=np.float32)
+            per_shard = self._map(lambda shard: shard.search(matrix, k, filters), shards)
+            # Every shard uses L2 distance, so hits from different shards compare directly
+            # (approximately for compact shards, which each have their own codec)
+            merged = []
+            for rows in zip(*per_shard):
+                nearest = heapq.nsmallest(k, (hit for hits in rows for hit in hits))
+                merged.append([doc_id for _, doc_id in nearest])
+            return merged
+
+    def _lexical_ids(self, query: str, k: int, shards: List[VectorShard], lexical_index: BM25Index,
+                     filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        with profiling.span("lexical_search"):
+            allowed = None
+            if filters:
+                allowed = set()
+                for shard in shards:
+                    allowed.update(shard.docstore.matching_ids(filters))
+            return [doc_id for doc_id, _ in lexical_index.search(query, k, allowed)]
+
+    def _fuse(self, query: str, vector_ids: List[str], k: int, shards: List[VectorShard],
+              lexical_index: BM25Index, filters: Optional[Dict[str, Any]] = None) -> List[str]:
+        fused = reciprocal_rank_fusion(
+            [vector_ids, self._lexical_ids(query, RETRIEVAL_CONFIG["candidates"], shards, lexical_index, filters)],
+            k=RETRIEVAL_CONFIG["rrf_k"]
+        )
+        return fused[:k]
+
+    def search_similar_documents(self, query: str, k: int=4, mode: str = None,
+                                 filters: Optional[Dict[str, Any]] = None,
+                                 vector: Optional[List[float]] = None) -> List[Document]:
+        """Retrieve k chunks by vector similarity, BM25, or both fused with RRF
+
+        filters (source, page, extension, modified_after/before) restrict the
+        search itself, so k results come back whenever k chunks match.
+        vector is the query's embedding when the caller already has it.
+        """
+        if not self.shards:
+            return []
+
+        mode = mode or self.retrieval_mode
+        filters = normalize_filters(filters)
+        shards, lexical_index = self._snapshot(lexical=mode in ("lexical", "hybrid"))
+        with profiling.span("retrieve", mode=mode, filtered=bool(filters)):
+            if mode == "lexical":
+                # No embedding call at all on this path
+                return self._documents_for(self._lexical_ids(query, k, shards, lexical_index, filters), shards)
+            if vector is None:
+                vector = self._embed_query(query)
+            if mode == "hybrid":
+                vector_ids = self._vector_ids([vector], RETRIEVAL_CONFIG["candidates"], shards, filters)[0]
+                return self._documents_for(self._fuse(query, vector_ids, k, shards, lexical_index, filters), shards)
+            return self._documents_for(self._vector_ids([vector], k, shards, filters)[0], shards)
+
+    async def asearch_similar_documents(self, query: str, k: int=4, mode: str = None,
+                                        filters: Optional[Dict[str, Any]] = None,
+                                        vector: Optional[List[float]] = None) -> List[Document]:
+        if not self.shards:
+            return []
+        return await asyncio.to_thread(self.search_similar_documents, query, k, mode, filters, vector)
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        if hasattr(self.embeddings, "embed_queries"):
+            return self.embeddings.embed_queries(queries)
+        return [self.embeddings.embed_query(query) for query in queries]
+
+    def search_batch(self, queries: List[str], k: int=4, mode: str = None,
+                     filters: Optional[Dict[str, Any]] = None,
+                     vectors: Optional[List[List[float]]] = None) -> List[List[Document]]:
+        """One batched embedding call (unless vectors are given) and one FAISS matrix search for many queries"""
+        if not self.shards or not queries:
+            return [[] for _ in queries]
+
+        mode = mode or self.retrieval_mode
+        filters = normalize_filters(filters)
+        shards, lexical_index = self._snapshot(lexical=mode in ("lexical", "hybrid"))
+        if mode == "lexical":
+            return [
+                self._documents_for(self._lexical_ids(query, k, shards, lexical_index, filters), shards)
+                for query in queries
+            ]
+
+        vector_k = RETRIEVAL_CONFIG["candidates"] if mode == "hybrid" else k
+        if vectors is None:
+            with profiling.span("embed_query", queries=len(queries)):
+                vectors = self.embed_queries(queries)
+        id_lists = self._vector_ids(vectors, vector_k, shards, filters)
+        if mode == "hybrid":
+            id_lists = [
+                self._fuse(query, ids, k, shards, lexical_index, filters) for query, ids in zip(queries, id_lists)
+            ]
+        return [self._documents_for(ids, shards) for ids in id_lists]
     
+    def get_retriever(self, k: int =4, filters: Optional[Dict[str, Any]] = None):
+        if not self.shards:
+            return None
+        return KnowledgeBaseRetriever(knowledge_base=self, k=k, filters=normalize_filters(filters))
+
+
+class KnowledgeBaseRetriever(BaseRetriever):
+    """LangChain retriever over KnowledgeBase.search_similar_documents, in whatever retrieval mode is set"""
+    knowledge_base: Any
+    k: int = 4
+    filters: Optional[Dict[str, Any]] = None
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                vector: Optional[List[float]] = None) -> List[Document]:
+        # invoke(query, vector=...) reuses an embedding the caller already made
+        return self.knowledge_base.search_similar_documents(query, k=self.k, filters=self.filters, vector=vector)
+
 if __name__ == "__main__":
     import logging
     logging.basicConfig(level=logging.INFO)
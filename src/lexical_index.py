@@ -0,0 +1,158 @@
+import re
+import math
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from pathlib import Path
+from collections import Counter
+
+import numpy as np
+from config.settings import LEXICAL_CONFIG
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+CAMEL_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens; identifiers also contribute their snake/camel parts"""
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text):
+        tokens.append(word.lower())
+        parts = [part for piece in word.split("_") for part in CAMEL_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            tokens.extend(part.lower() for part in parts)
+    return tokens
+
+class BM25Index:
+    """Okapi BM25 inverted index over chunk ids, saved as flat numpy arrays
+
+    Removed chunks are tombstoned in memory and dropped when the index is saved.
+    """
+
+    def __init__(self, k1: float = None, b: float = None):
+        self.k1 = k1 or LEXICAL_CONFIG["k1"]
+        self.b = b or LEXICAL_CONFIG["b"]
+        self.doc_ids: List[Optional[str]] = []
+        self.doc_lengths: List[int] = []
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self._positions: Dict[str, int] = {}
+        self._live_docs = 0
+        self._live_length = 0
+
+    def __len__(self) -> int:
+        return self._live_docs
+
+    def add(self, doc_ids: List[str], texts: List[str]):
+        for doc_id, text in zip(doc_ids, texts):
+            position = len(self.doc_ids)
+            counts = Counter(tokenize(text))
+            length = sum(counts.values())
+
+            self.doc_ids.append(doc_id)
+            self.doc_lengths.append(length)
+            self._positions[doc_id] = position
+            self._live_docs += 1
+            self._live_length += length
+            for term, tf in counts.items():
+                self.postings.setdefault(term, {})[position] = tf
+
+    def remove(self, doc_ids: List[str]):
+        for doc_id in doc_ids:
+            position = self._positions.pop(doc_id, None)
+            if position is None:
+                continue
+            self.doc_ids[position] = None
+            self._live_docs -= 1
+            self._live_length -= self.doc_lengths[position]
+
+    def search(self, query: str, k: int, allowed: Optional[Iterable[str]] = None) -> List[Tuple[str, float]]:
+        """Top k chunk ids by BM25, only among allowed ids when given"""
+        if not self._live_docs:
+            return []
+
+        avg_length = self._live_length / self._live_docs
+        lengths = np.asarray(self.doc_lengths, dtype=np.float32)
+        norms = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        scores = np.zeros(len(self.doc_ids), dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            positions = np.fromiter(postings.keys(), dtype=np.int64, count=len(postings))
+            tfs = np.fromiter(postings.values(), dtype=np.float32, count=len(postings))
+            df = len(postings)
+            idf = math.log(1 + (self._live_docs - df + 0.5) / (df + 0.5))
+            scores[positions] += idf * tfs * (self.k1 + 1) / (tfs + norms[positions])
+
+        if allowed is not None:
+            mask = np.zeros(len(self.doc_ids), dtype=bool)
+            mask[[self._positions[doc_id] for doc_id in allowed if doc_id in self._positions]] = True
+            scores[~mask] = 0
+
+        candidates = np.nonzero(scores)[0]
+        candidates = [i for i in candidates if self.doc_ids[i] is not None]
+        if not candidates:
+            return []
+
+        candidates = np.asarray(candidates)
+        top = candidates[np.argsort(-scores[candidates], kind="stable")[:k]]
+        return [(self.doc_ids[i], float(scores[i])) for i in top]
+
+    def save(self, path: Path):
+        """Write the live postings as compressed arrays (no pickle)"""
+        live = [i for i, doc_id in enumerate(self.doc_ids) if doc_id is not None]
+        remap = {old: new for new, old in enumerate(live)}
+
+        terms, offsets, post_docs, post_tfs = [], [0], [], []
+        for term, postings in self.postings.items():
+            entries = sorted((remap[i], tf) for i, tf in postings.items() if i in remap)
+            if not entries:
+                continue
+            terms.append(term)
+            post_docs.extend(i for i, _ in entries)
+            post_tfs.extend(min(tf, 65535) for _, tf in entries)
+            offsets.append(len(post_docs))
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(
+                f,
+                terms=np.frombuffer("\n".join(terms).encode("utf-8"), dtype=np.uint8),
+                offsets=np.asarray(offsets, dtype=np.int64),
+                post_docs=np.asarray(post_docs, dtype=np.int32),
+                post_tfs=np.asarray(post_tfs, dtype=np.uint16),
+                doc_ids=np.frombuffer("\n".join(self.doc_ids[i] for i in live).encode("utf-8"), dtype=np.uint8),
+                doc_lengths=np.asarray([self.doc_lengths[i] for i in live], dtype=np.int32)
+            )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BM25Index":
+        index = cls()
+        with np.load(path, allow_pickle=False) as data:
+            terms = data["terms"].tobytes().decode("utf-8").split("\n") if data["terms"].size else []
+            doc_ids = data["doc_ids"].tobytes().decode("utf-8").split("\n") if data["doc_ids"].size else []
+            offsets = data["offsets"]
+            post_docs = data["post_docs"]
+            post_tfs = data["post_tfs"]
+            doc_lengths = data["doc_lengths"].tolist()
+
+        index.doc_ids = doc_ids
+        index.doc_lengths = doc_lengths
+        index._positions = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+        index._live_docs = len(doc_ids)
+        index._live_length = sum(doc_lengths)
+        for term_number, term in enumerate(terms):
+            start, end = offsets[term_number], offsets[term_number + 1]
+            index.postings[term] = dict(zip(post_docs[start:end].tolist(), post_tfs[start:end].tolist()))
+        return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[str]:
+    """Merge ranked id lists; ids ranked high in any list float to the top"""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda doc_id: -scores[doc_id])
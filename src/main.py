@@ -1,6 +1,8 @@
 import sys
+import copy
 import logging 
 import argparse
+from typing import Dict, Any, Iterator
 from pathlib import Path
 
 src_path = Path(__file__).parent
@@ -13,62 +15,209 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)  
 
-from config.settings import OLLAMA_CONFIG, DATA_PATHS
-from document_processor import DocumentProcessor
-from knowledge_base import KnowledgeBase
-from dual_agent import DualAgent
+from config.settings import (
+    OLLAMA_CONFIG, DATA_PATHS, SERVER_CONFIG, RETRIEVAL_CONFIG, PROFILING_CONFIG, SHARD_CONFIG, BUILD_CONFIG,
+    SCHEDULER_CONFIG, INDEX_CONFIG, ensure_data_directories
+)
+from search_filters import parse_filter_args
+import profiling
+
+# Everything that pulls in langchain, FAISS or the Ollama clients is imported by the command
+# that needs it, so --help, usage and remote --ask start without loading any of them
+
+def build_knowledge_base(full_rebuild: bool = False, parallel: bool = None):
+    from document_processor import DocumentProcessor
+    from knowledge_base import KnowledgeBase
+    from manifest import BuildManifest
+    from ingest import IngestPipeline
+    from store_versions import VersionedStore
 
-def build_knowledge_base():
     logger.info("Building knowledge base ...")
+    ensure_data_directories()
 
-    processor = DocumentProcessor()
-    documents = processor.process_documents()
+    processor = DocumentProcessor(parallel=parallel)
+    files = processor.discover_files()
 
-    if not documents: 
+    if not files: 
         logger.error("No documents found to process")
         print("Place your files in data/raw/")
         return False
     
-    knowledge_base = KnowledgeBase()
-    if knowledge_base.create_knowledge_base(documents):
-        if knowledge_base.save_knowledge_base():
-            logger.info("Knowledge base built successfully!")
-            return True
+    # Everything is written to a new store version; readers see it once it is published
+    store = VersionedStore()
+    if full_rebuild:
+        logger.info("Full rebuild requested - starting from an empty index")
+    build_path = store.begin(fresh=full_rebuild)
+    knowledge_base = KnowledgeBase(store_path=build_path)
+    manifest = BuildManifest(build_path / BUILD_CONFIG["manifest_file"])
+
+    has_manifest = manifest.load()
+    if has_manifest and not knowledge_base.load_knowledge_base(mmap=False, path=build_path):
+        logger.warning("Manifest found without an index - rebuilding everything")
+        knowledge_base.clear_knowledge_base()
+        manifest.clear()
+    elif not has_manifest and knowledge_base.load_knowledge_base(mmap=False, path=build_path):
+        # Stores from before the manifest: no chunk is tracked, so adding to them would duplicate every file
+        logger.warning("Index found without a manifest - rebuilding everything")
+        knowledge_base.clear_knowledge_base()
+        manifest.clear()
+    elif manifest.files and manifest.embeddings != knowledge_base.vector_format:
+        # Older builds stored raw /api/embeddings vectors; mixing them with unit vectors breaks L2 search
+        logger.warning(f"Index was built with other embeddings ({manifest.embeddings or 'unnormalized'}) "
+                       f"- rebuilding everything")
+        knowledge_base.clear_knowledge_base()
+        manifest.clear()
+    manifest.embeddings = knowledge_base.vector_format
+
+    changed, removed = manifest.diff(files)
+    logger.info(f"Files: {len(files)} total, {len(changed)} new/changed, {len(removed)} removed")
+    changed_keys = {manifest.key_for(file_path) for file_path in changed}
+    failed = [key for key in manifest.failed() if key not in changed_keys and key not in removed]
+    if failed:
+        logger.info(f"Skipping {len(failed)} file(s) that failed before and have not changed: {', '.join(failed)}")
+    # Files the build is about to (re)record; equal afterwards means the index is untouched too
+    recorded_before = copy.deepcopy(manifest.files)
+
+    if not changed and not removed:
+        if store.resumed or store.migrated:
+            # Interrupted after its last checkpoint, or an older store brought up to date
+            store.publish(build_path)
+        else:
+            store.abandon(build_path)
+        logger.info("Knowledge base is up to date")
+        processor.cleanup_text_cache(files)
+        return True
+
+    # Drop stale vectors for removed files and for files about to be re-embedded;
+    # chunks other files still share only lose this file from their sources
+    stale_keys = removed + [manifest.key_for(file_path) for file_path in changed]
+    references = manifest.reference_counts()
+    for key in stale_keys:
+        chunk_ids = manifest.chunk_ids(key)
+        shared = {chunk_id for chunk_id in chunk_ids if references[chunk_id] > 1}
+        references.subtract(chunk_ids)
+        unshared = [chunk_id for chunk_id in chunk_ids if chunk_id not in shared]
+        if not knowledge_base.delete_documents(unshared) or (
+            shared and not knowledge_base.remove_source(list(shared), manifest.source_for(key))
+        ):
+            logger.error("Error handling knowledge base")
+            return False
+        manifest.remove(key)
+
+    pipeline = IngestPipeline(processor, knowledge_base, manifest)
+    succeeded = pipeline.run(changed)
+    # After the run, so text extracted from the previous version of a changed file is dropped too
+    processor.cleanup_text_cache(files)
+
+    if processor.text_cache is not None:
+        text_stats = processor.text_cache.stats()
+        logger.info(f"Text cache: {text_stats['hits']} hits, {text_stats['misses']} misses "
+                    f"({text_stats['hit_rate']:.0%} hit rate)")
+
+    cache_stats = knowledge_base.embedding_cache_stats()
+    if cache_stats:
+        logger.info(f"Embedding cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                    f"({cache_stats['hit_rate']:.0%} hit rate, {cache_stats['entries']} entries)")
+
+    if succeeded and not knowledge_base.has_index:
+        logger.error("No documents found to process")
+        return False
+
+    if pipeline.skipped_chunks:
+        logger.info(f"Deduplicated {pipeline.skipped_chunks} chunks ({pipeline.duplicates['exact']} exact, "
+                    f"{pipeline.duplicates['near']} near) - {pipeline.skipped_chunks} embedding calls saved")
+
+    if succeeded and manifest.files == recorded_before and not (store.resumed or store.migrated):
+        # Nothing embedded, removed or newly recorded as failed: keep serving the current version
+        store.abandon(build_path)
+        logger.info("Knowledge base is up to date")
+        return True
+
+    if succeeded:
+        store.publish(build_path)
+        logger.info(f"Knowledge base built successfully! "
+                    f"({pipeline.total_chunks - pipeline.skipped_chunks} chunks embedded)")
+        return True
     
+    # The unpublished version stays on disk and the next build resumes it
     logger.error("Error handling knowledge base")
     return False 
 
-def ask_question(question: str, agent: str = "auto"):
-    agent_handler = DualAgent()
-
-    if agent_handler.initialize():
-        print("🔄 Processing your question... (this may take 10-30 seconds)")
-        result = agent_handler.ask_question(question, agent)
-
-        print(f"🔍 Debug - Result keys: {list(result.keys())}")
-        print(f"🔍 Debug - Success: {result.get('success')}")
+def print_profile(trace: profiling.Trace):
+    if trace is not None and PROFILING_CONFIG["enabled"]:
+        print(f"\n{trace.format()}")
 
-        if result.get('success', False):
+def stream_answer(events: Iterator[Dict[str, Any]], show_previews: bool = True):
+    """Print tokens as they arrive, then the sources and generation timings"""
+    sources = []
+    for event in events:
+        if event["type"] == "sources":
+            sources = event["sources"]
             print(f"\n{'='*50}")
-            print(f"{result['agent']} ({result['model']}):")
-            print(f"{'='*50}")
-            print(f"{result['answer']}")
+            print(f"{event['agent']} ({event['model']}):")
+            routing = event.get("routing")
+            if routing and routing["method"] == "embedding":
+                print(f"🧭 Routed by embedding (confidence {routing['confidence']:.0%})")
             print(f"{'='*50}")
+        elif event["type"] == "token":
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "done":
+            stats = event["stats"]
+            print(f"\n{'='*50}")
+            if event.get("cached"):
+                print(f"⚡ Cached answer in {stats['total_time'] * 1000:.1f} ms")
+            else:
+                print(f"⏱ First token: {stats['time_to_first_token']:.2f}s | "
+                      f"{stats['tokens_per_sec']:.1f} tokens/sec | total {stats['total_time']:.2f}s")
+                if stats.get("queue_wait"):
+                    print(f"   Waited {stats['queue_wait']:.2f}s for a free model slot")
+                if stats.get("prompt_tokens") is not None:
+                    print(f"   Prompt tokens processed: {stats['prompt_tokens']}"
+                          f"{' (conversation context reused)' if stats.get('reused_context') else ''}")
 
-            if result.get('sources'):
-                print(f"\nSources ({len(result['sources'])}):")
-                for i, source in enumerate(result['sources'], 1):  
+            if not sources:
+                print("\n💡 Note: Response from model (no documents used)")
+            elif show_previews:
+                print(f"\nSources ({len(sources)}):")
+                for i, source in enumerate(sources, 1):  
                     print(f"{i}. {source['source']}")
                     print(f"   Preview: {source['preview']}\n")
             else:
-                print("\n💡 Note: Response from model (no documents used)")
-        else:
-            print(f"\n❌ Error: {result.get('answer', 'Unknown error')}")
-            
-    else: 
-        print("First build the knowledge base with: python src/main.py --build")
+                print(f"\n Sources consulted: {len(sources)}")
+        elif event["type"] == "error":
+            print(f"\n❌ Error: {event.get('answer', 'Unknown error')}")
+
+def ask_question(question: str, agent: str = "auto", server_url: str = None, filters: Dict[str, Any] = None):
+    if server_url:
+        print(f"🔄 Sending your question to {server_url}...")
+        from client import stream_remote
+        stream_answer(stream_remote(server_url, question, agent, filters))
+        return
+
+    from dual_agent import DualAgent
+    agent_handler = DualAgent()
+
+    with profiling.trace("ask") as trace:
+        if agent_handler.initialize():
+            print("🔄 Processing your question...")
+            stream_answer(agent_handler.stream_question(question, agent, filters=filters))
+        else: 
+            print("First build the knowledge base with: python src/main.py --build")
+    print_profile(trace)
+
+def run_batch(input_path: str, output_path: str):
+    from dual_agent import DualAgent
+    from batch_runner import BatchRunner
+    agent_handler = DualAgent()
+    with profiling.trace("batch") as trace:
+        agent_handler.initialize()
+        succeeded = BatchRunner(agent_handler).run_file(Path(input_path), Path(output_path))
+    print_profile(trace)
+    return succeeded
 
 def interactive_chat():
+    from dual_agent import DualAgent
+    from chat_session import ChatSession
     agent_handler = DualAgent()
     agents = agent_handler.list_agents()
 
@@ -98,35 +247,84 @@ def interactive_chat():
     print(f" I can help with: {', '.join(agent_info['capabilities'][:3])}")
     print("\n" + "=" * 50)
 
+    # Follow-up turns reuse the model's context instead of re-reading the whole conversation
+    session = ChatSession()
     while True:
-        user_input = input("\n Your question (or 'exit'): ").strip()
+        user_input = input("\n Your question (or 'new' to forget the conversation, 'exit'): ").strip()
         
         if user_input.lower() in ['exit', 'quit', 'salir']:
             print("Goodbye! ")
             break
 
-        if user_input:
-            print("Thinking...")
-            result = agent_handler.ask_question(user_input, selected_agent)
-
-            if result["success"]:
-                print(f"\n Answer ({result['model']}):")
-                print(result["answer"])
+        if user_input.lower() in ['new', 'reset', 'nuevo']:
+            session.reset()
+            print("🧹 Conversation cleared")
+            continue
 
-                if result["sources"]:
-                    print(f"\n Sources consulted: {len(result['sources'])}")
-            else:
-                print(f"Error: {result['answer']}")
+        if user_input:
+            with profiling.trace("chat_turn") as trace:
+                stream_answer(agent_handler.stream_question(user_input, selected_agent, session), show_previews=False)
+            print_profile(trace)
 
 def main():
     parser = argparse.ArgumentParser(description = "Dual Agent RAG System")
     parser.add_argument("--build", action="store_true", help="Build knowledge base")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="With --build: discard the index and re-embed every document")
+    parser.add_argument("--parallel", action="store_true",
+                        help="With --build: parse documents in a process pool on all cores")
     parser.add_argument("--ask", "-a", help="Ask a specific question")
     parser.add_argument("--agent", "-g", default="auto",  
                         help="Agent: coder (Mistral 7B), assistant (Genma 2B), auto")
     parser.add_argument("--chat", "-c", action="store_true", help="Interactive chat mode")
+    parser.add_argument("--serve", action="store_true",
+                        help="Keep the knowledge base loaded and answer /ask requests over HTTP")
+    parser.add_argument("--host", default=SERVER_CONFIG["host"], help="Host for --serve")
+    parser.add_argument("--port", type=int, default=SERVER_CONFIG["port"], help="Port for --serve")
+    parser.add_argument("--retrieval", choices=["vector", "hybrid", "lexical"],
+                        help="Retrieval mode: FAISS only, FAISS + BM25 fused, or BM25 only (no embedding call)")
+    parser.add_argument("--shard-by", choices=["directory", "size"],
+                        help="With --build: one index per top-level folder of data/raw, or a new one every N chunks")
+    parser.add_argument("--encoding", choices=["float32", "float16", "int8"],
+                        help="With --build: store new indexes' vectors as float16 or int8 codes (--rebuild converts)")
+    parser.add_argument("--reduce", choices=["pca", "truncate"],
+                        help="With --build: shrink new indexes' vectors to reduced_dim by PCA or truncation")
+    parser.add_argument("--rescore", action="store_true",
+                        help="With --build: keep float32 copies to re-rank the shortlist of a compact index")
+    parser.add_argument("--shards", help="Comma-separated shard names to search (default: every shard)")
+    parser.add_argument("--filter", "-f", action="append", default=[], metavar="KEY=VALUE",
+                        help="With --ask: only retrieve matching chunks; source=FILE, ext=.pdf,.md, page=3, "
+                             "after=2024-01-31, before=... (repeatable)")
+    parser.add_argument("--batch", help="Answer every question in a JSONL file")
+    parser.add_argument("--out", default="results.jsonl", help="With --batch: JSONL file for the answers")
+    parser.add_argument("--profile", action="store_true",
+                        help="Print a per-stage timing breakdown for each request (and fill /metrics with --serve)")
+    parser.add_argument("--profile-log",
+                        help="Append one JSON line of stage timings per request to this file")
+    parser.add_argument("--prewarm", action="store_true",
+                        help="Load both models at startup and keep them loaded between requests (--serve, --chat)")
+    parser.add_argument("--server", "-s",
+                        help="With --ask: send the question to a running --serve instance (e.g. http://127.0.0.1:8765)")
 
     args = parser.parse_args()
+    if args.retrieval:
+        RETRIEVAL_CONFIG["mode"] = args.retrieval
+    if args.shard_by:
+        SHARD_CONFIG["strategy"] = args.shard_by
+    if args.encoding:
+        INDEX_CONFIG["encoding"] = args.encoding
+    if args.reduce:
+        INDEX_CONFIG["reduce"] = args.reduce
+    if args.rescore:
+        INDEX_CONFIG["rescore"] = True
+    if args.shards:
+        SHARD_CONFIG["search"] = [name.strip() for name in args.shards.split(",") if name.strip()]
+    if args.profile:
+        PROFILING_CONFIG["enabled"] = True
+    if args.profile_log:
+        PROFILING_CONFIG["jsonl_path"] = args.profile_log
+    if args.prewarm:
+        SCHEDULER_CONFIG["prewarm"] = True
 
     logger.info("Dual Agent RAG System - Starting ...")
     logger.info(f"coder: {OLLAMA_CONFIG['models']['coder']} (Mistral 7B)")
@@ -134,9 +332,21 @@ def main():
     logger.info(f"Documents: {DATA_PATHS['raw_documents']}")
 
     if args.build:
-        build_knowledge_base()
+        with profiling.trace("build") as trace:
+            build_knowledge_base(full_rebuild=args.rebuild, parallel=args.parallel or None)
+        print_profile(trace)
+    elif args.serve:
+        from server import serve
+        serve(args.host, args.port)
     elif args.ask:
-        ask_question(args.ask, args.agent)
+        try:
+            filters = parse_filter_args(args.filter)
+        except ValueError as e:
+            print(f"❌ Invalid filter: {e}")
+            return
+        ask_question(args.ask, args.agent, args.server, filters)
+    elif args.batch:
+        run_batch(args.batch, args.out)
     elif args.chat:
         interactive_chat()
     else:
@@ -146,6 +356,14 @@ def main():
         print(" python src/main.py --ask \"Write a Python function\" --agent coder")  
         print(" python src/main.py --ask \"Organize this document\" --agent assistant") 
         print(" python src/main.py --chat")
+        print(" python src/main.py --batch questions.jsonl --out results.jsonl")
+        print(" python src/main.py --serve --port 8765")
+        print(" python src/main.py --serve --prewarm")
+        print(" python src/main.py --ask \"Summarize this report\" --server http://127.0.0.1:8765")
+        print(" python src/main.py --ask \"Explain this function\" --profile")
+        print(" python src/main.py --build --rebuild --shard-by directory")
+        print(" python src/main.py --ask \"Summarize the contract\" --shards legal,finance")
+        print(" python src/main.py --ask \"What changed?\" --filter ext=.pdf --filter after=2024-01-01")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import json
+import hashlib
+import logging
+from collections import Counter
+from typing import Dict, Any, List, Tuple
+from pathlib import Path
+
+from config.settings import DATA_PATHS, BUILD_CONFIG
+
+logger = logging.getLogger(__name__)
+
+class BuildManifest:
+    """Track which raw files are indexed and which chunk ids belong to each one"""
+
+    def __init__(self, path: Path = None):
+        self.path = path or DATA_PATHS["vector_store"] / BUILD_CONFIG["manifest_file"]
+        self.files: Dict[str, Dict[str, Any]] = {}
+        # Embedding model and vector normalization every indexed chunk was built with
+        self.embeddings: Dict[str, Any] = {}
+
+    def load(self) -> bool:
+        try:
+            if self.path.exists():
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self.files = data.get("files", {})
+                self.embeddings = data.get("embeddings", {})
+                return True
+            return False
+        except Exception as e:
+            logger.error(f"Error loading manifest {self.path}: {e}")
+            self.files = {}
+            self.embeddings = {}
+            return False
+
+    def save(self) -> bool:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": 1, "embeddings": self.embeddings, "files": self.files}, f, indent=2)
+            tmp_path.replace(self.path)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving manifest {self.path}: {e}")
+            return False
+
+    def clear(self):
+        self.files = {}
+        self.embeddings = {}
+
+    @staticmethod
+    def key_for(file_path: Path) -> str:
+        """Stable manifest key: path relative to data/raw when possible"""
+        try:
+            return file_path.resolve().relative_to(DATA_PATHS["raw_documents"].resolve()).as_posix()
+        except ValueError:
+            return file_path.resolve().as_posix()
+
+    @staticmethod
+    def hash_file(file_path: Path) -> str:
+        digest = hashlib.new(BUILD_CONFIG["hash_algorithm"])
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(BUILD_CONFIG["hash_block_size"]), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _is_unchanged(self, key: str, file_path: Path, stat) -> bool:
+        entry = self.files.get(key)
+        if entry is None or entry["size"] != stat.st_size:
+            return False
+        if entry["mtime"] == stat.st_mtime:
+            return True
+
+        # Same size but touched: only a hash mismatch counts as a change
+        if entry["hash"] == self.hash_file(file_path):
+            entry["mtime"] = stat.st_mtime
+            return True
+        return False
+
+    def diff(self, file_paths: List[Path]) -> Tuple[List[Path], List[str]]:
+        """Return (new or changed files, keys of files removed from disk)"""
+        changed = []
+        seen = set()
+        for file_path in file_paths:
+            key = self.key_for(file_path)
+            seen.add(key)
+            if not self._is_unchanged(key, file_path, file_path.stat()):
+                changed.append(file_path)
+
+        removed = [key for key in self.files if key not in seen]
+        return changed, removed
+
+    def chunk_ids(self, key: str) -> List[str]:
+        entry = self.files.get(key)
+        return list(entry["chunk_ids"]) if entry else []
+
+    def reference_counts(self) -> Counter:
+        """How many files reference each chunk id; de-duplicated chunks are shared"""
+        return Counter(chunk_id for entry in self.files.values() for chunk_id in entry["chunk_ids"])
+
+    @staticmethod
+    def source_for(key: str) -> str:
+        """The "source" metadata chunks of the file under key were indexed with"""
+        path = Path(key)
+        return str(path if path.is_absolute() else DATA_PATHS["raw_documents"] / path)
+
+    def failed(self) -> List[str]:
+        """Keys of files that could not be indexed; they are retried once they change"""
+        return [key for key, entry in self.files.items() if entry.get("error")]
+
+    def record(self, file_path: Path, chunk_ids: List[str], error: str = None):
+        stat = file_path.stat()
+        entry = {
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "hash": self.hash_file(file_path),
+            "chunk_ids": list(dict.fromkeys(chunk_ids))
+        }
+        if error:
+            entry["error"] = error
+        self.files[self.key_for(file_path)] = entry
+
+    def remove(self, key: str):
+        self.files.pop(key, None)
@@ -0,0 +1,183 @@
+import re
+import time
+import heapq
+import itertools
+import logging
+import threading
+from typing import Any, Dict, Iterator, Optional
+from contextlib import contextmanager
+
+import requests
+from config.settings import OLLAMA_CONFIG, SCHEDULER_CONFIG
+import profiling
+
+logger = logging.getLogger(__name__)
+
+DURATION_UNITS = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+def parse_keep_alive(keep_alive: Any) -> Optional[float]:
+    """Seconds in an Ollama keep_alive ("30m", "1h30m", 300); None if negative (forever) or unparseable"""
+    text = str(keep_alive).strip()
+    try:
+        seconds = float(text)
+    except ValueError:
+        parts = DURATION_PART.findall(text)
+        if not parts or "".join(number + unit for number, unit in parts) != text.lstrip("+"):
+            return None
+        seconds = sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+    return seconds if seconds >= 0 else None
+
+class SchedulerFullError(RuntimeError):
+    """The model's queue is full; the caller should retry later"""
+
+class DeadlineExceededError(TimeoutError):
+    """The request waited in the queue past its deadline and was never started"""
+
+class _ModelQueue:
+    """Concurrency limit plus a bounded priority queue of waiting requests for one model"""
+
+    def __init__(self, model: str, concurrency: int, max_queue: int):
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max_queue
+        self.active = 0
+        # (priority, arrival, ticket); lower priority numbers go first, FIFO within one
+        self.waiting = []
+        self.condition = threading.Condition()
+        self._arrivals = itertools.count()
+
+    def acquire(self, priority: int, deadline: float) -> float:
+        """Block until a slot is free; returns the seconds spent waiting"""
+        start = time.monotonic()
+        with self.condition:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                return 0.0
+            if len(self.waiting) >= self.max_queue:
+                raise SchedulerFullError(
+                    f"{self.model} is busy: {self.active} running, {len(self.waiting)} queued"
+                )
+
+            entry = (priority, next(self._arrivals), object())
+            heapq.heappush(self.waiting, entry)
+            while not (self.active < self.concurrency and self.waiting[0] is entry):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.waiting.remove(entry)
+                    heapq.heapify(self.waiting)
+                    self.condition.notify_all()
+                    raise DeadlineExceededError(
+                        f"Gave up on {self.model} after {time.monotonic() - start:.1f}s in the queue"
+                    )
+                self.condition.wait(remaining)
+
+            heapq.heappop(self.waiting)
+            self.active += 1
+            # The next in line may fit too if more than one slot is free
+            self.condition.notify_all()
+            return time.monotonic() - start
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self.condition:
+            return {"active": self.active, "queued": len(self.waiting), "concurrency": self.concurrency}
+
+
+class ModelScheduler:
+    """One queue per Ollama model so a burst of requests can't overload the host
+
+    Requests run in priority order (interactive before batch) once a slot
+    for their model is free. A full queue rejects new work straight away
+    with SchedulerFullError; a request still queued at its deadline (the
+    Ollama timeout by default) fails with DeadlineExceededError.
+    """
+
+    def __init__(self, config: Dict[str, Any] = None):
+        self.config = config or SCHEDULER_CONFIG
+        self.priorities = self.config["priorities"]
+        self.queues: Dict[str, _ModelQueue] = {}
+        self._stop_keep_alive = threading.Event()
+        for agent_id, model in OLLAMA_CONFIG["models"].items():
+            if agent_id in self.config["concurrency"] and model not in self.queues:
+                self.queues[model] = _ModelQueue(
+                    model, self.config["concurrency"][agent_id], self.config["max_queue"][agent_id]
+                )
+
+    def _queue(self, model: str) -> _ModelQueue:
+        if model not in self.queues:
+            self.queues[model] = _ModelQueue(model, 1, max(self.config["max_queue"].values(), default=8))
+        return self.queues[model]
+
+    @contextmanager
+    def slot(self, model: str, priority: str = "interactive",
+             timeout: float = None) -> Iterator[Dict[str, float]]:
+        """Hold one of the model's slots for the duration of the block
+
+        Yields a dict whose "queue_wait" is the time spent waiting, kept apart
+        from the generation time measured inside the block.
+        """
+        timeout = OLLAMA_CONFIG["timeout"] if timeout is None else timeout
+        queue = self._queue(model)
+        with profiling.span("queue_wait", model=model, priority=priority) as stage:
+            waited = queue.acquire(self.priorities.get(priority, 0), time.monotonic() + timeout)
+            stage["queued"] = waited > 0
+        try:
+            yield {"queue_wait": waited}
+        finally:
+            queue.release()
+
+    def concurrency(self, model: str) -> int:
+        """Generations the model may run at once"""
+        return self._queue(model).concurrency
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {model: queue.stats() for model, queue in self.queues.items()}
+
+    def _load_models(self, keep_alive: str, refresh: bool = False):
+        for model in self.queues:
+            try:
+                start = time.perf_counter()
+                # A generate call without a prompt only loads the model (or resets its unload timer)
+                response = requests.post(
+                    f"{OLLAMA_CONFIG['base_url']}/api/generate",
+                    json={"model": model, "keep_alive": keep_alive, "stream": False},
+                    timeout=OLLAMA_CONFIG["timeout"]
+                )
+                response.raise_for_status()
+                if refresh:
+                    logger.debug(f"Kept {model} loaded for another {keep_alive}")
+                else:
+                    logger.info(f"Pre-warmed {model} in {time.perf_counter() - start:.1f}s "
+                                f"(kept loaded for {keep_alive})")
+            except requests.RequestException as e:
+                logger.warning(f"Could not {'refresh' if refresh else 'pre-warm'} {model}: {e}")
+
+    def prewarm(self, keep_alive: str = None) -> threading.Thread:
+        """Load every model in the background, then keep them resident until stop_keep_alive()
+
+        LangChain's Ollama client sends no keep_alive, so generations leave the
+        server's default (5 minutes) in place; re-sending keep_alive every half
+        period keeps the models loaded however long the process sits idle.
+        """
+        keep_alive = keep_alive or self.config["keep_alive"]
+        seconds = parse_keep_alive(keep_alive)
+        self._stop_keep_alive.clear()
+
+        def keep_loaded():
+            self._load_models(keep_alive)
+            # Negative (forever) or zero (unload at once) needs no refresh
+            while seconds and not self._stop_keep_alive.wait(seconds / 2):
+                self._load_models(keep_alive, refresh=True)
+
+        thread = threading.Thread(target=keep_loaded, name="model-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_keep_alive(self):
+        """Stop refreshing keep_alive; Ollama unloads the models once it runs out"""
+        self._stop_keep_alive.set()
@@ -0,0 +1,192 @@
+import json
+import time
+import logging
+import threading
+import contextvars
+from typing import Any, Dict, Iterator, Optional, Tuple
+from pathlib import Path
+from contextlib import contextmanager
+
+from config.settings import PROFILING_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+_current_path: contextvars.ContextVar = contextvars.ContextVar("current_path", default=())
+
+class Trace:
+    """Per-request timing breakdown: stage path -> count, seconds and summed attributes"""
+
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.stages: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self.counters: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def open_stage(self, path: Tuple[str, ...]):
+        """Reserve the stage's slot so the breakdown lists parents before their children"""
+        with self._lock:
+            self.stages.setdefault(path, {"count": 0, "seconds": 0.0})
+
+    def add_stage(self, path: Tuple[str, ...], seconds: float, attrs: Dict[str, Any]):
+        with self._lock:
+            stage = self.stages.setdefault(path, {"count": 0, "seconds": 0.0})
+            stage["count"] += 1
+            stage["seconds"] += seconds
+            for key, value in attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage[key] = stage.get(key, 0) + value
+                else:
+                    stage[key] = value
+
+    def count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "attrs": self.attrs,
+            "stages": [{"stage": "/".join(path), **stage} for path, stage in self.stages.items()],
+            "counters": self.counters
+        }
+
+    def format(self) -> str:
+        lines = [f"⏱ Profile: {self.name} {self.duration or 0:.3f}s"]
+        for path, stage in self.stages.items():
+            label = "  " * len(path) + path[-1]
+            extra = " ".join(
+                f"{key}={value}" for key, value in stage.items() if key not in ("count", "seconds")
+            )
+            repeat = f" x{stage['count']}" if stage["count"] > 1 else ""
+            lines.append(f"{label:<28}{stage['seconds'] * 1000:>10.1f} ms{repeat:<6} {extra}".rstrip())
+        if self.counters:
+            lines.append("  " + " ".join(f"{key}={value:g}" for key, value in self.counters.items()))
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Totals across every finished trace, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage_seconds: Dict[Tuple[str, str], float] = {}
+        self.stage_counts: Dict[Tuple[str, str], int] = {}
+        self.counters: Dict[str, float] = {}
+        self.requests: Dict[str, int] = {}
+
+    def observe(self, trace: Trace):
+        with self._lock:
+            self.requests[trace.name] = self.requests.get(trace.name, 0) + 1
+            for path, stage in trace.stages.items():
+                key = (trace.name, "/".join(path))
+                self.stage_seconds[key] = self.stage_seconds.get(key, 0.0) + stage["seconds"]
+                self.stage_counts[key] = self.stage_counts.get(key, 0) + stage["count"]
+            for name, value in trace.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def prometheus_text(self) -> str:
+        with self._lock:
+            lines = [
+                "# HELP rag_requests_total Profiled requests by entry point",
+                "# TYPE rag_requests_total counter"
+            ]
+            lines += [f'rag_requests_total{{trace="{name}"}} {count}' for name, count in self.requests.items()]
+            lines += [
+                "# HELP rag_stage_seconds Time spent per pipeline stage",
+                "# TYPE rag_stage_seconds summary"
+            ]
+            for (name, stage), seconds in self.stage_seconds.items():
+                labels = f'trace="{name}",stage="{stage}"'
+                lines.append(f"rag_stage_seconds_sum{{{labels}}} {seconds:.6f}")
+                lines.append(f"rag_stage_seconds_count{{{labels}}} {self.stage_counts[(name, stage)]}")
+            lines += [
+                "# HELP rag_events_total Tokens, chunks and cache hits counted while profiling",
+                "# TYPE rag_events_total counter"
+            ]
+            lines += [f'rag_events_total{{event="{name}"}} {value:g}' for name, value in self.counters.items()]
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+_jsonl_lock = threading.Lock()
+
+def enabled() -> bool:
+    return bool(PROFILING_CONFIG["enabled"] or PROFILING_CONFIG["jsonl_path"])
+
+def _export(trace: Trace):
+    metrics.observe(trace)
+    jsonl_path = PROFILING_CONFIG["jsonl_path"]
+    if not jsonl_path:
+        return
+    try:
+        with _jsonl_lock, open(Path(jsonl_path), "a", encoding="utf-8") as f:
+            f.write(json.dumps(trace.to_dict(), ensure_ascii=False, default=str) + "\n")
+    except OSError as e:
+        logger.warning(f"Could not write profile to {jsonl_path}: {e}")
+
+@contextmanager
+def trace(name: str, **attrs) -> Iterator[Optional[Trace]]:
+    """Start a request trace; inside another trace this is just a nested span"""
+    parent = _current_trace.get()
+    if parent is not None:
+        with span(name, **attrs):
+            yield parent
+        return
+    if not enabled():
+        yield None
+        return
+
+    current = Trace(name, **attrs)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        current.finish()
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Generators can be closed from a different context than they started in
+            _current_trace.set(None)
+        _export(current)
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """Time a stage of the current trace; set keys on the yielded dict to record counts"""
+    current = _current_trace.get()
+    if current is None:
+        yield attrs
+        return
+
+    path = _current_path.get() + (name,)
+    current.open_stage(path)
+    token = _current_path.set(path)
+    start = time.perf_counter()
+    try:
+        yield attrs
+    finally:
+        current.add_stage(path, time.perf_counter() - start, attrs)
+        try:
+            _current_path.reset(token)
+        except ValueError:
+            _current_path.set(path[:-1])
+
+def record(name: str, seconds: float, **attrs):
+    """Add a stage measured by hand, e.g. one that spans several generator yields"""
+    current = _current_trace.get()
+    if current is not None:
+        current.add_stage(_current_path.get() + (name,), seconds, attrs)
+
+def count(name: str, value: float = 1):
+    current = _current_trace.get()
+    if current is not None:
+        current.count(name, value)
@@ -0,0 +1,81 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Filter key -> attributes column, plus the short names accepted on the command line
+LIST_FILTERS = {"source": "source", "page": "page", "extension": "extension"}
+RANGE_FILTERS = {"modified_after": ("mtime", ">="), "modified_before": ("mtime", "<")}
+ALIASES = {
+    "file": "source", "ext": "extension",
+    "after": "modified_after", "since": "modified_after",
+    "before": "modified_before", "until": "modified_before"
+}
+
+def _timestamp(value: Any) -> float:
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value)).timestamp()
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Validate a filter dict; single values become lists and dates become timestamps
+
+    Raises ValueError for unknown keys or unparseable values.
+    """
+    if not filters:
+        return None
+
+    normalized = {}
+    for key, value in filters.items():
+        key = ALIASES.get(key, key)
+        if key in RANGE_FILTERS:
+            normalized[key] = _timestamp(value)
+        elif key in LIST_FILTERS:
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            if key == "page":
+                values = [int(page) for page in values]
+            elif key == "extension":
+                values = [f".{str(ext).lstrip('.').lower()}" for ext in values]
+            else:
+                values = [str(source) for source in values]
+            normalized[key] = values
+        else:
+            raise ValueError(f"Unknown filter: {key} (expected one of "
+                             f"{', '.join(list(LIST_FILTERS) + list(RANGE_FILTERS))})")
+    return normalized or None
+
+def parse_filter_args(values: List[str]) -> Optional[Dict[str, Any]]:
+    """Turn ["ext=.pdf,.md", "after=2024-01-01"] from --filter into a normalized dict"""
+    filters: Dict[str, Any] = {}
+    for item in values or []:
+        key, sep, value = item.partition("=")
+        if not sep or not value:
+            raise ValueError(f"Filters look like key=value, got: {item}")
+        key = ALIASES.get(key.strip(), key.strip())
+        if key in LIST_FILTERS:
+            filters.setdefault(key, []).extend(part.strip() for part in value.split(",") if part.strip())
+        else:
+            filters[key] = value.strip()
+    return normalize_filters(filters)
+
+def filter_clause(filters: Dict[str, Any], alias: str = "a") -> Tuple[str, List[Any]]:
+    """SQL condition over the docstore's attributes (and chunk_sources) tables for normalized filters"""
+    conditions, params = [], []
+    for key, values in filters.items():
+        if key in RANGE_FILTERS:
+            column, op = RANGE_FILTERS[key]
+            conditions.append(f"{alias}.{column} {op} ?")
+            params.append(values)
+        elif key == "source":
+            # Any file the chunk stands for, not just its primary source; a bare file name
+            # matches wherever the file lives
+            placeholders = ",".join("?" * len(values))
+            conditions.append(f"{alias}.id IN (SELECT id FROM chunk_sources "
+                              f"WHERE source IN ({placeholders}) OR name IN ({placeholders}))")
+            params += values + values
+        else:
+            placeholders = ",".join("?" * len(values))
+            conditions.append(f"{alias}.{LIST_FILTERS[key]} IN ({placeholders})")
+            params += values
+    return " AND ".join(conditions) or "1", params
@@ -0,0 +1,110 @@
+import json
+import logging
+import itertools
+from typing import Dict, Any
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from config.settings import SERVER_CONFIG
+from dual_agent import DualAgent
+from search_filters import normalize_filters
+import profiling
+
+logger = logging.getLogger(__name__)
+
+class AskRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end for a DualAgent that was initialized once at startup"""
+    agent_handler: DualAgent = None
+
+    def _send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            scheduler = self.agent_handler.scheduler
+            self._send_json(200, {
+                "status": "ok",
+                "agents": self.agent_handler.list_agents(),
+                "queues": scheduler.stats() if scheduler else {}
+            })
+        elif self.path == "/metrics":
+            # Prometheus text format; stays empty unless profiling is enabled (--profile)
+            body = profiling.metrics.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/ask":
+            self._send_json(404, {"error": f"Unknown path: {self.path}"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            question = payload["question"]
+            filters = normalize_filters(payload.get("filters"))
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"Invalid request: {e}"})
+            return
+
+        agent = payload.get("agent", "auto")
+        priority = payload.get("priority", "interactive")
+        if not payload.get("stream"):
+            result = self.agent_handler.ask_question(question, agent, filters=filters, priority=priority)
+            # Busy models answer 503 so clients know to back off and retry
+            self._send_json(503 if result.get("busy") else 200, result)
+            return
+
+        events = self.agent_handler.stream_question(question, agent, filters=filters, priority=priority)
+        first = next(events, None)
+        if first is not None and first.get("busy"):
+            self._send_json(503, first)
+            return
+
+        # Newline-delimited JSON events; the connection closes when the answer is done
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        try:
+            for event in itertools.chain([first] if first is not None else [], events):
+                self.wfile.write(json.dumps(event).encode("utf-8") + b"\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            logger.info("Client disconnected before the answer finished")
+
+    def log_message(self, format: str, *args):
+        logger.info(f"{self.address_string()} - {format % args}")
+
+
+def serve(host: str = None, port: int = None) -> bool:
+    """Load the knowledge base and QA chains once, then answer /ask requests"""
+    agent_handler = DualAgent()
+    if not agent_handler.initialize():
+        return False
+
+    AskRequestHandler.agent_handler = agent_handler
+    server = ThreadingHTTPServer(
+        (host or SERVER_CONFIG["host"], port or SERVER_CONFIG["port"]),
+        AskRequestHandler
+    )
+    server.daemon_threads = True
+
+    logger.info(f"Serving on http://{server.server_address[0]}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down server")
+    finally:
+        server.server_close()
+    return True
+
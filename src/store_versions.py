@@ -0,0 +1,169 @@
+import os
+import uuid
+import shutil
+import sqlite3
+import logging
+from datetime import datetime
+from typing import List, Optional
+from pathlib import Path
+
+from config.settings import DATA_PATHS, STORE_CONFIG
+from vector_shard import migrate_store
+
+logger = logging.getLogger(__name__)
+
+class VersionedStore:
+    """Immutable build directories under the vector store with an atomic CURRENT pointer
+
+    A build writes into versions/<name> (a copy of the current version for
+    incremental builds) and only becomes visible when CURRENT is replaced,
+    so readers never see a half-written index. An interrupted build leaves
+    its staging directory recorded in BUILDING and the next build resumes it.
+    Stores from before versioning keep working from the root until the
+    first versioned build is published. Published versions are only read;
+    files an older release wrote are migrated in the build's own copy.
+    """
+
+    def __init__(self, root: Path = None):
+        self.root = Path(root or DATA_PATHS["vector_store"])
+        self.versions_dir = self.root / STORE_CONFIG["versions_dir"]
+        self.current_file = self.root / STORE_CONFIG["current_file"]
+        self.staging_file = self.root / STORE_CONFIG["staging_file"]
+        # Set by begin() when it picked up an interrupted build
+        self.resumed = False
+        # Set by begin() when the copy it returned had to be migrated, so it differs from CURRENT
+        self.migrated = False
+
+    @staticmethod
+    def _read_pointer(pointer: Path) -> Optional[str]:
+        try:
+            return pointer.read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _write_pointer(pointer: Path, name: str):
+        tmp_path = pointer.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, pointer)
+
+    def current_name(self) -> Optional[str]:
+        return self._read_pointer(self.current_file)
+
+    def current_path(self) -> Path:
+        """Directory of the published version (the root itself for unversioned stores)"""
+        name = self.current_name()
+        if name is None:
+            return self.root
+        return self.versions_dir / name
+
+    def _legacy_entries(self) -> List[Path]:
+        reserved = {self.versions_dir.name, self.current_file.name, self.staging_file.name}
+        if not self.root.exists():
+            return []
+        return [path for path in self.root.iterdir() if path.name not in reserved]
+
+    @staticmethod
+    def _copy_file(source: str, destination: str):
+        # SQLite's backup API folds in the WAL, even while readers hold the database open
+        if source.endswith(".sqlite"):
+            src, dst = sqlite3.connect(source), sqlite3.connect(destination)
+            try:
+                src.backup(dst)
+            finally:
+                src.close()
+                dst.close()
+        else:
+            shutil.copy2(source, destination)
+
+    def _copy_version(self, source: Path, destination: Path):
+        entries = source.iterdir() if source != self.root else self._legacy_entries()
+        skip = shutil.ignore_patterns("*-wal", "*-shm", "*.tmp")
+        for entry in entries:
+            if skip(str(entry.parent), [entry.name]):
+                continue
+            if entry.is_dir():
+                shutil.copytree(entry, destination / entry.name, ignore=skip, copy_function=self._copy_file)
+            else:
+                self._copy_file(str(entry), str(destination / entry.name))
+
+    def begin(self, fresh: bool = False) -> Path:
+        """Directory the next build writes into: the unfinished one, or a new copy of CURRENT
+
+        fresh discards any unfinished build and starts from an empty directory.
+        """
+        staging = self._read_pointer(self.staging_file)
+        if staging is not None:
+            path = self.versions_dir / staging
+            if not fresh and path.is_dir():
+                logger.info(f"Resuming unfinished build {staging}")
+                self.resumed = True
+                self.migrated = migrate_store(path)
+                return path
+            shutil.rmtree(path, ignore_errors=True)
+
+        self.resumed = False
+        self.migrated = False
+        # Names sort in build order (cleanup relies on it), even for builds within one second
+        name = f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{uuid.uuid4().hex[:6]}"
+        path = self.versions_dir / name
+        path.mkdir(parents=True)
+        if not fresh:
+            # Copied, not linked: the docstore is updated in place during the build
+            self._copy_version(self.current_path(), path)
+            self.migrated = migrate_store(path)
+        self._write_pointer(self.staging_file, name)
+        logger.info(f"Building store version {name}")
+        return path
+
+    def publish(self, path: Path):
+        """Atomically point CURRENT at a finished build, then drop old versions"""
+        self._write_pointer(self.current_file, path.name)
+        self.staging_file.unlink(missing_ok=True)
+        logger.info(f"Published store version {path.name}")
+        self.cleanup()
+
+    def abandon(self, path: Path):
+        """Delete a build that turned out to change nothing"""
+        shutil.rmtree(path, ignore_errors=True)
+        self.staging_file.unlink(missing_ok=True)
+
+    def versions(self) -> List[str]:
+        if not self.versions_dir.is_dir():
+            return []
+        return sorted(path.name for path in self.versions_dir.iterdir() if path.is_dir())
+
+    def cleanup(self, keep: int = None) -> List[str]:
+        """Remove all but the newest keep published versions; returns the names removed
+
+        Processes still reading a removed version keep their open files; the
+        one or more previous versions kept give lazy readers time to swap.
+        """
+        keep = STORE_CONFIG["keep_versions"] if keep is None else keep
+        current = self.current_name()
+        if current is None:
+            return []
+
+        staging = self._read_pointer(self.staging_file)
+        published = [name for name in self.versions() if name != staging and name <= current]
+        stale = [name for name in published[:-max(keep, 1)] if name != current]
+        # Versions newer than CURRENT without a BUILDING pointer are leftovers of crashed builds
+        stale += [name for name in self.versions() if name > current and name != staging]
+        for name in stale:
+            shutil.rmtree(self.versions_dir / name, ignore_errors=True)
+        if stale:
+            logger.info(f"Removed old store versions: {', '.join(stale)}")
+
+        # Files of the pre-versioning layout are superseded by the first published version
+        legacy = self._legacy_entries()
+        for entry in legacy:
+            if entry.is_dir():
+                shutil.rmtree(entry, ignore_errors=True)
+            else:
+                entry.unlink(missing_ok=True)
+        if legacy:
+            logger.info(f"Removed the unversioned store files ({len(legacy)}) from {self.root}")
+        return stale
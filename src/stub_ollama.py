@@ -0,0 +1,194 @@
+import re
+import json
+import time
+import zlib
+import threading
+import logging
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+from config.settings import DATA_PATHS, OLLAMA_CONFIG, EMBEDDING_CACHE_CONFIG, ANSWER_CACHE_CONFIG, STORE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+class StubOllamaServer:
+    """Local stand-in for Ollama's HTTP API with deterministic vectors and latency
+
+    Serves /api/embed, /api/embeddings, /api/generate (streamed or not) and
+    /api/tags so the pipeline can be benchmarked without a model. Vectors are
+    hashed bags of words, so texts sharing words land close together and
+    similarity search still returns something sensible.
+    """
+
+    def __init__(self, dimension: int = 384, embed_latency: float = 0.002,
+                 embed_latency_per_input: float = 0.0005, prefill_latency_per_token: float = 0.0001,
+                 token_latency: float = 0.005, answer_tokens: int = 32, batch_endpoint: bool = True,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.dimension = dimension
+        self.embed_latency = embed_latency
+        self.embed_latency_per_input = embed_latency_per_input
+        self.prefill_latency_per_token = prefill_latency_per_token
+        self.token_latency = token_latency
+        self.answer_tokens = answer_tokens
+        # False behaves like Ollama before /api/embed existed
+        self.batch_endpoint = batch_endpoint
+        self.requests: Dict[str, int] = {}
+        # Inputs per /api/embed call, in arrival order
+        self.embed_batches: List[int] = []
+        # Last request body per endpoint
+        self.payloads: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        logger.info(f"Stub Ollama server listening on {self.base_url}")
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def embed(self, text: str, normalize: bool = True) -> List[float]:
+        """Hashed bag-of-words vector, L2-normalized like /api/embed unless normalize is off"""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            bucket = zlib.crc32(word.encode("utf-8"))
+            vector[bucket % self.dimension] += 1.0 if bucket & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0], norm = 1.0, 1.0
+        return (vector / norm if normalize else vector).tolist()
+
+    def _count(self, path: str):
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, body: Dict):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            @property
+            def endpoint(self) -> str:
+                # LangChain's Ollama client posts to "/api/generate/"
+                return self.path.rstrip("/")
+
+            def do_GET(self):
+                stub._count(self.endpoint)
+                if self.endpoint != "/api/tags":
+                    self.send_error(404)
+                    return
+                self._send_json({"models": []})
+
+            def do_POST(self):
+                stub._count(self.endpoint)
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.payloads[self.endpoint] = payload
+                if self.endpoint == "/api/embed" and stub.batch_endpoint:
+                    texts = payload["input"]
+                    texts = [texts] if isinstance(texts, str) else texts
+                    with stub._lock:
+                        stub.embed_batches.append(len(texts))
+                    time.sleep(stub.embed_latency + stub.embed_latency_per_input * len(texts))
+                    self._send_json({"model": payload["model"], "embeddings": [stub.embed(t) for t in texts]})
+                elif self.endpoint == "/api/embeddings":
+                    time.sleep(stub.embed_latency + stub.embed_latency_per_input)
+                    # The single-prompt endpoint returns raw, unnormalized vectors
+                    self._send_json({"embedding": stub.embed(payload["prompt"], normalize=False)})
+                elif self.endpoint == "/api/generate":
+                    self._generate(payload)
+                else:
+                    self.send_error(404)
+
+            def _generate(self, payload: Dict):
+                context = payload.get("context") or []
+                prompt_tokens = len(_WORD.findall(payload.get("prompt", "")))
+                if not context:
+                    prompt_tokens += len(_WORD.findall(payload.get("system") or ""))
+                time.sleep(prompt_tokens * stub.prefill_latency_per_token)
+
+                words = [f"token{i}" for i in range(stub.answer_tokens)]
+                final = {
+                    "model": payload["model"],
+                    "response": "",
+                    "done": True,
+                    "context": context + list(range(prompt_tokens + len(words))),
+                    "prompt_eval_count": prompt_tokens,
+                    "eval_count": len(words)
+                }
+                if not payload.get("stream", True):
+                    time.sleep(stub.token_latency * len(words))
+                    self._send_json({**final, "response": " ".join(words)})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for word in words:
+                    time.sleep(stub.token_latency)
+                    chunk = {"model": payload["model"], "response": word + " ", "done": False}
+                    self.wfile.write((json.dumps(chunk) + "\n").encode())
+                    self.wfile.flush()
+                self.wfile.write((json.dumps(final) + "\n").encode())
+
+        return Handler
+
+
+@contextmanager
+def stub_environment(workdir: Path, **options) -> Iterator[StubOllamaServer]:
+    """A running stub with the data paths, caches and Ollama URL pointed into workdir
+
+    The settings are put back on exit, so tests can run one after another in
+    a single process. options are passed to StubOllamaServer.
+    """
+    workdir = Path(workdir)
+    settings = [DATA_PATHS, OLLAMA_CONFIG, EMBEDDING_CACHE_CONFIG, ANSWER_CACHE_CONFIG, STORE_CONFIG]
+    saved = [dict(config) for config in settings]
+    options = {"dimension": 16, "embed_latency": 0.0, "embed_latency_per_input": 0.0,
+               "prefill_latency_per_token": 0.0, "token_latency": 0.0, **options}
+    try:
+        with StubOllamaServer(**options) as stub:
+            DATA_PATHS["raw_documents"] = workdir / "raw"
+            DATA_PATHS["processed_documents"] = workdir / "processed"
+            DATA_PATHS["vector_store"] = workdir / "vector_store"
+            for path in DATA_PATHS.values():
+                path.mkdir(parents=True, exist_ok=True)
+            EMBEDDING_CACHE_CONFIG["path"] = workdir / "embedding_cache.sqlite"
+            ANSWER_CACHE_CONFIG["path"] = workdir / "answer_cache.sqlite"
+            OLLAMA_CONFIG["base_url"] = stub.base_url
+            # No store-watcher threads outliving the test
+            STORE_CONFIG["poll_interval"] = 0
+            yield stub
+    finally:
+        for config, values in zip(settings, saved):
+            config.clear()
+            config.update(values)
@@ -0,0 +1,67 @@
+import sys
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from langchain.schema import Document
+from stub_ollama import stub_environment
+from dual_agent import DualAgent
+from batch_runner import BatchRunner
+from test_dual_agent import publish_knowledge_base
+
+def test_batch_runner():
+    print("🧪 Testing the JSONL batch runner against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir, token_latency=0.001) as stub:
+        input_path = Path(workdir) / "questions.jsonl"
+        output_path = Path(workdir) / "answers.jsonl"
+        lines = [json.dumps({"id": i, "question": f"Plan meeting {i}", "agent": "assistant"}) for i in range(6)]
+        lines += [json.dumps({"id": "code", "question": "Fix this python bug", "agent": "coder"}), "not json"]
+        input_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+        agent_handler = DualAgent()
+        agent_handler.initialize()
+        assert BatchRunner(agent_handler).run_file(input_path, output_path)
+
+        results = [json.loads(line) for line in output_path.read_text(encoding="utf-8").splitlines()]
+        assert [result.get("id") for result in results] == [0, 1, 2, 3, 4, 5, "code", None]
+        assert all(result["success"] for result in results[:7])
+        assert not results[7]["success"] and results[7]["answer"].startswith("Line 8")
+        assert stub.requests["/api/generate"] == 7
+        # Every slot was given back and nothing was left queued
+        assert all(stats["active"] == 0 and stats["queued"] == 0
+                   for stats in agent_handler.scheduler.stats().values())
+        print(f"Answered {sum(result['success'] for result in results)} of {len(results)} lines")
+
+def test_batch_reuses_query_vectors():
+    print("🧪 Testing that batch routing and answers reuse the batched query embeddings...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        publish_knowledge_base([
+            Document(page_content="Python functions are defined with def and return values.",
+                     metadata={"source": "python.txt"}),
+            Document(page_content="Quarterly planning meetings happen every Monday morning.",
+                     metadata={"source": "planning.txt"})
+        ])
+        agent_handler = DualAgent()
+        assert agent_handler.initialize()
+        embedded = []
+        embeddings = agent_handler.knowledge_base.embeddings
+        embed_query = embeddings.embed_query
+        embeddings.embed_query = lambda text: embedded.append(text) or embed_query(text)
+
+        items = [{"question": "How do I define a python function?"}, {"question": "When are the planning meetings?"}]
+        results = asyncio.run(BatchRunner(agent_handler).run(items))
+        assert all(result["success"] for result in results)
+        # One embed_queries call covered retrieval, routing and the answer cache
+        assert embedded == []
+        print(f"Answered {len(results)} routed questions without a per-question embedding")
+
+if __name__ == "__main__":
+    test_batch_runner()
+    test_batch_reuses_query_vectors()
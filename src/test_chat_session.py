@@ -0,0 +1,62 @@
+import sys
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from config.settings import CHAT_CONFIG
+from stub_ollama import stub_environment
+from chat_session import ChatSession
+from dual_agent import DualAgent
+
+def chat_turn(agent_handler: DualAgent, session: ChatSession, question: str) -> dict:
+    events = list(agent_handler.stream_question(question, agent="assistant", session=session))
+    done = events[-1]
+    assert done["type"] == "done", done.get("answer")
+    assert [event["type"] for event in events[:2]] == ["sources", "token"]
+    return done
+
+def test_chat_session():
+    print("🧪 Testing multi-turn chat against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir) as stub:
+        agent_handler = DualAgent()
+        agent_handler.initialize()
+        session = ChatSession(history_token_budget=1000)
+
+        first = chat_turn(agent_handler, session, "Plan my week of meetings")
+        assert first["answer"].startswith("token0")
+        assert not first["stats"]["reused_context"]
+
+        second = chat_turn(agent_handler, session, "And the week after?")
+        payload = stub.payloads["/api/generate"]
+        assert second["stats"]["reused_context"]
+        assert payload["context"]
+        assert payload["model"] == agent_handler.llm("assistant").model
+        assert payload["system"] == agent_handler.agents["assistant"]["llm"]["system"]
+        assert payload["options"] == {"temperature": 0.3, "num_predict": 256}
+        assert payload["keep_alive"] == CHAT_CONFIG["keep_alive"]
+        print(f"Second turn reused {second['stats']['context_tokens']} context tokens")
+
+def test_chat_history_trim():
+    print("🧪 Testing that a long conversation falls back to trimmed history...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir, answer_tokens=2) as stub:
+        agent_handler = DualAgent()
+        agent_handler.initialize()
+        # The first turn's prompt alone is over this budget; half of it still holds that turn as text
+        session = ChatSession(history_token_budget=30)
+
+        chat_turn(agent_handler, session, "Plan my week")
+        trimmed = chat_turn(agent_handler, session, "And tomorrow?")
+        payload = stub.payloads["/api/generate"]
+        assert not trimmed["stats"]["reused_context"]
+        assert "context" not in payload
+        assert payload["prompt"].startswith("PREVIOUS CONVERSATION:")
+        print("History re-sent as text once the context outgrew its budget")
+
+if __name__ == "__main__":
+    test_chat_session()
+    test_chat_history_trim()
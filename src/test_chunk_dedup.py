@@ -0,0 +1,70 @@
+import sys
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from config.settings import DATA_PATHS, BUILD_CONFIG
+from stub_ollama import stub_environment
+from store_versions import VersionedStore
+from manifest import BuildManifest
+from knowledge_base import KnowledgeBase
+from main import build_knowledge_base
+
+def write(name: str, text: str) -> Path:
+    path = DATA_PATHS["raw_documents"] / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def published() -> tuple:
+    manifest = BuildManifest(VersionedStore().current_path() / BUILD_CONFIG["manifest_file"])
+    assert manifest.load()
+    knowledge_base = KnowledgeBase()
+    assert knowledge_base.load_knowledge_base()
+    return manifest, knowledge_base
+
+def filtered(knowledge_base: KnowledgeBase, name: str) -> list:
+    return knowledge_base.search_similar_documents("turbine", k=4, filters={"source": name})
+
+def test_exact_and_near_duplicates():
+    print("🧪 Testing exact and near-duplicate chunks against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        words = [f"turbine{i}" for i in range(90)]
+        write("original.txt", " ".join(words))
+        write("copy.txt", " ".join(words))
+        # A revision that only changes the last word
+        write("revision.txt", " ".join(words[:-1] + ["revised"]))
+        write("other.txt", "Beta ledgers reconcile invoices against purchase orders before payment runs.")
+        assert build_knowledge_base()
+
+        manifest, knowledge_base = published()
+        assert knowledge_base.vector_count == 2
+        shared = manifest.chunk_ids("original.txt")
+        assert manifest.chunk_ids("copy.txt") == shared and manifest.chunk_ids("revision.txt") == shared
+
+        # Every file behind the surviving chunk is filterable, not only its primary source
+        for name in ("original.txt", "copy.txt", "revision.txt"):
+            documents = filtered(knowledge_base, name)
+            assert len(documents) == 1
+            assert sorted(Path(source).name for source in documents[0].metadata["sources"]) == \
+                ["copy.txt", "original.txt", "revision.txt"]
+        assert [Path(doc.metadata["source"]).name for doc in filtered(knowledge_base, "other.txt")] == ["other.txt"]
+
+        # Removing the primary source promotes the next one and drops it from the filter index
+        primary = Path(filtered(knowledge_base, "copy.txt")[0].metadata["source"]).name
+        (DATA_PATHS["raw_documents"] / primary).unlink()
+        assert build_knowledge_base()
+        manifest, knowledge_base = published()
+        assert knowledge_base.vector_count == 2
+        assert filtered(knowledge_base, primary) == []
+        remaining = [name for name in ("original.txt", "copy.txt", "revision.txt") if name != primary]
+        for name in remaining:
+            documents = filtered(knowledge_base, name)
+            assert len(documents) == 1 and Path(documents[0].metadata["source"]).name in remaining
+        print(f"Kept {knowledge_base.vector_count} chunks for 4 files; {primary} removed")
+
+if __name__ == "__main__":
+    test_exact_and_near_duplicates()
@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from langchain.schema import Document
+from config.settings import PROFILING_CONFIG
+from context_builder import ContextBuilder
+import profiling
+
+def chunk(text: str, source: str) -> Document:
+    return Document(page_content=text, metadata={"source": source})
+
+def test_context_packing():
+    print("🧪 Testing context packing and the tokens_saved baseline...")
+
+    builder = ContextBuilder()
+    intro = "The turbine hall is cooled with river water pumped in through the north intake every night."
+    documents = [
+        chunk(intro, "plant.txt"),
+        # Overlaps the end of the first chunk, as chunk_overlap leaves it
+        chunk("through the north intake every night. Pumps are inspected weekly by the day shift.", "plant.txt"),
+        # The same passage copied into another file
+        chunk(intro, "copy.txt"),
+        chunk("Invoices are reconciled against purchase orders before each payment run.", "ledger.txt"),
+        chunk("Comets are tracked across the southern sky by the observatory telescopes.", "sky.txt"),
+        chunk("Badges must be worn at all times inside the control room and the turbine hall.", "rules.txt"),
+    ]
+
+    PROFILING_CONFIG["enabled"] = True
+    try:
+        with profiling.trace("ask") as trace:
+            packed = builder.build(documents, budget=1000)
+    finally:
+        PROFILING_CONFIG["enabled"] = False
+
+    sources = [doc.metadata["source"] for doc in packed]
+    assert sources == ["plant.txt", "ledger.txt", "sky.txt", "rules.txt"]
+    assert packed[0].page_content.count("north intake") == 1 and "Pumps are inspected" in packed[0].page_content
+
+    used = sum(builder.count_tokens(doc.page_content) for doc in packed)
+    baseline = builder.count_tokens("\n\n".join(doc.page_content for doc in documents[:4]))
+    # Measured against the top 4 chunks that would have been sent unpacked, not all 6 candidates
+    assert trace.stages[("pack_context",)]["tokens_saved"] == baseline - used
+
+    # The best passage alone over budget is truncated rather than dropped
+    tight = builder.build(documents, budget=10)
+    assert len(tight) == 1 and builder.count_tokens(tight[0].page_content) <= 10
+    print(f"Packed {len(documents)} chunks into {len(packed)} passages ({used} vs {baseline} tokens)")
+
+if __name__ == "__main__":
+    test_context_packing()
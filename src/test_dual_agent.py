@@ -0,0 +1,112 @@
+import sys
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from langchain.schema import Document
+from config.settings import SHARD_CONFIG
+from stub_ollama import stub_environment
+from store_versions import VersionedStore
+from knowledge_base import KnowledgeBase
+from dual_agent import DualAgent
+
+def publish_knowledge_base(documents):
+    """Build and publish a store version the way --build does"""
+    store = VersionedStore()
+    build_path = store.begin(fresh=True)
+    knowledge_base = KnowledgeBase(store_path=build_path)
+    assert knowledge_base.create_knowledge_base(documents)
+    assert knowledge_base.save_knowledge_base()
+    store.publish(build_path)
+
+def test_ask_without_knowledge_base():
+    print("🧪 Testing a direct model answer against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir) as stub:
+        agent_handler = DualAgent()
+        agent_handler.initialize()
+        result = agent_handler.ask_question("Plan my week of meetings", agent="assistant")
+
+        assert result["success"], result["answer"]
+        assert result["answer"].startswith("token0")
+        assert result["sources"] == []
+        # Only the agent that answered gets an Ollama client
+        assert list(agent_handler.llms) == ["assistant"]
+        assert stub.requests["/api/generate"] == 1
+        print(f"Answered directly: {result['answer'][:40]}...")
+
+def test_ask_with_knowledge_base():
+    print("🧪 Testing a retrieval answer against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        publish_knowledge_base([
+            Document(page_content="Python functions are defined with def and return values.",
+                     metadata={"source": "python.txt"}),
+            Document(page_content="Quarterly planning meetings happen every Monday morning.",
+                     metadata={"source": "planning.txt"})
+        ])
+
+        agent_handler = DualAgent()
+        assert agent_handler.initialize()
+        assert agent_handler.retriever is not None
+        result = agent_handler.ask_question("How do I define a python function?", agent="coder")
+
+        assert result["success"], result["answer"]
+        assert result["answer"].startswith("token0")
+        assert "python.txt" in [source["source"] for source in result["sources"]]
+        assert list(agent_handler.llms) == ["coder"]
+        assert list(agent_handler.qa_chains) == ["coder"]
+
+        # A repeated question is served from the answer cache without generating again
+        cached = agent_handler.ask_question("How do I define a python function?", agent="coder")
+        assert cached["success"] and cached.get("cache_match")
+
+        # Answers retrieved with other settings are not served from the cache
+        mode = agent_handler.knowledge_base.retrieval_mode
+        agent_handler.knowledge_base.retrieval_mode = "lexical"
+        assert not agent_handler.ask_question("How do I define a python function?", agent="coder").get("cached")
+        agent_handler.knowledge_base.retrieval_mode = mode
+        SHARD_CONFIG["search"] = ["main"]
+        try:
+            assert not agent_handler.ask_question("How do I define a python function?", agent="coder").get("cached")
+        finally:
+            SHARD_CONFIG["search"] = None
+        assert agent_handler.ask_question("How do I define a python function?", agent="coder").get("cached")
+        print(f"Answered from {len(result['sources'])} sources: {result['answer'][:40]}...")
+
+def test_auto_question_embeds_once():
+    print("🧪 Testing that routing, the answer cache and retrieval share one query embedding...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        publish_knowledge_base([
+            Document(page_content="Python functions are defined with def and return values.",
+                     metadata={"source": "python.txt"}),
+            Document(page_content="Quarterly planning meetings happen every Monday morning.",
+                     metadata={"source": "planning.txt"})
+        ])
+
+        agent_handler = DualAgent()
+        assert agent_handler.initialize()
+        embeddings = agent_handler.knowledge_base.embeddings
+        embedded = []
+        embed_query = embeddings.embed_query
+        embeddings.embed_query = lambda text: embedded.append(text) or embed_query(text)
+
+        result = agent_handler.ask_question("How do I define a python function?")
+        assert result["success"], result["answer"]
+        assert result["routing"]["method"] == "embedding"
+        assert "python.txt" in [source["source"] for source in result["sources"]]
+        assert embedded == ["How do I define a python function?"]
+
+        events = list(agent_handler.stream_question("When are the planning meetings?", filters={"extension": ".txt"}))
+        assert events[-1]["success"]
+        assert embedded[1:] == ["When are the planning meetings?"]
+        print(f"Embedded {len(embedded)} questions once each")
+
+if __name__ == "__main__":
+    test_ask_without_knowledge_base()
+    test_ask_with_knowledge_base()
+    test_auto_question_embeds_once()
@@ -0,0 +1,86 @@
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from embedding_engine import OllamaEmbeddingEngine
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+from stub_ollama import StubOllamaServer
+
+def test_embedding_engine():
+    print("🧪 Testing batched embedding engine against a stub server...")
+
+    with StubOllamaServer(dimension=8, embed_latency=0.0, embed_latency_per_input=0.0) as stub:
+        engine = OllamaEmbeddingEngine(base_url=stub.base_url, batch_size=4, max_in_flight=2)
+        texts = [f"chunk {'x' * i}" for i in range(10)]
+        vectors = engine.embed_documents(texts)
+
+        assert len(vectors) == len(texts)
+        # Order must survive concurrent batches
+        expected = [stub.embed(engine.embed_instruction + text) for text in texts]
+        assert all(abs(a - b) < 1e-6 for vector, want in zip(vectors, expected) for a, b in zip(vector, want))
+        assert sorted(stub.embed_batches) == [2, 4, 4]
+        assert len(engine.embed_query("hello")) == 8
+
+        print(f"Embedded {len(vectors)} chunks in {len(stub.embed_batches)} requests "
+              f"({engine.last_throughput:.1f} chunks/sec)")
+        engine.close()
+
+def test_fallback_is_normalized():
+    print("🧪 Testing the /api/embeddings fallback against a stub of an older server...")
+
+    with StubOllamaServer(dimension=8, embed_latency=0.0, embed_latency_per_input=0.0,
+                          batch_endpoint=False) as stub:
+        engine = OllamaEmbeddingEngine(base_url=stub.base_url, batch_size=4, max_in_flight=1)
+        texts = ["alpha beta beta beta", "gamma"]
+        vectors = np.array(engine.embed_documents(texts))
+
+        assert stub.requests["/api/embed"] == 1 and stub.requests["/api/embeddings"] == 2
+        # Raw vectors come back scaled to unit length, the same as /api/embed returns them
+        assert np.linalg.norm(stub.embed(engine.embed_instruction + texts[0], normalize=False)) > 1
+        assert np.allclose(np.linalg.norm(vectors, axis=1), 1.0)
+        assert np.allclose(vectors[0], stub.embed(engine.embed_instruction + texts[0]), atol=1e-6)
+        print(f"Fallback vectors have norms {np.linalg.norm(vectors, axis=1).round(3).tolist()}")
+        engine.close()
+
+def test_embedding_cache_eviction():
+    print("🧪 Testing embedding cache hits, misses and LRU eviction against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, \
+            StubOllamaServer(dimension=8, embed_latency=0.0, embed_latency_per_input=0.0) as stub:
+        engine = OllamaEmbeddingEngine(base_url=stub.base_url, batch_size=8, max_in_flight=1)
+        cache = EmbeddingCache(path=Path(workdir) / "embedding_cache.sqlite", max_entries=10)
+        embeddings = CachedEmbeddings(engine, "stub-embed", cache=cache)
+        texts = [f"chunk {i} {'x' * i}" for i in range(11)]
+
+        first = embeddings.embed_documents(texts[:5])
+        embeddings.embed_documents(texts[5:10])
+        assert stub.requests["/api/embed"] == 2
+        # Served from the cache, which also marks them as recently used
+        assert embeddings.embed_documents(texts[:5]) == first
+        assert stub.requests["/api/embed"] == 2
+        assert cache.stats() == {"entries": 10, "hits": 5, "misses": 10, "hit_rate": 5 / 15}
+
+        # One over max_entries evicts the least recently used entries, plus a tenth of the cache
+        embeddings.embed_documents(texts[10:])
+        assert cache.stats()["entries"] == 9
+        embeddings.embed_documents(texts[:5] + texts[10:])
+        assert stub.requests["/api/embed"] == 3
+        embeddings.embed_documents(texts[5:10])
+        assert stub.requests["/api/embed"] == 4 and stub.embed_batches[-1] == 2
+
+        stats = cache.stats()
+        assert stats["hits"] == 5 + 6 + 3 and stats["misses"] == 10 + 1 + 2
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        cache.close()
+        engine.close()
+
+if __name__ == "__main__":
+    test_embedding_engine()
+    test_fallback_is_normalized()
+    test_embedding_cache_eviction()
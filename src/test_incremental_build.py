@@ -0,0 +1,171 @@
+import sys
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from config.settings import DATA_PATHS, BUILD_CONFIG, OLLAMA_CONFIG
+from langchain.schema import Document
+from stub_ollama import stub_environment
+from store_versions import VersionedStore
+from manifest import BuildManifest
+from knowledge_base import KnowledgeBase
+from main import build_knowledge_base
+
+def write(name: str, text: str) -> Path:
+    path = DATA_PATHS["raw_documents"] / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def published_manifest() -> BuildManifest:
+    manifest = BuildManifest(VersionedStore().current_path() / BUILD_CONFIG["manifest_file"])
+    assert manifest.load()
+    return manifest
+
+def sources(query: str) -> list:
+    knowledge_base = KnowledgeBase()
+    assert knowledge_base.load_knowledge_base()
+    return [doc.metadata["source"] for doc in knowledge_base.search_similar_documents(query, k=4)]
+
+def test_incremental_build():
+    print("🧪 Testing manifest-driven incremental builds against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        store = VersionedStore()
+        write("alpha.txt", "Alpha reactors cool the turbine hall with river water every night shift.")
+        write("beta.txt", "Beta ledgers reconcile invoices against purchase orders before payment runs.")
+        # UTF-16 with a BOM, which TextLoader cannot read
+        (DATA_PATHS["raw_documents"] / "broken.txt").write_bytes("broken".encode("utf-16"))
+
+        assert build_knowledge_base()
+        first = store.current_name()
+        manifest = published_manifest()
+        assert manifest.failed() == ["broken.txt"]
+        assert manifest.chunk_ids("alpha.txt") and manifest.chunk_ids("beta.txt")
+
+        # Nothing changed (the broken file included): no new version is published
+        assert build_knowledge_base()
+        assert store.current_name() == first and store.versions() == [first]
+
+        # A changed file is re-embedded and its old chunks dropped
+        old_alpha = manifest.chunk_ids("alpha.txt")
+        write("alpha.txt", "Alpha reactors now use cooling towers instead of river water.")
+        assert build_knowledge_base()
+        assert store.current_name() != first
+        manifest = published_manifest()
+        assert not set(old_alpha) & set(manifest.chunk_ids("alpha.txt"))
+        knowledge_base = KnowledgeBase()
+        knowledge_base.load_knowledge_base()
+        assert knowledge_base.vector_count == 2
+
+        # A removed file loses its chunks
+        (DATA_PATHS["raw_documents"] / "beta.txt").unlink()
+        assert build_knowledge_base()
+        manifest = published_manifest()
+        assert sorted(manifest.files) == ["alpha.txt", "broken.txt"]
+        assert all(source.endswith("alpha.txt") for source in sources("invoices purchase orders"))
+        print(f"Versions kept: {', '.join(store.versions())}")
+
+def test_rebuild_on_other_embeddings():
+    print("🧪 Testing that an index built with other embeddings is rebuilt...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        write("alpha.txt", "Alpha reactors cool the turbine hall with river water every night shift.")
+        assert build_knowledge_base()
+        manifest = published_manifest()
+        assert manifest.embeddings == {"model": OLLAMA_CONFIG["models"]["embeddings"], "normalized": True}
+
+        # What a build from before vectors were normalized left behind
+        old_ids = manifest.chunk_ids("alpha.txt")
+        manifest.embeddings = {}
+        manifest.save()
+        assert build_knowledge_base()
+        manifest = published_manifest()
+        assert manifest.embeddings["normalized"]
+        assert manifest.chunk_ids("alpha.txt") and not set(old_ids) & set(manifest.chunk_ids("alpha.txt"))
+
+def test_build_over_pre_manifest_store():
+    print("🧪 Testing a build over a store saved before manifests existed...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        # Saved straight into the vector store root, without a manifest or versions
+        legacy = KnowledgeBase(store_path=DATA_PATHS["vector_store"])
+        assert legacy.create_knowledge_base([
+            Document(page_content="Alpha reactors cool the turbine hall with river water.",
+                     metadata={"source": str(DATA_PATHS["raw_documents"] / "alpha.txt")}),
+            Document(page_content="Beta ledgers reconcile invoices against purchase orders.",
+                     metadata={"source": str(DATA_PATHS["raw_documents"] / "beta.txt")})
+        ])
+        assert legacy.save_knowledge_base()
+        legacy._close_shards()
+
+        write("alpha.txt", "Alpha reactors cool the turbine hall with river water every night shift.")
+        assert build_knowledge_base()
+        manifest = published_manifest()
+        knowledge_base = KnowledgeBase()
+        assert knowledge_base.load_knowledge_base()
+        # Only the chunk the manifest tracks, none of the untracked legacy vectors
+        assert knowledge_base.vector_count == len(manifest.chunk_ids("alpha.txt")) == 1
+        assert sources("invoices purchase orders") == [str(DATA_PATHS["raw_documents"] / "alpha.txt")]
+
+def test_resume_after_interrupt():
+    print("🧪 Testing that an interrupted build resumes from its last checkpoint...")
+
+    texts = {
+        "a.txt": "Alpha reactors cool the turbine hall with river water every night shift.",
+        "b.txt": "Beta ledgers reconcile invoices against purchase orders before payment runs.",
+        "c.txt": "Gamma telescopes track comets across the southern sky in winter.",
+        "d.txt": "Delta bakeries proof sourdough overnight in cold cellars."
+    }
+    saved = dict(BUILD_CONFIG)
+    add_documents = KnowledgeBase.add_documents
+    added = []
+    interrupt = ["c.txt"]
+
+    def interrupted(self, documents, ids=None):
+        names = [Path(doc.metadata["source"]).name for doc in documents]
+        if set(names) & set(interrupt):
+            interrupt.clear()
+            raise KeyboardInterrupt
+        added.extend(names)
+        return add_documents(self, documents, ids=ids)
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        # One chunk per batch and a checkpoint after every file
+        BUILD_CONFIG.update(batch_size=1, checkpoint_every=1)
+        KnowledgeBase.add_documents = interrupted
+        try:
+            for name, text in texts.items():
+                write(name, text)
+            try:
+                build_knowledge_base(parallel=False)
+                assert False, "build was not interrupted"
+            except KeyboardInterrupt:
+                pass
+            store = VersionedStore()
+            assert store.current_name() is None and store.staging_file.exists()
+            assert added == ["a.txt", "b.txt"]
+
+            added.clear()
+            assert build_knowledge_base(parallel=False)
+            # Files checkpointed before the interrupt are neither embedded nor indexed again
+            assert added == ["c.txt", "d.txt"]
+        finally:
+            KnowledgeBase.add_documents = add_documents
+            BUILD_CONFIG.clear()
+            BUILD_CONFIG.update(saved)
+
+        manifest = published_manifest()
+        knowledge_base = KnowledgeBase()
+        assert knowledge_base.load_knowledge_base()
+        chunk_ids = [chunk_id for name in texts for chunk_id in manifest.chunk_ids(name)]
+        assert len(chunk_ids) == len(set(chunk_ids)) == knowledge_base.vector_count == 4
+        print(f"Resumed {store.current_name()} with {knowledge_base.vector_count} chunks")
+
+if __name__ == "__main__":
+    test_incremental_build()
+    test_rebuild_on_other_embeddings()
+    test_build_over_pre_manifest_store()
+    test_resume_after_interrupt()
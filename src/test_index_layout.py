@@ -0,0 +1,109 @@
+import sys
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+
+import faiss
+import numpy as np
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from langchain.schema import Document
+from config.settings import INDEX_CONFIG
+from stub_ollama import stub_environment
+from knowledge_base import KnowledgeBase
+
+K = 5
+
+@contextmanager
+def index_config(**overrides):
+    saved = dict(INDEX_CONFIG)
+    INDEX_CONFIG.update(overrides)
+    try:
+        yield
+    finally:
+        INDEX_CONFIG.clear()
+        INDEX_CONFIG.update(saved)
+
+def documents() -> list:
+    return [Document(page_content=f"chunk alpha{i % 7} beta{i % 11} gamma{i % 13} delta{i}",
+                     metadata={"source": f"doc{i}.txt"}) for i in range(120)]
+
+def layout(index: faiss.Index) -> list:
+    """Wrapper and codec chain from the re-scoring stage down to the compact index"""
+    chain = []
+    while True:
+        index = faiss.downcast_index(index)
+        chain.append(type(index).__name__)
+        if isinstance(index, faiss.IndexRefine):
+            index = index.base_index
+        elif isinstance(index, faiss.IndexPreTransform):
+            chain.append(type(faiss.downcast_VectorTransform(index.chain.at(0))).__name__)
+            chain.append(index.chain.at(0).d_out)
+            index = index.index
+        else:
+            if isinstance(index, faiss.IndexScalarQuantizer):
+                chain.append(index.sq.qtype)
+            return chain
+
+def recall(knowledge_base: KnowledgeBase, exact: KnowledgeBase, queries: np.ndarray) -> float:
+    """Share of the top K hits no farther than the exact K-th neighbour (ties count as found)
+
+    Re-scoring returns exact float32 distances, so they compare directly.
+    """
+    found = knowledge_base.shards["main"].search(queries, K)
+    expected = exact.shards["main"].search(queries, K)
+    hits = sum(sum(distance <= row[-1][0] + 1e-5 for distance, _ in got) for got, row in zip(found, expected))
+    return hits / sum(len(row) for row in expected)
+
+def dropped_ids(knowledge_base: KnowledgeBase) -> list:
+    shard = knowledge_base.shards["main"]
+    return [doc_id for _, doc_id in shard.vector_store.index_to_docstore_id.items()
+            if int(shard.docstore.search(doc_id).metadata["source"][3:-4]) % 4 == 0]
+
+def test_compact_layouts_with_rescore():
+    print("🧪 Testing recall of every encoding and reduction with re-scoring...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir) as stub:
+        workdir = Path(workdir)
+        queries = np.array([stub.embed(f"alpha{i % 7} beta{i % 11} gamma{i % 13}") for i in range(0, 120, 6)],
+                         dtype=np.float32)
+        exact = KnowledgeBase(store_path=workdir / "flat")
+        assert exact.create_knowledge_base(documents())
+        exact_dropped = dropped_ids(exact)
+        assert exact.delete_documents(exact_dropped)
+        exact_before = KnowledgeBase(store_path=workdir / "flat_full")
+        assert exact_before.create_knowledge_base(documents())
+
+        for encoding in ("float16", "int8"):
+            for reduce in ("pca", "truncate"):
+                name = f"{encoding}_{reduce}"
+                # The stub's hashed vectors aren't Matryoshka-ordered, so truncation needs a longer shortlist
+                with index_config(encoding=encoding, reduce=reduce, reduced_dim=8, rescore=True, rescore_factor=8):
+                    knowledge_base = KnowledgeBase(store_path=workdir / name)
+                    assert knowledge_base.create_knowledge_base(documents())
+                    index = knowledge_base.shards["main"].vector_store.index
+                    built = layout(index)
+                    qtype = getattr(faiss.ScalarQuantizer, "QT_fp16" if encoding == "float16" else "QT_8bit")
+                    transform = "PCAMatrix" if reduce == "pca" else "RemapDimensionsTransform"
+                    assert built == ["IndexRefineFlat", "IndexPreTransform", transform, 8,
+                                     "IndexScalarQuantizer", qtype], built
+                    before = recall(knowledge_base, exact_before, queries)
+
+                    # The re-scoring stage can't remove vectors, so deleting rebuilds the index
+                    assert knowledge_base.delete_documents(dropped_ids(knowledge_base))
+                    index = knowledge_base.shards["main"].vector_store.index
+                    assert index.ntotal == 90
+                    assert layout(index) == built
+                    after = recall(knowledge_base, exact, queries)
+                    print(f"{name}: recall@{K} {before:.2f} built, {after:.2f} after a delete")
+                    assert before >= 0.9 and after >= 0.9
+                    knowledge_base._close_shards()
+
+        exact._close_shards()
+        exact_before._close_shards()
+
+if __name__ == "__main__":
+    test_compact_layouts_with_rescore()
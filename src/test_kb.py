@@ -19,7 +19,7 @@ def test_knowledge_base():
     # Intentar cargar la base existente
     if kb.load_knowledge_base():
         print("Knowledge base loaded successfully!")
-        print(f"Vector store: {kb.vector_store}")
+        print(f"Shards: {', '.join(kb.shards)} ({kb.vector_count} vectors)")
         
         # Probar búsqueda
         results = kb.search_similar_documents("test", k=1)
@@ -0,0 +1,102 @@
+import sys
+import time
+import tempfile
+import threading
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from stub_ollama import stub_environment
+from model_scheduler import ModelScheduler, SchedulerFullError, DeadlineExceededError, parse_keep_alive
+
+def make_scheduler(max_queue: int = 8, keep_alive: str = "5m") -> ModelScheduler:
+    return ModelScheduler({
+        "concurrency": {"coder": 1},
+        "max_queue": {"coder": max_queue},
+        "priorities": {"interactive": 0, "batch": 10},
+        "keep_alive": keep_alive
+    })
+
+def test_priority_order():
+    print("🧪 Testing that interactive requests overtake queued batch work...")
+    scheduler = make_scheduler()
+    started = []
+
+    def request(name: str, priority: str):
+        with scheduler.slot("mistral", priority):
+            started.append(name)
+
+    threads = []
+    with scheduler.slot("mistral", "interactive"):
+        # Queue in arrival order batch-1, batch-2, interactive while the only slot is busy
+        for name, priority in [("batch-1", "batch"), ("batch-2", "batch"), ("interactive", "interactive")]:
+            thread = threading.Thread(target=request, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            while scheduler.stats()["mistral"]["queued"] < len(threads):
+                time.sleep(0.005)
+    for thread in threads:
+        thread.join()
+
+    assert started == ["interactive", "batch-1", "batch-2"]
+    assert scheduler.stats()["mistral"] == {"active": 0, "queued": 0, "concurrency": 1}
+    print(f"Start order: {', '.join(started)}")
+
+def test_deadline_and_backpressure():
+    print("🧪 Testing queue deadlines and full-queue rejection...")
+    scheduler = make_scheduler(max_queue=1)
+
+    with scheduler.slot("mistral"):
+        start = time.monotonic()
+        try:
+            with scheduler.slot("mistral", timeout=0.05):
+                raise AssertionError("Got a slot while the model was busy")
+        except DeadlineExceededError:
+            pass
+        assert time.monotonic() - start >= 0.05
+
+        def wait_for_slot():
+            with scheduler.slot("mistral", timeout=2):
+                pass
+
+        # One waiter fills the queue, so the next request is turned away at once
+        waiter = threading.Thread(target=wait_for_slot)
+        waiter.start()
+        while scheduler.stats()["mistral"]["queued"] < 1:
+            time.sleep(0.005)
+        try:
+            with scheduler.slot("mistral"):
+                raise AssertionError("Queued past max_queue")
+        except SchedulerFullError:
+            pass
+    waiter.join()
+    assert scheduler.stats()["mistral"]["active"] == 0
+    print("Deadline and backpressure behave as configured")
+
+def test_keep_alive_refresh():
+    print("🧪 Testing that pre-warmed models are kept resident against a stub server...")
+    assert parse_keep_alive("30m") == 1800 and parse_keep_alive("1h30m") == 5400
+    assert parse_keep_alive(300) == 300 and parse_keep_alive("-1") is None and parse_keep_alive("soon") is None
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir) as stub:
+        scheduler = make_scheduler(keep_alive="0.2s")
+        thread = scheduler.prewarm()
+        # The pre-warm call, then one refresh every 0.1s
+        deadline = time.monotonic() + 2
+        while stub.requests.get("/api/generate", 0) < 3 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        scheduler.stop_keep_alive()
+        thread.join(timeout=2)
+
+        assert not thread.is_alive()
+        assert stub.requests["/api/generate"] >= 3
+        assert stub.payloads["/api/generate"]["keep_alive"] == "0.2s"
+        assert "prompt" not in stub.payloads["/api/generate"]
+        print(f"Sent keep_alive {stub.requests['/api/generate']} times")
+
+if __name__ == "__main__":
+    test_priority_order()
+    test_deadline_and_backpressure()
+    test_keep_alive_refresh()
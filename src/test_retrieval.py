@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from config.settings import DATA_PATHS, LEXICAL_CONFIG
+from stub_ollama import stub_environment
+from store_versions import VersionedStore
+from knowledge_base import KnowledgeBase
+from search_filters import normalize_filters, parse_filter_args
+from main import build_knowledge_base
+
+def write(name: str, text: str) -> Path:
+    path = DATA_PATHS["raw_documents"] / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def names(documents: list) -> list:
+    return [Path(doc.metadata["source"]).name for doc in documents]
+
+def test_lexical_index_is_lazy():
+    print("🧪 Testing that the BM25 index is only read by lexical queries...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        write("alpha.txt", "Alpha reactors cool the turbine hall with river water every night shift.")
+        write("beta.txt", "Beta ledgers reconcile invoices against purchase orders before payment runs.")
+        assert build_knowledge_base()
+
+        knowledge_base = KnowledgeBase()
+        assert knowledge_base.load_knowledge_base(lazy=False)
+        assert len(knowledge_base.search_similar_documents("river water", k=2, mode="vector")) == 2
+        assert knowledge_base._lexical_index is None
+
+        assert names(knowledge_base.search_similar_documents("invoices", k=1, mode="lexical")) == ["beta.txt"]
+        assert knowledge_base._lexical_index is not None
+
+        # A swap drops it again; stores without bm25.npz rebuild it from the docstore on demand
+        write("gamma.txt", "Gamma telescopes track comets across the southern sky.")
+        assert build_knowledge_base()
+        (VersionedStore().current_path() / LEXICAL_CONFIG["index_file"]).unlink()
+        assert knowledge_base.refresh()
+        assert knowledge_base._lexical_index is None
+        assert names(knowledge_base.search_similar_documents("comets", k=1, mode="hybrid"))
+        assert names(knowledge_base.search_similar_documents("comets", k=1, mode="lexical")) == ["gamma.txt"]
+        print(f"BM25 index read for {len(knowledge_base.lexical_index)} chunks")
+
+def test_metadata_filters():
+    print("🧪 Testing metadata filters against a stub server...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        old = write("notes/old.txt", "Turbine maintenance notes from the spring inspection.")
+        os.utime(old, (1704067200, 1704067200))  # 2024-01-01
+        write("notes/new.md", "Turbine maintenance notes from the autumn inspection.")
+        write("ledger.txt", "Turbine invoices reconciled against purchase orders.")
+        assert build_knowledge_base()
+
+        knowledge_base = KnowledgeBase()
+        assert knowledge_base.load_knowledge_base()
+        for mode in ("vector", "lexical", "hybrid"):
+            def search(**filters):
+                return sorted(names(knowledge_base.search_similar_documents("turbine", k=4, mode=mode, filters=filters)))
+
+            assert search() == ["ledger.txt", "new.md", "old.txt"]
+            # A bare file name matches wherever the file lives
+            assert search(source="old.txt") == ["old.txt"]
+            assert search(ext="md") == ["new.md"]
+            assert search(extension=[".txt"], modified_after="2024-06-01") == ["ledger.txt"]
+            assert search(before="2024-06-01") == ["old.txt"]
+            assert search(source="missing.txt") == []
+
+        assert parse_filter_args(["ext=.PDF,md", "after=2024-01-01"]) == {
+            "extension": [".pdf", ".md"], "modified_after": normalize_filters({"after": "2024-01-01"})["modified_after"]
+        }
+        try:
+            normalize_filters({"author": "me"})
+            assert False, "unknown filter accepted"
+        except ValueError:
+            pass
+        print("Filters restrict vector, lexical and hybrid searches alike")
+
+if __name__ == "__main__":
+    test_lexical_index_is_lazy()
+    test_metadata_filters()
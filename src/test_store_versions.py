@@ -0,0 +1,98 @@
+import sys
+import sqlite3
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from config.settings import DATA_PATHS, DOCSTORE_CONFIG
+from stub_ollama import stub_environment
+from store_versions import VersionedStore
+from knowledge_base import KnowledgeBase
+from main import build_knowledge_base
+
+def write(name: str, text: str) -> Path:
+    path = DATA_PATHS["raw_documents"] / name
+    path.write_text(text, encoding="utf-8")
+    return path
+
+def listing(path: Path) -> dict:
+    return {str(entry.relative_to(path)): entry.stat().st_mtime_ns for entry in path.rglob("*")}
+
+def test_published_store_is_read_only():
+    print("🧪 Testing that readers never write into a published store version...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        store = VersionedStore()
+        write("alpha.txt", "Alpha reactors cool the turbine hall with river water every night shift.")
+        write("beta.txt", "Beta ledgers reconcile invoices against purchase orders before payment runs.")
+        assert build_knowledge_base()
+        published = store.current_path()
+        before = listing(published)
+
+        knowledge_base = KnowledgeBase()
+        assert knowledge_base.load_knowledge_base(lazy=False)
+        assert knowledge_base.shards["main"].docstore.read_only
+        assert knowledge_base.search_similar_documents("river water", k=2)
+        assert knowledge_base.search_similar_documents("invoices", k=2, filters={"extension": ".txt"})
+        assert listing(published) == before
+
+        # What an older release left behind: a WAL journal and chunks without filter attributes
+        docstore_file = published / DOCSTORE_CONFIG["file"]
+        conn = sqlite3.connect(str(docstore_file))
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("DELETE FROM attributes")
+        conn.commit()
+        conn.close()
+
+        # The build migrates its own copy and publishes it even though no file changed
+        assert build_knowledge_base()
+        assert store.current_path() != published
+        conn = sqlite3.connect(str(store.current_path() / DOCSTORE_CONFIG["file"]))
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+        assert conn.execute("SELECT COUNT(*) FROM attributes").fetchone()[0] == 2
+        conn.close()
+        print(f"Migrated {published.name} into {store.current_name()}")
+
+def test_publish_resume_cleanup():
+    print("🧪 Testing store version publish, resume and cleanup...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        store = VersionedStore()
+        first = store.begin(fresh=True)
+        (first / "data.txt").write_text("v1", encoding="utf-8")
+        # Nothing is visible before publishing
+        assert store.current_name() is None and store.staging_file.exists()
+        store.publish(first)
+        assert store.current_name() == first.name and not store.staging_file.exists()
+
+        # An incremental build starts from a copy of CURRENT; an interrupted one is resumed
+        second = store.begin()
+        assert (second / "data.txt").read_text(encoding="utf-8") == "v1" and not store.resumed
+        (second / "data.txt").write_text("v2", encoding="utf-8")
+        resumed = VersionedStore()
+        assert resumed.begin() == second and resumed.resumed
+        assert resumed.current_path() == first
+        resumed.publish(second)
+        assert (store.current_path() / "data.txt").read_text(encoding="utf-8") == "v2"
+
+        # A build that changed nothing is dropped without touching CURRENT
+        unchanged = store.begin()
+        store.abandon(unchanged)
+        assert not unchanged.exists() and store.current_name() == second.name
+
+        # Only keep_versions published versions survive; leftovers of crashed builds are removed
+        third = store.begin()
+        store.publish(third)
+        assert store.versions() == [second.name, third.name]
+        crashed = store.begin()
+        store.staging_file.unlink()
+        assert store.cleanup() == [crashed.name]
+        assert store.versions() == [second.name, third.name]
+        print(f"Versions kept: {', '.join(store.versions())}")
+
+if __name__ == "__main__":
+    test_published_store_is_read_only()
+    test_publish_resume_cleanup()
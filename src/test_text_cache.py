@@ -0,0 +1,78 @@
+import sys
+import sqlite3
+import tempfile
+from pathlib import Path
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+import docx
+from config.settings import DATA_PATHS, TEXT_CACHE_CONFIG
+from stub_ollama import stub_environment
+from document_processor import DocumentProcessor, LOADER_VERSIONS
+
+def write_docx(path: Path):
+    document = docx.Document()
+    document.add_paragraph("Beta ledgers reconcile invoices against purchase orders.")
+    table = document.add_table(rows=1, cols=2)
+    table.rows[0].cells[0].text = "Invoice"
+    table.rows[0].cells[1].text = "Paid"
+    document.save(str(path))
+
+def process(files: list) -> tuple:
+    """Chunks of every file from a fresh processor, and its cache stats"""
+    processor = DocumentProcessor(parallel=False)
+    chunks = [[doc.page_content for doc in processor.process_file(path)] for path in files]
+    return chunks, processor.text_cache.stats()
+
+def entries() -> list:
+    return sorted(entry.name.split(".", 1)[1] for entry in DATA_PATHS["processed_documents"].glob("*/*.json.gz"))
+
+def cached_paths() -> list:
+    conn = sqlite3.connect(str(DATA_PATHS["processed_documents"] / TEXT_CACHE_CONFIG["index_file"]))
+    paths = sorted(Path(path).name for (path,) in conn.execute("SELECT path FROM files"))
+    conn.close()
+    return paths
+
+def test_extracted_text_cache():
+    print("🧪 Testing the extracted-text cache for Markdown and Word files...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        notes = DATA_PATHS["raw_documents"] / "notes.md"
+        notes.write_text("# Turbines\n\nAlpha reactors cool the turbine hall with river water.", encoding="utf-8")
+        ledger = DATA_PATHS["raw_documents"] / "ledger.docx"
+        write_docx(ledger)
+        files = [notes, ledger]
+
+        first, stats = process(files)
+        assert stats["hits"] == 0 and stats["misses"] == 2
+        assert "river water" in first[0][-1] and "Invoice | Paid" in first[1][-1]
+        assert entries() == ["docx1.json.gz", "md1.json.gz"]
+
+        second, stats = process(files)
+        assert second == first
+        assert stats["hits"] == 2 and stats["misses"] == 0 and stats["hit_rate"] == 1.0
+
+        # A new Markdown loader version re-extracts only the Markdown file
+        saved = LOADER_VERSIONS[".md"]
+        LOADER_VERSIONS[".md"] = "md2"
+        try:
+            third, stats = process(files)
+            assert third == first
+            assert stats["hits"] == 1 and stats["misses"] == 1
+            processor = DocumentProcessor(parallel=False)
+            assert processor.cleanup_text_cache() == 1
+            assert entries() == ["docx1.json.gz", "md2.json.gz"]
+
+            # Deleting a source drops its entry and its path from the index
+            ledger.unlink()
+            assert processor.cleanup_text_cache() == 1
+            assert entries() == ["md2.json.gz"]
+            assert cached_paths() == ["notes.md"]
+        finally:
+            LOADER_VERSIONS[".md"] = saved
+        print(f"Cache left with {entries()}")
+
+if __name__ == "__main__":
+    test_extracted_text_cache()
@@ -0,0 +1,102 @@
+import sys
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+
+import numpy as np
+
+src_path = Path(__file__).parent
+project_root = src_path.parent
+sys.path.append(str(project_root))
+
+from langchain.schema import Document
+from config.settings import INDEX_CONFIG
+from stub_ollama import stub_environment
+from knowledge_base import KnowledgeBase
+import vector_shard
+
+@contextmanager
+def index_config(**overrides):
+    saved = dict(INDEX_CONFIG)
+    INDEX_CONFIG.update(overrides)
+    try:
+        yield
+    finally:
+        INDEX_CONFIG.clear()
+        INDEX_CONFIG.update(saved)
+
+@contextmanager
+def exhaustive_calls():
+    """Record every exhaustive retry of a filtered search"""
+    calls = []
+    exhaustive_search = vector_shard.exhaustive_search
+
+    def recording(index, matrix, k, selector, positions):
+        calls.append(len(positions))
+        return exhaustive_search(index, matrix, k, selector, positions)
+
+    vector_shard.exhaustive_search = recording
+    try:
+        yield calls
+    finally:
+        vector_shard.exhaustive_search = exhaustive_search
+
+def documents() -> list:
+    docs = [Document(page_content=f"chunk {i} alpha{i} beta{i * 7} gamma{i % 5}", metadata={"source": f"doc{i}.txt"})
+            for i in range(60)]
+    docs += [Document(page_content=f"dropped {i} delta{i} epsilon{i * 3}", metadata={"source": "drop.txt"})
+             for i in range(20)]
+    return docs
+
+def check_shard(index_type: str, workdir: Path):
+    store_path = workdir / index_type
+    knowledge_base = KnowledgeBase(store_path=store_path)
+    assert knowledge_base.create_knowledge_base(documents())
+    shard = knowledge_base.shards["main"]
+    dropped = [doc_id for _, doc_id in shard.vector_store.index_to_docstore_id.items()
+               if shard.docstore.search(doc_id).metadata["source"] == "drop.txt"]
+    assert len(dropped) == 20
+
+    # Neither index type can remove rows in place, so the survivors are re-added
+    assert not vector_shard.supports_removal(shard.vector_store.index)
+    assert knowledge_base.delete_documents(dropped)
+    index = shard.vector_store.index
+    assert index.ntotal == 60
+    assert list(shard.docstore.positions) == list(range(60))
+    assert not shard.docstore.existing_ids(dropped)
+
+    queries = np.random.default_rng(0).normal(size=(5, index.d)).astype(np.float32)
+    hits = shard.search(queries, 10)
+    assert all(row and not {doc_id for _, doc_id in row} & set(dropped) for row in hits)
+
+    # One allowed chunk at a time: with a single probed list (or a one-wide beam) most sit outside it
+    with exhaustive_calls() as calls:
+        for i in range(0, 60, 3):
+            found = shard.search(queries[:1], 1, filters={"source": [f"doc{i}.txt"]})
+            assert [shard.docstore.search(doc_id).metadata["source"] for _, doc_id in found[0]] == [f"doc{i}.txt"]
+    assert calls
+
+    assert knowledge_base.save_knowledge_base()
+    knowledge_base._close_shards()
+
+    # Memory-mapped load: IVF lists are mapped, HNSW is read into memory; results are the same either way
+    loaded = KnowledgeBase(store_path=store_path)
+    assert loaded.load_knowledge_base(mmap=True, lazy=False, path=store_path)
+    reloaded = loaded.shards["main"]
+    assert reloaded._is_ivf(reloaded.vector_store.index) == (index_type == "ivf_flat")
+    assert [[doc_id for _, doc_id in row] for row in reloaded.search(queries, 10)] == \
+        [[doc_id for _, doc_id in row] for row in hits]
+    loaded._close_shards()
+    return len(calls)
+
+def test_ivf_and_hnsw_shards():
+    print("🧪 Testing IVF and HNSW shards: delete, filtered retry and mmap load...")
+
+    with tempfile.TemporaryDirectory() as workdir, stub_environment(workdir):
+        with index_config(type="ivf_flat", train_size=80, nlist=4, nprobe=1):
+            print(f"ivf_flat: {check_shard('ivf_flat', Path(workdir))} of 20 filtered searches retried exhaustively")
+        with index_config(type="hnsw", hnsw_m=4, ef_construction=16, ef_search=1):
+            print(f"hnsw: {check_shard('hnsw', Path(workdir))} of 20 filtered searches retried exhaustively")
+
+if __name__ == "__main__":
+    test_ivf_and_hnsw_shards()
@@ -0,0 +1,164 @@
+import gzip
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+from pathlib import Path
+
+from langchain.schema import Document
+from config.settings import DATA_PATHS, TEXT_CACHE_CONFIG
+from manifest import BuildManifest
+import profiling
+
+logger = logging.getLogger(__name__)
+
+# Re-applied from the file on every read, so renamed or touched files still hit
+VOLATILE_METADATA = ("source", "mtime")
+
+class ExtractedTextCache:
+    """Parsed pages of each raw file, gzipped JSON under data/processed
+
+    Entries are keyed by content hash and loader version, so an unchanged
+    file is never parsed twice and bumping a loader version invalidates
+    exactly that loader's entries. A small SQLite index remembers each
+    path's hash by size and mtime so unchanged files aren't re-hashed.
+    """
+
+    def __init__(self, directory: Path = None, loader_versions: Dict[str, str] = None):
+        self.directory = Path(directory or DATA_PATHS["processed_documents"])
+        self.loader_versions = loader_versions or {}
+        self.compress_level = TEXT_CACHE_CONFIG["compress_level"]
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        # Opened on first use: pool workers build processors but never touch the cache
+        if self._conn is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(
+                str(self.directory / TEXT_CACHE_CONFIG["index_file"]), check_same_thread=False
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime REAL NOT NULL, hash TEXT NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _content_hash(self, file_path: Path) -> Tuple[str, float]:
+        stat = file_path.stat()
+        key = str(file_path.resolve())
+        with self._lock:
+            row = self._db().execute("SELECT size, mtime, hash FROM files WHERE path = ?", (key,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            return row[2], stat.st_mtime
+
+        content_hash = BuildManifest.hash_file(file_path)
+        with self._lock:
+            self._db().execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                (key, stat.st_size, stat.st_mtime, content_hash)
+            )
+            self._db().commit()
+        return content_hash, stat.st_mtime
+
+    def _entry_path(self, content_hash: str, loader_version: str) -> Path:
+        return self.directory / content_hash[:2] / f"{content_hash}.{loader_version}.json.gz"
+
+    def _loader_version(self, file_path: Path) -> Optional[str]:
+        return self.loader_versions.get(file_path.suffix.lower())
+
+    def get(self, file_path: Path) -> Optional[List[Document]]:
+        """Cached pages for the file's current content, or None on a miss"""
+        loader_version = self._loader_version(file_path)
+        if loader_version is None:
+            return None
+        try:
+            content_hash, mtime = self._content_hash(file_path)
+            entry = self._entry_path(content_hash, loader_version)
+            if not entry.exists():
+                self.misses += 1
+                profiling.count("text_cache_misses")
+                return None
+            with gzip.open(entry, "rt", encoding="utf-8") as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable text cache entry for {file_path.name}: {e}")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        profiling.count("text_cache_hits")
+        return [
+            Document(page_content=page["text"], metadata={**page["metadata"], "source": str(file_path), "mtime": mtime})
+            for page in payload["pages"]
+        ]
+
+    def put(self, file_path: Path, documents: List[Document]):
+        loader_version = self._loader_version(file_path)
+        if loader_version is None:
+            return
+        try:
+            content_hash, _ = self._content_hash(file_path)
+            entry = self._entry_path(content_hash, loader_version)
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            payload = {
+                "hash": content_hash,
+                "loader": loader_version,
+                "pages": [
+                    {
+                        "text": doc.page_content,
+                        "metadata": {k: v for k, v in doc.metadata.items() if k not in VOLATILE_METADATA}
+                    }
+                    for doc in documents
+                ]
+            }
+            tmp_path = entry.with_suffix(".tmp")
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=self.compress_level) as f:
+                json.dump(payload, f, ensure_ascii=False, separators=(",", ":"))
+            tmp_path.replace(entry)
+        except OSError as e:
+            logger.warning(f"Could not cache extracted text for {file_path.name}: {e}")
+
+    def cleanup(self, live_files: List[Path]) -> int:
+        """Delete entries no current file points at (removed, edited or stale loader); returns how many"""
+        try:
+            live_paths = {str(file_path.resolve()) for file_path in live_files}
+            with self._lock:
+                rows = self._db().execute("SELECT path, hash FROM files").fetchall()
+                gone = [(path,) for path, _ in rows if path not in live_paths]
+                self._db().executemany("DELETE FROM files WHERE path = ?", gone)
+                self._db().commit()
+
+            keep = set()
+            for path, content_hash in rows:
+                if path in live_paths:
+                    loader_version = self._loader_version(Path(path))
+                    if loader_version:
+                        keep.add(self._entry_path(content_hash, loader_version).name)
+
+            removed = 0
+            for entry in self.directory.glob("*/*.json.gz"):
+                if entry.name not in keep:
+                    entry.unlink()
+                    removed += 1
+            for directory in self.directory.iterdir():
+                if directory.is_dir() and not any(directory.iterdir()):
+                    directory.rmdir()
+            if removed:
+                logger.info(f"Removed {removed} orphaned extracted-text entries")
+            return removed
+        except OSError as e:
+            logger.error(f"Error cleaning the text cache: {e}")
+            return 0
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0
+        }
@@ -0,0 +1,324 @@
+import pickle
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pathlib import Path
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+from langchain_community.vectorstores import FAISS
+from config.settings import INDEX_CONFIG, DOCSTORE_CONFIG, SHARD_CONFIG
+from docstore import SQLiteDocstore
+import profiling
+from index_factory import (
+    create_index, train_index, apply_search_params, min_training_points, supports_removal,
+    id_selector, search_parameters, exhaustive_search, is_exact
+)
+
+logger = logging.getLogger(__name__)
+
+class VectorShard:
+    """One FAISS index and its docstore in their own directory
+
+    Shards are trained, saved and loaded independently. The index is read
+    on first use, while the docstore can answer id lookups before that.
+    Shards of a published store version are read_only: nothing is written
+    into their directory, not even by SQLite.
+    """
+
+    def __init__(self, name: str, path: Path, embeddings, mmap: bool = None, read_only: bool = False):
+        self.name = name
+        self.path = Path(path)
+        self.embeddings = embeddings
+        self.mmap = INDEX_CONFIG["mmap"] if mmap is None else mmap
+        self.read_only = read_only
+        self.vector_store: Optional[FAISS] = None
+        # (text, vector, metadata, id) waiting for enough samples to train the index
+        self._pending = []
+        self._docstore: Optional[SQLiteDocstore] = None
+        self._loaded = False
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @property
+    def index_file(self) -> Path:
+        return self.path / "index.faiss"
+
+    @property
+    def version(self) -> Optional[str]:
+        """Changes whenever the saved index is rewritten"""
+        if not self.index_file.exists():
+            return None
+        stat = self.index_file.stat()
+        return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+    @property
+    def docstore(self) -> SQLiteDocstore:
+        if self._docstore is None:
+            self._docstore = SQLiteDocstore(self.path / DOCSTORE_CONFIG["file"], read_only=self.read_only)
+        return self._docstore
+
+    @property
+    def needs_training(self) -> bool:
+        return bool(self._pending)
+
+    @property
+    def has_index(self) -> bool:
+        """True if there are (or will be, once loaded) searchable vectors"""
+        if self._loaded:
+            return self.vector_store is not None
+        return self.index_file.exists()
+
+    @property
+    def count(self) -> int:
+        self.ensure_loaded()
+        indexed = self.vector_store.index.ntotal if self.vector_store is not None else 0
+        return indexed + len(self._pending)
+
+    def ensure_loaded(self):
+        """Read the saved index the first time the shard is used"""
+        with self._lock:
+            if self._loaded:
+                return
+            if self.index_file.exists():
+                self._load()
+            self._loaded = True
+
+    def _load(self):
+        # faiss only maps the inverted lists of IVF indexes; flat and HNSW indexes are read into memory
+        io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if self.mmap else 0
+        with profiling.span("read_index", shard=self.name) as stage:
+            index = faiss.read_index(str(self.index_file), io_flags)
+            apply_search_params(index)
+            stage["vectors"] = index.ntotal
+
+        if (self.path / "index.pkl").exists():
+            logger.warning(f"Shard {self.name} still has a pickled docstore - run --build to migrate it")
+
+        self.vector_store = FAISS(self.embeddings, index, self.docstore, self.docstore.positions)
+        mapped = self.mmap and self._is_ivf(index)
+        logger.info(f"Shard {self.name} loaded ({type(index).__name__}, "
+                    f"{index.ntotal} vectors{', inverted lists memory-mapped' if mapped else ''})")
+
+    @staticmethod
+    def _is_ivf(index) -> bool:
+        try:
+            return faiss.extract_index_ivf(index) is not None
+        except RuntimeError:
+            return False
+
+    @staticmethod
+    def _migrate_pickled_docstore(legacy_file: Path, docstore: SQLiteDocstore):
+        """One-time move of a store saved with FAISS.save_local into SQLite"""
+        logger.info(f"Migrating pickled docstore {legacy_file.name} to {docstore.path.name}")
+        with open(legacy_file, "rb") as f:
+            legacy_docstore, index_to_docstore_id = pickle.load(f)
+
+        docstore.reset()
+        docstore.add(legacy_docstore._dict)
+        docstore.replace_positions(index_to_docstore_id)
+        docstore.commit()
+        legacy_file.unlink()
+
+    def add(self, texts: List[str], vectors: List[List[float]], metadatas: List[dict], ids: List[str]):
+        self.ensure_loaded()
+        self._dirty = True
+        if self.vector_store is None:
+            # Trainable indexes need a sample first; buffer until we have one
+            self._pending.extend(zip(texts, vectors, metadatas, ids))
+            if len(self._pending) >= min_training_points():
+                self._train_pending()
+        else:
+            self.vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+    def _train_pending(self):
+        texts, vectors, metadatas, ids = zip(*self._pending)
+        matrix = np.array(vectors, dtype=np.float32)
+
+        index = create_index(matrix.shape[1], min(len(matrix), INDEX_CONFIG["train_size"]))
+        train_index(index, matrix)
+        apply_search_params(index)
+
+        self.docstore.reset()
+        self.vector_store = FAISS(self.embeddings, index, self.docstore, self.docstore.positions)
+        self.vector_store.add_embeddings(list(zip(texts, vectors)), metadatas=list(metadatas), ids=list(ids))
+        self._pending = []
+
+    def finish_training(self):
+        """Train on whatever is buffered, even if it is less than train_size"""
+        if self._pending:
+            self._train_pending()
+
+    def delete(self, ids: List[str]) -> int:
+        """Remove the given chunk ids if they live here; returns how many did"""
+        drop = set(ids)
+        pending = len(self._pending)
+        self._pending = [entry for entry in self._pending if entry[3] not in drop]
+        removed = pending - len(self._pending)
+
+        if not self.has_index:
+            return removed
+        # The docstore knows which ids are ours without reading the index
+        ids = self.docstore.existing_ids(list(drop))
+        if not ids:
+            return removed
+
+        self.ensure_loaded()
+        self._dirty = True
+        if supports_removal(self.vector_store.index):
+            self.vector_store.delete(ids)
+        else:
+            self._rebuild_without(set(ids))
+        self._sync_positions()
+        return removed + len(ids)
+
+    def update_metadata(self, ids: List[str], update: Callable[[str, dict], dict]) -> int:
+        """Rewrite the metadata of the given chunks held here with update(id, metadata); returns how many"""
+        wanted = set(ids)
+        updated = 0
+        for i, (text, vector, metadata, doc_id) in enumerate(self._pending):
+            if doc_id in wanted:
+                self._pending[i] = (text, vector, update(doc_id, dict(metadata)), doc_id)
+                updated += 1
+
+        if not self.has_index:
+            return updated
+        found = self.docstore.fetch(list(wanted))
+        if not found:
+            return updated
+        self.ensure_loaded()
+        self._dirty = True
+        self.docstore.update_metadata({doc_id: update(doc_id, dict(doc.metadata)) for doc_id, doc in found.items()})
+        return updated + len(found)
+
+    def _sync_positions(self):
+        """FAISS.delete renumbers rows into a plain dict; write it back so filters see the new rows"""
+        store = self.vector_store
+        if store.index_to_docstore_id is not store.docstore.positions:
+            store.docstore.replace_positions(store.index_to_docstore_id)
+            store.index_to_docstore_id = store.docstore.positions
+
+    def _rebuild_without(self, drop: set):
+        """Re-add the survivors so rows stay numbered 0..n-1
+
+        Every index keeps its own layout and training (centroids, PCA, scalar
+        quantizer ranges); HNSW graphs are built anew. Compact indexes without
+        re-scoring can only re-add their decoded, approximate vectors.
+        """
+        store = self.vector_store
+        keep = [
+            (position, doc_id) for position, doc_id in sorted(store.index_to_docstore_id.items())
+            if doc_id not in drop
+        ]
+        index = store.index
+        try:
+            ivf = faiss.extract_index_ivf(index)
+        except RuntimeError:
+            ivf = None
+
+        if ivf is not None:
+            ivf.make_direct_map()
+            vectors = index.reconstruct_n(0, index.ntotal)
+            ivf.make_direct_map(False)
+            index.reset()
+            if keep:
+                index.add(vectors[[position for position, _ in keep]])
+        else:
+            vectors = index.reconstruct_n(0, index.ntotal)
+            # An empty copy rather than a new index from INDEX_CONFIG, which may describe another layout
+            index = faiss.clone_index(index)
+            index.reset()
+            if keep:
+                index.add(vectors[[position for position, _ in keep]])
+            apply_search_params(index)
+
+        store.docstore.delete(list(drop))
+        store.index = index
+        store.index_to_docstore_id = {i: doc_id for i, (_, doc_id) in enumerate(keep)}
+
+    def save(self) -> bool:
+        """Write the index and commit the docstore if anything changed; False if nothing did"""
+        self.finish_training()
+        if self.vector_store is None or not self._dirty:
+            return False
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        store = self.vector_store
+        tmp_file = self.path / "index.faiss.tmp"
+        faiss.write_index(store.index, str(tmp_file))
+
+        self._sync_positions()
+        store.docstore.commit()
+        tmp_file.replace(self.index_file)
+        self._dirty = False
+        return True
+
+    def search(self, matrix: np.ndarray, k: int,
+               filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[float, str]]]:
+        """(distance, chunk id) per query row, nearest first, only over chunks passing filters"""
+        allowed = None
+        if filters:
+            # Resolved from the docstore first, so shards with no match are never loaded
+            allowed = self.docstore.matching_positions(filters) if self.has_index else []
+            if not len(allowed):
+                return [[] for _ in matrix]
+
+        self.ensure_loaded()
+        if self.vector_store is None:
+            return [[] for _ in matrix]
+
+        index = self.vector_store.index
+        with profiling.span("shard_search", shard=self.name) as stage:
+            if allowed is None:
+                distances, indices = index.search(matrix, k)
+            else:
+                stage["allowed"] = len(allowed)
+                selector, keep_alive = id_selector(allowed, index.ntotal)
+                distances, indices = index.search(matrix, k, params=search_parameters(index, selector))
+                expected = min(k, len(allowed))
+                if not is_exact(index) and ((indices != -1).sum(axis=1) < expected).any():
+                    # Matches outside the probed lists / graph beam: look everywhere
+                    stage["exhaustive"] = True
+                    distances, indices = exhaustive_search(index, matrix, k, selector, allowed)
+            return [
+                [(float(distance), self.vector_store.index_to_docstore_id[i])
+                 for distance, i in zip(row_distances, row) if i != -1]
+                for row_distances, row in zip(distances, indices)
+            ]
+
+    def documents(self, ids: List[str]) -> Dict[str, Document]:
+        return self.docstore.fetch(ids)
+
+    def close(self):
+        if self._docstore is not None:
+            self._docstore.close()
+            self._docstore = None
+        self.vector_store = None
+        self._pending = []
+        self._loaded = False
+
+
+def migrate_store(root: Path) -> bool:
+    """Bring every shard under a build's own copy of the store up to date; True if any changed
+
+    Published versions are opened read-only, so the one-time migrations of
+    older stores (pickled docstores, WAL journals, missing filter attributes)
+    happen here, before the build writes anything else.
+    """
+    shard_root = root / SHARD_CONFIG["dir"]
+    paths = [root] + (sorted(path for path in shard_root.iterdir() if path.is_dir()) if shard_root.is_dir() else [])
+    changed = False
+    for path in paths:
+        if not (path / "index.faiss").exists():
+            continue
+        docstore = SQLiteDocstore(path / DOCSTORE_CONFIG["file"])
+        try:
+            legacy_file = path / "index.pkl"
+            if legacy_file.exists():
+                VectorShard._migrate_pickled_docstore(legacy_file, docstore)
+                changed = True
+            changed = docstore.migrate() or changed
+        finally:
+            docstore.close()
+    return changed